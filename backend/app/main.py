@@ -20,6 +20,9 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
 from app.services.database import init_db, close_db
+from app.services.simulation_executor import init_executor, close_executor, get_executor_status
+from app.services.distributed import get_cluster_status
+from app.services.analysis_jobs import job_manager
 # In your main app file
 from app.routes.analysis import router as analysis_router
 
@@ -57,12 +60,17 @@ if os.path.exists("static"):
 # Initialize database with analysis results collection
 @app.on_event("startup")
 async def startup_event():
+    # Start simulation workers before the Mongo client spins up its threads
+    await init_executor()
     await init_db()
+    await job_manager.start()
     print("✓ Database initialized successfully with analysis results storage!")
     print("✓ Ready for real Monte Carlo analysis with database persistence")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await job_manager.stop()
+    await close_executor()
     await close_db()
 
 
@@ -113,7 +121,9 @@ async def health_check():
         "cors": "enabled",
         "database": "connected",
         "analysis_engine": "monte_carlo_v2",
-        "storage": "mongodb_analysis_results"
+        "storage": "mongodb_analysis_results",
+        "simulation_executor": get_executor_status(),
+        "simulation_cluster": get_cluster_status()
     }
 
 # Enhanced API info endpoint
@@ -135,6 +145,15 @@ async def api_info():
         },
         "endpoints": {
             "run_analysis": "/api/analysis/scenarios/{scenario_id}/run-analysis",
+            "batch_analysis": "/api/analysis/batch-analysis",
+            "what_if": "/api/analysis/scenarios/{scenario_id}/what-if",
+            "sensitivity": "/api/analysis/scenarios/{scenario_id}/sensitivity",
+            "optimize_defenses": "/api/analysis/scenarios/{scenario_id}/optimize-defenses",
+            "horizon": "/api/analysis/scenarios/{scenario_id}/horizon",
+            "submit_analysis_job": "/api/analysis/scenarios/{scenario_id}/analysis-jobs",
+            "analysis_job_status": "/api/analysis/analysis-jobs/{job_id}",
+            "analysis_job_result": "/api/analysis/analysis-jobs/{job_id}/result",
+            "cache_stats": "/api/analysis/cache/stats",
             "store_results": "/api/analysis/scenarios/{scenario_id}/results",
             "get_results": "/api/analysis/scenarios/{scenario_id}/results",
             "get_summary": "/api/analysis/scenarios/{scenario_id}/results/summary"
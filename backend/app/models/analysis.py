@@ -0,0 +1,111 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from app.models.defense_system import DefenseSystemCreate
+
+class AnalysisOptions(BaseModel):
+    """Optional settings for a Monte Carlo analysis run"""
+    iterations: int = Field(default=10000, ge=100, le=5000000)  # Fixed mode iteration count
+    use_cache: bool = True
+    # Reproducibility: the same seed and inputs give bit-identical results.
+    # Without one a fresh seed is drawn and returned in random_stream.
+    seed: Optional[int] = Field(default=None, ge=0)
+    # Split a fixed-size run across this many pool processes (does not change results)
+    parallel_workers: int = Field(default=1, ge=1, le=64)
+    # Shard a fixed-size run across the SIMULATION_CLUSTER worker nodes (does not change results)
+    distributed: bool = False
+    # Uniform sampler: random, latin_hypercube, sobol or antithetic (variance reduction)
+    sampling: str = "random"
+    # Oversample rare, high-impact events for tighter p99/CVaR (fixed mode only);
+    # results then carry standard errors for the weighted estimates
+    importance_sampling: bool = False
+    # Share of an asset's damage passed to the assets that depend on it; cascades
+    # are off by default (0) and opt-in per run
+    cascade_factor: float = Field(default=0.0, ge=0, le=1)
+    # Memory the run may hold (MB, default SIMULATION_MEMORY_BUDGET_MB): sizes the
+    # chunks and how many losses are kept for exact statistics
+    memory_budget_mb: Optional[float] = Field(default=None, ge=16, le=65536)
+    # float32 sampling and per-iteration sums (less memory traffic), aggregated in
+    # compensated float64; falls back to float64 if a percentile check fails
+    precision: str = "float64"
+    # Adaptive mode runs batches until the tracked metrics' relative
+    # standard errors reach target_precision or a budget runs out
+    adaptive: bool = False
+    target_precision: float = Field(default=0.01, gt=0, lt=1)
+    max_iterations: int = Field(default=500000, ge=1000, le=5000000)
+    # Iterations simulated before convergence is first checked
+    min_iterations: int = Field(default=10000, ge=100, le=5000000)
+    time_budget_seconds: Optional[float] = Field(default=30, gt=0)
+    batch_size: int = Field(default=5000, ge=100, le=1000000)
+
+    def simulation_settings(self) -> dict:
+        """Options that change the simulation output (and so the cache key); the seed is keyed separately"""
+        return self.model_dump(exclude={"use_cache", "seed", "parallel_workers", "distributed"})
+
+
+class BatchAnalysisRequest(BaseModel):
+    """Scenarios to analyse in one batch: explicit IDs, or every scenario matching a filter"""
+    scenario_ids: Optional[List[str]] = Field(default=None, min_length=1, max_length=1000)
+    status: Optional[str] = None
+    category: Optional[str] = None
+    # Applied to every scenario in the batch
+    options: Optional[AnalysisOptions] = None
+    # Insert an analysis_results document per scenario, as analysis jobs do
+    store_results: bool = True
+
+    def scenario_filter(self) -> dict:
+        """Mongo filter for the status/category selection; empty when nothing is selected"""
+        return {
+            field: value for field, value in (("status", self.status), ("category", self.category))
+            if value is not None
+        }
+
+class DefenseChange(BaseModel):
+    """A what-if edit of one of the scenario's defense systems"""
+    defense_id: str
+    effectiveness: Optional[float] = Field(default=None, ge=0, le=100)
+    coverage_percentage: Optional[float] = Field(default=None, ge=0, le=100)
+
+class WhatIfRequest(BaseModel):
+    """Defense changes evaluated against the baseline run on the same random draws"""
+    changes: List[DefenseChange] = Field(..., min_length=1)
+    # Baseline run settings; the seed selects a specific recorded baseline
+    options: Optional[AnalysisOptions] = None
+
+class SensitivityRequest(BaseModel):
+    """One-at-a-time and Sobol sensitivity of a scenario's losses to its parameters"""
+    # Each probability, impact range and defense effectiveness is varied by +/- this fraction
+    swing: float = Field(default=0.2, gt=0, lt=1)
+    # Sobol points of the Saltelli design (rounded up to a power of two); 0 skips the Sobol indices
+    sobol_samples: int = Field(default=64, ge=0, le=4096)
+    options: Optional[AnalysisOptions] = None
+
+class DefenseOptimizationRequest(BaseModel):
+    """Budget-constrained choice of defense systems, scored on the baseline's random draws"""
+    # Implementation plus maintenance cost the chosen defenses may add up to
+    budget: float = Field(..., ge=0)
+    objective: str = "expected_annual_loss"  # or conditional_var_95
+    # Scenario defenses to choose from (default: all); the others stay in place
+    candidate_ids: Optional[List[str]] = Field(default=None, max_length=64)
+    # Defenses not in the scenario yet, considered alongside the candidates
+    proposed: Optional[List[DefenseSystemCreate]] = Field(default=None, max_length=64)
+    max_evaluations: int = Field(default=20000, ge=100, le=1000000)
+    options: Optional[AnalysisOptions] = None
+
+class HorizonRequest(BaseModel):
+    """Multi-year projection of a scenario's losses with trending threats and amortized defense costs"""
+    years: int = Field(default=5, ge=1, le=10)
+    # Annual growth of threat frequency and of impacts, e.g. 0.1 for +10% a year
+    frequency_trend: float = Field(default=0.0, gt=-1, le=10)
+    impact_trend: float = Field(default=0.0, gt=-1, le=10)
+    # Explicit per-year multipliers; override the trends
+    frequency_multipliers: Optional[List[float]] = Field(default=None, max_length=10)
+    impact_multipliers: Optional[List[float]] = Field(default=None, max_length=10)
+    # Years defense implementation costs are spread over (default: the horizon)
+    amortization_years: Optional[int] = Field(default=None, ge=1, le=30)
+    discount_rate: float = Field(default=0.0, ge=0, le=1)
+    # Cumulative losses plus defense spending that count as ruin (default: total asset value)
+    ruin_capital: Optional[float] = Field(default=None, gt=0)
+    options: Optional[AnalysisOptions] = None
+
+    def horizon_options(self) -> dict:
+        return self.model_dump(exclude={"options"})
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from bson import ObjectId
 
@@ -34,6 +34,11 @@ class RiskEvent(BaseModel):
     impact_min: float = Field(..., ge=0)  # Minimum financial impact
     impact_max: float = Field(..., ge=0)  # Maximum financial impact
     frequency: float = Field(default=1.0, gt=0)  # Expected occurrences per year
+    frequency_distribution: Optional[str] = None  # bernoulli (default), poisson, negative_binomial
+    frequency_dispersion: Optional[float] = Field(None, gt=1)  # Negative binomial variance-to-mean ratio
+    severity_distribution: Optional[str] = None  # uniform (default), lognormal, triangular, pert, pareto, empirical
+    severity_params: Optional[Dict[str, Any]] = None  # Distribution parameters, e.g. {"mode": 50000} for pert
+    affected_assets: List[str] = Field(default=[])  # Asset IDs this event hits (default: every asset)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -45,6 +50,11 @@ class RiskEventCreate(BaseModel):
     impact_min: float = Field(..., ge=0)
     impact_max: float = Field(..., ge=0)
     frequency: float = Field(default=1.0, gt=0)
+    frequency_distribution: Optional[str] = None
+    frequency_dispersion: Optional[float] = Field(None, gt=1)
+    severity_distribution: Optional[str] = None
+    severity_params: Optional[Dict[str, Any]] = None
+    affected_assets: List[str] = Field(default=[])
 
 class RiskEventUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100)
@@ -53,4 +63,9 @@ class RiskEventUpdate(BaseModel):
     probability: Optional[float] = Field(None, gt=0, le=100)
     impact_min: Optional[float] = Field(None, ge=0)
     impact_max: Optional[float] = Field(None, ge=0)
-    frequency: Optional[float] = Field(None, gt=0)
\ No newline at end of file
+    frequency: Optional[float] = Field(None, gt=0)
+    frequency_distribution: Optional[str] = None
+    frequency_dispersion: Optional[float] = Field(None, gt=1)
+    severity_distribution: Optional[str] = None
+    severity_params: Optional[Dict[str, Any]] = None
+    affected_assets: Optional[List[str]] = None
\ No newline at end of file
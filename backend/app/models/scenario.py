@@ -1,6 +1,6 @@
 # # Nozama-chatbot/backend/app/models/scenario.py
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, Annotated
+from typing import Optional, Annotated, Dict, Any
 from datetime import datetime
 from bson import ObjectId
 
@@ -31,15 +31,19 @@ class Scenario(BaseModel):
     description: Optional[str] = Field(None, max_length=500)
     status: str = Field(default="draft")  # draft, ready, running, completed
     risk_score: Optional[float] = Field(default=0)
+    # Correlated risk events: {"copula": "gaussian" | "t", "groups": [...], "matrix": {...}}
+    correlation: Optional[Dict[str, Any]] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class ScenarioCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
     description: Optional[str] = Field(None, max_length=500)
+    correlation: Optional[Dict[str, Any]] = None
 
 class ScenarioUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100)
     description: Optional[str] = Field(None, max_length=500)
     status: Optional[str] = None
-    risk_score: Optional[float] = None
\ No newline at end of file
+    risk_score: Optional[float] = None
+    correlation: Optional[Dict[str, Any]] = None
\ No newline at end of file
@@ -104,87 +104,67 @@
 
 
 # backend/app/routes/analysis.py - ENHANCED WITH DATABASE STORAGE
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any, List
+import os
+import json
+import time
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional
 from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
 from datetime import datetime
+from app.models.analysis import AnalysisOptions, BatchAnalysisRequest, WhatIfRequest, SensitivityRequest, DefenseOptimizationRequest, HorizonRequest
 from app.services.database import get_database
-from app.services.monte_carlo import MonteCarloSimulation
+from app.services import simulation_executor
+from app.services.distributed import run_distributed_simulation, require_cluster, ClusterNotConfiguredError
+from app.services.analysis_jobs import job_manager, serialize_job, QueueFullError
+from app.services.simulation_cache import simulation_cache, make_cache_key
+from app.services.distributions import FREQUENCY_DISTRIBUTIONS, list_severity_distributions
+from app.services.samplers import list_samplers
+from app.services.copula import COPULAS
+from app.services.simulation_plan import plan_key
+from app.services.monte_carlo import PRECISIONS
+from app.services.sample_matrix import sample_cache, sample_key
+from app.services.what_if import run_what_if
+from app.services.portfolio_optimizer import optimize_defenses
 
 router = APIRouter()
 
-# backend/app/routes/analysis.py - ADD BETTER ERROR HANDLING
-@router.post("/scenarios/{scenario_id}/run-analysis")
-async def run_monte_carlo_analysis(scenario_id: str, db=Depends(get_database)) -> Dict[str, Any]:
-    """Run Monte Carlo analysis and return real results"""
-    try:
-        if not ObjectId.is_valid(scenario_id):
-            raise HTTPException(status_code=400, detail="Invalid scenario ID")
-        
-        # Verify scenario exists
-        scenario = await db.scenarios.find_one({"_id": ObjectId(scenario_id)})
-        if not scenario:
-            raise HTTPException(status_code=404, detail="Scenario not found")
-        
-        print(f"Running analysis for scenario: {scenario_id}")
-        
-        # Get scenario components for real analysis
-        risk_events_data = await db.risk_events.find({"scenario_id": ObjectId(scenario_id)}).to_list(100)
-        business_assets_data = await db.business_assets.find({"scenario_id": ObjectId(scenario_id)}).to_list(100)
-        defense_systems_data = await db.defense_systems.find({"scenario_id": ObjectId(scenario_id)}).to_list(100)
-        
-        print(f"Found components: {len(risk_events_data)} risk events, {len(business_assets_data)} assets, {len(defense_systems_data)} defenses")
-        
-        # Validate we have the minimum required components
-        if not risk_events_data:
-            raise HTTPException(status_code=400, detail="Scenario must have at least one risk event")
-        
-        # Run REAL Monte Carlo simulation with actual data
-        monte_carlo = MonteCarloSimulation(iterations=10000)
-        results = monte_carlo.run_simulation(risk_events_data, business_assets_data, defense_systems_data)
-        
-        # Calculate additional real metrics
-        results["scenario_id"] = scenario_id
-        results["generated_at"] = datetime.utcnow().isoformat()
-        results["total_defense_cost"] = sum(defense.get('cost', 0) for defense in defense_systems_data)
-        results["total_asset_value"] = sum(asset.get('value', 0) for asset in business_assets_data)
-        results["security_roi"] = calculate_security_roi(results, defense_systems_data)
-        results["components_analyzed"] = {
-            "risk_events": len(risk_events_data),
-            "business_assets": len(business_assets_data),
-            "defense_systems": len(defense_systems_data)
-        }
-        
-        # Calculate risk score based on real simulation results
-        risk_score = min(100, (results["p90_severe_impact"] / 1000000) * 100) if results["p90_severe_impact"] > 0 else 0
-        results["risk_score"] = risk_score
-        
-        # Update scenario with real risk score and completion status
-        await db.scenarios.update_one(
-            {"_id": ObjectId(scenario_id)},
-            {"$set": {
-                "risk_score": risk_score, 
-                "status": "completed",
-                "last_analysis": datetime.utcnow()
-            }}
-        )
-        
-        print(f"Monte Carlo analysis completed successfully. P50: {results['p50_median_impact']}, P90: {results['p90_severe_impact']}")
-        
-        return results
-        
-    except HTTPException:
-        raise  # Re-raise HTTP exceptions
-    except Exception as e:
-        print(f"Unexpected error in Monte Carlo analysis: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+# Components read per scenario and collection, in single and batch runs alike
+COMPONENT_LIMIT = 100
+# Analysis documents and scenario updates written per bulk_write in a batch run
+BATCH_WRITE_SIZE = int(os.getenv("BATCH_WRITE_SIZE", "25"))
+# Scenarios a status/category filter may select
+MAX_BATCH_SCENARIOS = 1000
 
-@router.post("/scenarios/{scenario_id}/results")
-async def store_analysis_results(scenario_id: str, results: Dict[str, Any], db=Depends(get_database)):
-    """Store Monte Carlo analysis results in database"""
+def build_scenario_components(
+    scenario: Dict,
+    risk_events_data: List[Dict],
+    business_assets_data: List[Dict],
+    defense_systems_data: List[Dict]
+) -> Dict[str, Any]:
+    """Validate a scenario's components and bundle what the simulation needs"""
+    print(f"Found components: {len(risk_events_data)} risk events, {len(business_assets_data)} assets, {len(defense_systems_data)} defenses")
+    
+    # Validate we have the minimum required components
+    if not risk_events_data:
+        raise HTTPException(status_code=400, detail="Scenario must have at least one risk event")
+    
+    return {
+        "risk_events": risk_events_data,
+        "business_assets": business_assets_data,
+        "defense_systems": defense_systems_data,
+        # Optional copula spec linking risk events (see app.services.copula)
+        "correlation": scenario.get("correlation"),
+        # The version is read before the components and bumped before a write; the
+        # source hash catches a plan compiled mid-write (see simulation_plan)
+        "plan_key": plan_key(scenario, risk_events_data, business_assets_data, defense_systems_data)
+    }
+
+async def load_scenario_components(scenario_id: str, db) -> Dict[str, List[Dict]]:
+    """Validate the scenario and fetch the components the simulation needs"""
     if not ObjectId.is_valid(scenario_id):
         raise HTTPException(status_code=400, detail="Invalid scenario ID")
     
@@ -193,8 +173,142 @@ async def store_analysis_results(scenario_id: str, results: Dict[str, Any], db=D
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
-    # Prepare analysis result document for database storage
-    analysis_result = {
+    # Get scenario components for real analysis
+    risk_events_data = await db.risk_events.find({"scenario_id": ObjectId(scenario_id)}).to_list(COMPONENT_LIMIT)
+    business_assets_data = await db.business_assets.find({"scenario_id": ObjectId(scenario_id)}).to_list(COMPONENT_LIMIT)
+    defense_systems_data = await db.defense_systems.find({"scenario_id": ObjectId(scenario_id)}).to_list(COMPONENT_LIMIT)
+    
+    return build_scenario_components(scenario, risk_events_data, business_assets_data, defense_systems_data)
+
+async def load_batch_components(scenarios: List[Dict], db) -> Dict[str, Any]:
+    """
+    Fetch every scenario's components with one $in query per collection.
+    Returns scenario id -> components, or the HTTPException that
+    load_scenario_components would have raised for that scenario.
+    """
+    ids = [scenario["_id"] for scenario in scenarios]
+    grouped = {}
+    for collection in ("risk_events", "business_assets", "defense_systems"):
+        grouped[collection] = {scenario_id: [] for scenario_id in ids}
+        # Natural order within each scenario, as in the per-scenario query, so cache keys match
+        async for document in db[collection].find({"scenario_id": {"$in": ids}}):
+            documents = grouped[collection].get(document["scenario_id"])
+            if documents is not None and len(documents) < COMPONENT_LIMIT:
+                documents.append(document)
+    
+    components = {}
+    for scenario in scenarios:
+        scenario_id = scenario["_id"]
+        try:
+            components[str(scenario_id)] = build_scenario_components(
+                scenario,
+                grouped["risk_events"][scenario_id],
+                grouped["business_assets"][scenario_id],
+                grouped["defense_systems"][scenario_id]
+            )
+        except HTTPException as e:
+            components[str(scenario_id)] = e
+    return components
+
+async def execute_scenario_analysis(scenario_id: str, db, options: Optional[AnalysisOptions] = None) -> Dict[str, Any]:
+    """Run the Monte Carlo simulation for a scenario and update its risk score"""
+    print(f"Running analysis for scenario: {scenario_id}")
+    
+    components = await load_scenario_components(scenario_id, db)
+    results = await simulate_scenario(scenario_id, components, db, options)
+    
+    # Update scenario with real risk score and completion status
+    await db.scenarios.update_one({"_id": ObjectId(scenario_id)}, {"$set": scenario_completion(results)})
+    
+    print(f"Monte Carlo analysis completed successfully. P50: {results['p50_median_impact']}, P90: {results['p90_severe_impact']}")
+    
+    return results
+
+async def simulate_scenario(
+    scenario_id: str,
+    components: Dict[str, Any],
+    db,
+    options: Optional[AnalysisOptions] = None
+) -> Dict[str, Any]:
+    """Simulate loaded scenario components (or serve them from cache) and add the business metrics"""
+    options = options or AnalysisOptions()
+    risk_events_data = components["risk_events"]
+    business_assets_data = components["business_assets"]
+    defense_systems_data = components["defense_systems"]
+    correlation = components["correlation"]
+    
+    # In adaptive mode the iteration count is only an upper bound
+    iterations = options.max_iterations if options.adaptive else options.iterations
+    adaptive = {
+        "target_precision": options.target_precision,
+        "time_budget": options.time_budget_seconds,
+        "batch_size": options.batch_size,
+        "min_iterations": options.min_iterations
+    } if options.adaptive else None
+    
+    cache_key = make_cache_key(
+        risk_events_data, business_assets_data, defense_systems_data, iterations,
+        seed=options.seed, options={**options.simulation_settings(), "correlation": correlation}
+    )
+    results, cache_tier = await simulation_cache.get(cache_key, db) if options.use_cache else (None, None)
+    
+    if results is None:
+        engine_options = dict(
+            seed=options.seed, sampling=options.sampling, correlation=correlation,
+            importance_sampling=options.importance_sampling, cascade_factor=options.cascade_factor,
+            memory_budget_mb=options.memory_budget_mb, precision=options.precision
+        )
+        if options.distributed:
+            if adaptive is not None:
+                raise ValueError("Distributed runs need a fixed iteration count (adaptive must be off)")
+            results = await run_distributed_simulation(
+                iterations, risk_events_data, business_assets_data, defense_systems_data,
+                plan_key=components["plan_key"], **engine_options
+            )
+        else:
+            # Run REAL Monte Carlo simulation with actual data in the worker pool
+            results = await simulation_executor.run_simulation(
+                iterations, risk_events_data, business_assets_data, defense_systems_data,
+                adaptive=adaptive, workers=options.parallel_workers, plan_key=components["plan_key"],
+                **engine_options
+            )
+        await simulation_cache.put(cache_key, results, db)
+    else:
+        print(f"Serving simulation for scenario {scenario_id} from {cache_tier} cache")
+    
+    results["cache"] = {"hit": cache_tier is not None, "tier": cache_tier, "key": cache_key}
+    
+    # Calculate additional real metrics
+    results["scenario_id"] = scenario_id
+    results["generated_at"] = datetime.utcnow().isoformat()
+    results["total_defense_cost"] = sum(defense.get('cost', 0) for defense in defense_systems_data)
+    results["total_asset_value"] = sum(asset.get('value', 0) for asset in business_assets_data)
+    results["security_roi_signed"] = calculate_security_roi(results)
+    # Consumers of security_roi expect values >= 0
+    results["security_roi"] = max(0.0, results["security_roi_signed"])
+    results["components_analyzed"] = {
+        "risk_events": len(risk_events_data),
+        "business_assets": len(business_assets_data),
+        "defense_systems": len(defense_systems_data)
+    }
+    
+    # Calculate risk score based on real simulation results
+    risk_score = min(100, (results["p90_severe_impact"] / 1000000) * 100) if results["p90_severe_impact"] > 0 else 0
+    results["risk_score"] = risk_score
+    
+    return results
+
+def scenario_completion(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Scenario fields set when an analysis completes"""
+    return {
+        "risk_score": results["risk_score"],
+        "status": "completed",
+        "last_analysis": datetime.utcnow()
+    }
+
+def build_analysis_document(scenario_id: str, results: Dict[str, Any]) -> Dict[str, Any]:
+    """Prepare analysis result document for database storage"""
+    return {
         "scenario_id": ObjectId(scenario_id),
         "analysis_type": "monte_carlo",
         "generated_at": datetime.utcnow(),
@@ -216,8 +330,33 @@ async def store_analysis_results(scenario_id: str, results: Dict[str, Any], db=D
         # Confidence intervals
         "confidence_intervals": results.get("confidence_intervals", {}),
         
+        # Adaptive mode: iterations used and achieved error bounds
+        "convergence": results.get("convergence"),
+        
+        # Importance sampling: standard errors of the weighted estimates and weight diagnostics
+        "standard_errors": results.get("standard_errors"),
+        "importance_sampling": results.get("importance_sampling"),
+        
+        # Reproducibility: seed and random stream layout used for this run
+        "seed": (results.get("random_stream") or {}).get("seed"),
+        "random_stream": results.get("random_stream"),
+        "sampling": results.get("sampling", "random"),
+        "correlation": results.get("correlation"),
+        
+        # Per-risk-event mean loss, occurrence rate and Euler VaR95/CVaR95 contributions
+        "event_attribution": results.get("event_attribution", []),
+        
+        # Memory budget, chunk size and peak memory of the run
+        "statistics_method": results.get("statistics_method"),
+        "memory": results.get("memory"),
+        "precision": results.get("precision"),
+        
         # Business metrics
         "security_roi": results.get("security_roi", 0),
+        # Negative when the defenses cost more than the loss they remove
+        "security_roi_signed": results.get("security_roi_signed", results.get("security_roi", 0)),
+        # Simulated loss reduction and ROI of the defenses, overall and one by one
+        "defense_value": results.get("defense_value"),
         "risk_score": results.get("risk_score", 0),
         "total_defense_cost": results.get("total_defense_cost", 0),
         "total_asset_value": results.get("total_asset_value", 0),
@@ -233,25 +372,533 @@ async def store_analysis_results(scenario_id: str, results: Dict[str, Any], db=D
         "version": "1.0",
         "analysis_engine": "monte_carlo_simulation_v1"
     }
+
+async def save_analysis_result(scenario_id: str, results: Dict[str, Any], db) -> ObjectId:
+    """Insert an analysis result and point the scenario at it"""
+    analysis_result = build_analysis_document(scenario_id, results)
+    
+    # Insert analysis result into database
+    result = await db.analysis_results.insert_one(analysis_result)
+    
+    # Update scenario with reference to latest analysis
+    await db.scenarios.update_one(
+        {"_id": ObjectId(scenario_id)},
+        {"$set": {
+            "latest_analysis_id": result.inserted_id,
+            "latest_analysis_date": datetime.utcnow()
+        }}
+    )
+    
+    print(f"Analysis results stored successfully for scenario {scenario_id}")
+    
+    return result.inserted_id
+
+def require_distributed_cluster(options: Optional[AnalysisOptions]):
+    """
+    A distributed run without a configured cluster is a server problem, not
+    bad input: reject it up front with 503 instead of failing mid-run
+    """
+    if options is None or not options.distributed:
+        return
+    try:
+        require_cluster()
+    except ClusterNotConfiguredError as e:
+        raise HTTPException(status_code=503, detail=f"Distributed simulation is not available: {str(e)}")
+
+# backend/app/routes/analysis.py - ADD BETTER ERROR HANDLING
+@router.post("/scenarios/{scenario_id}/run-analysis")
+async def run_monte_carlo_analysis(
+    scenario_id: str,
+    options: Optional[AnalysisOptions] = Body(default=None),
+    db=Depends(get_database)
+) -> Dict[str, Any]:
+    """Run Monte Carlo analysis and return real results"""
+    require_distributed_cluster(options)
+    try:
+        return await execute_scenario_analysis(scenario_id, db, options)
+        
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
+    except ValueError as e:
+        # Invalid scenario parameters rejected by the simulation engine
+        raise HTTPException(status_code=400, detail=f"Invalid scenario parameters: {str(e)}")
+    except Exception as e:
+        print(f"Unexpected error in Monte Carlo analysis: {str(e)}")
+        print(f"Error type: {type(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+async def _run_and_store_analysis(scenario_id: str, db, options: Optional[AnalysisOptions]) -> Dict[str, Any]:
+    """Job body: run the analysis and persist it to analysis_results"""
+    results = await execute_scenario_analysis(scenario_id, db, options)
+    analysis_id = await save_analysis_result(scenario_id, results, db)
+    results["analysis_id"] = str(analysis_id)
+    return results
+
+def _batch_error(scenario_id: str, error: Exception) -> Dict[str, Any]:
+    """Stream line for a failed scenario, with the status run-analysis would have returned"""
+    if isinstance(error, HTTPException):
+        status_code, detail = error.status_code, error.detail
+    elif isinstance(error, ValueError):
+        status_code, detail = 400, f"Invalid scenario parameters: {str(error)}"
+    else:
+        status_code, detail = 500, f"Analysis failed: {str(error)}"
+    return {"type": "error", "scenario_id": scenario_id, "success": False, "status_code": status_code, "error": detail}
+
+def _ndjson(record: Dict[str, Any]) -> str:
+    return json.dumps(record, default=str) + "\n"
+
+async def _bulk_write(collection, operations: List) -> Dict[int, str]:
+    """Unordered bulk write; returns operation index -> error for the operations that failed"""
+    if not operations:
+        return {}
+    try:
+        await collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        return {error["index"]: error.get("errmsg", "write failed") for error in e.details.get("writeErrors", [])}
+    except Exception as e:
+        # Nothing is known to have been written
+        return {index: str(e) for index in range(len(operations))}
+    return {}
+
+async def resolve_batch_scenarios(request: BatchAnalysisRequest, db):
+    """The requested scenario documents, plus (scenario id, error) for IDs that cannot be run"""
+    failures = []
+    if request.scenario_ids:
+        requested = list(dict.fromkeys(request.scenario_ids))
+        valid = [scenario_id for scenario_id in requested if ObjectId.is_valid(scenario_id)]
+        found = {
+            str(scenario["_id"]): scenario
+            async for scenario in db.scenarios.find({"_id": {"$in": [ObjectId(scenario_id) for scenario_id in valid]}})
+        }
+        scenarios = []
+        for scenario_id in requested:
+            if not ObjectId.is_valid(scenario_id):
+                failures.append((scenario_id, HTTPException(status_code=400, detail="Invalid scenario ID")))
+            elif scenario_id not in found:
+                failures.append((scenario_id, HTTPException(status_code=404, detail="Scenario not found")))
+            else:
+                scenarios.append(found[scenario_id])
+    else:
+        scenarios = await db.scenarios.find(request.scenario_filter()).to_list(MAX_BATCH_SCENARIOS)
+    return scenarios, failures
+
+async def stream_batch_analysis(
+    scenarios: List[Dict],
+    components: Dict[str, Any],
+    failures: List,
+    request: BatchAnalysisRequest,
+    db
+):
+    """
+    Run the batch in the worker pool and yield one NDJSON line per scenario as
+    results are written, then a summary line. Results are written in groups of
+    BATCH_WRITE_SIZE with one bulk_write per collection.
+    """
+    started = time.perf_counter()
+    options = request.options or AnalysisOptions()
+    counts = {"completed": 0, "failed": 0}
+    
+    for scenario_id, error in failures:
+        counts["failed"] += 1
+        yield _ndjson(_batch_error(scenario_id, error))
+    
+    # At most one round of the batch in the pool at a time, so other requests'
+    # simulations queue behind it rather than behind every scenario
+    pool_size = simulation_executor.worker_count or simulation_executor.SIMULATION_WORKERS
+    semaphore = asyncio.Semaphore(max(1, pool_size // options.parallel_workers))
+    
+    async def analyze(scenario_id: str):
+        loaded = components[scenario_id]
+        try:
+            if isinstance(loaded, Exception):
+                raise loaded
+            async with semaphore:
+                return scenario_id, await simulate_scenario(scenario_id, loaded, db, options), None
+        except Exception as e:
+            return scenario_id, None, e
+    
+    async def flush(completed: List):
+        """Write a group of results; returns their stream lines"""
+        analysis_operations = []
+        if request.store_results:
+            for scenario_id, results in completed:
+                document = build_analysis_document(scenario_id, results)
+                document["_id"] = ObjectId()
+                results["analysis_id"] = str(document["_id"])
+                analysis_operations.append(InsertOne(document))
+        insert_errors = await _bulk_write(db.analysis_results, analysis_operations)
+        
+        scenario_operations = []
+        for index, (scenario_id, results) in enumerate(completed):
+            fields = scenario_completion(results)
+            if request.store_results and index not in insert_errors:
+                fields["latest_analysis_id"] = ObjectId(results["analysis_id"])
+                fields["latest_analysis_date"] = datetime.utcnow()
+            scenario_operations.append(UpdateOne({"_id": ObjectId(scenario_id)}, {"$set": fields}))
+        update_errors = await _bulk_write(db.scenarios, scenario_operations)
+        
+        lines = []
+        for index, (scenario_id, results) in enumerate(completed):
+            error = insert_errors.get(index) or update_errors.get(index)
+            if error:
+                counts["failed"] += 1
+                lines.append(_ndjson({
+                    "type": "error", "scenario_id": scenario_id, "success": False, "status_code": 500,
+                    "error": f"Failed to store analysis results: {error}"
+                }))
+            else:
+                counts["completed"] += 1
+                lines.append(_ndjson({
+                    "type": "result", "scenario_id": scenario_id, "success": True,
+                    "analysis_id": results.get("analysis_id"), "data": results
+                }))
+        return lines
+    
+    tasks = [asyncio.create_task(analyze(scenario_id)) for scenario_id in components]
+    pending = []
+    try:
+        for finished in asyncio.as_completed(tasks):
+            scenario_id, results, error = await finished
+            if error is not None:
+                counts["failed"] += 1
+                yield _ndjson(_batch_error(scenario_id, error))
+                continue
+            pending.append((scenario_id, results))
+            if len(pending) >= BATCH_WRITE_SIZE:
+                for line in await flush(pending):
+                    yield line
+                pending = []
+        for line in await flush(pending):
+            yield line
+    finally:
+        # The client went away: stop feeding the pool
+        for task in tasks:
+            task.cancel()
+    
+    elapsed = time.perf_counter() - started
+    print(f"Batch analysis finished: {counts['completed']} completed, {counts['failed']} failed in {elapsed:.1f}s")
+    yield _ndjson({
+        "type": "summary",
+        "success": counts["failed"] == 0,
+        "scenarios": counts["completed"] + counts["failed"],
+        **counts,
+        "elapsed_seconds": elapsed
+    })
+
+@router.post("/batch-analysis")
+async def run_batch_analysis(request: BatchAnalysisRequest, db=Depends(get_database)):
+    """
+    Analyse many scenarios in one request: by ID list or by status/category
+    filter. Streams NDJSON, one line per scenario as it finishes, then a summary.
+    """
+    if not request.scenario_ids and not request.scenario_filter():
+        raise HTTPException(status_code=400, detail="Provide scenario_ids or a status/category filter")
+    require_distributed_cluster(request.options)
+    
+    scenarios, failures = await resolve_batch_scenarios(request, db)
+    components = await load_batch_components(scenarios, db)
+    print(f"Batch analysis of {len(components)} scenarios ({len(failures)} rejected)")
+    
+    return StreamingResponse(
+        stream_batch_analysis(scenarios, components, failures, request, db),
+        media_type="application/x-ndjson"
+    )
+
+async def load_baseline_samples(components: Dict[str, Any], options: AnalysisOptions):
+    """
+    The scenario's recorded baseline draws under these options, from the
+    sample cache or recorded in the worker pool; returns (samples, cache hit)
+    """
+    if options.adaptive:
+        raise HTTPException(status_code=400, detail="Comparisons on common random numbers need a fixed iteration count")
+    engine_options = {
+        "seed": options.seed,
+        "sampling": options.sampling,
+        "correlation": components["correlation"],
+        "importance_sampling": options.importance_sampling,
+        "cascade_factor": options.cascade_factor,
+        "memory_budget_mb": options.memory_budget_mb,
+        "precision": options.precision
+    }
+    key = sample_key(components["plan_key"], options.iterations, **engine_options)
+    samples = sample_cache.get(key)
+    if samples is not None:
+        return samples, True
     
+    samples = await simulation_executor.record_samples(
+        options.iterations, components["risk_events"], components["business_assets"], components["defense_systems"],
+        plan_key=components["plan_key"], **engine_options
+    )
+    sample_cache.put(key, samples)
+    return samples, False
+
+@router.post("/scenarios/{scenario_id}/what-if")
+async def run_what_if_analysis(scenario_id: str, request: WhatIfRequest, db=Depends(get_database)):
+    """
+    Evaluate changes to defense systems against the baseline on the same
+    random draws, returning baseline vs modified metrics and the deltas
+    with confidence intervals. Nothing is written to the scenario.
+    """
+    options = request.options or AnalysisOptions()
     try:
-        # Insert analysis result into database
-        result = await db.analysis_results.insert_one(analysis_result)
-        
-        # Update scenario with reference to latest analysis
-        await db.scenarios.update_one(
-            {"_id": ObjectId(scenario_id)},
-            {"$set": {
-                "latest_analysis_id": result.inserted_id,
-                "latest_analysis_date": datetime.utcnow()
-            }}
+        started = time.perf_counter()
+        components = await load_scenario_components(scenario_id, db)
+        samples, cached = await load_baseline_samples(components, options)
+        
+        report = await asyncio.to_thread(
+            run_what_if, samples, components["risk_events"], components["business_assets"],
+            components["defense_systems"], [change.model_dump() for change in request.changes], options.cascade_factor
         )
         
-        print(f"Analysis results stored successfully for scenario {scenario_id}")
+        return {
+            "success": True,
+            "scenario_id": scenario_id,
+            "changes": [change.model_dump(exclude_none=True) for change in request.changes],
+            **report,
+            "baseline_samples": {**samples.describe(), "cached": cached},
+            "elapsed_seconds": time.perf_counter() - started
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid what-if request: {str(e)}")
+    except Exception as e:
+        print(f"Error in what-if analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"What-if analysis failed: {str(e)}")
+
+@router.post("/scenarios/{scenario_id}/sensitivity")
+async def run_sensitivity_analysis(scenario_id: str, request: SensitivityRequest, db=Depends(get_database)):
+    """
+    Tornado swings and Sobol indices of expected_annual_loss and
+    p90_severe_impact for every risk event probability, impact range and
+    defense effectiveness, ranked by influence
+    """
+    options = request.options or AnalysisOptions()
+    if options.adaptive:
+        raise HTTPException(status_code=400, detail="Sensitivity analysis needs a fixed iteration count")
+    try:
+        started = time.perf_counter()
+        components = await load_scenario_components(scenario_id, db)
+        results = await simulation_executor.run_sensitivity(
+            options.iterations, components["risk_events"], components["business_assets"], components["defense_systems"],
+            {"swing": request.swing, "sobol_samples": request.sobol_samples}, plan_key=components["plan_key"],
+            seed=options.seed, sampling=options.sampling, correlation=components["correlation"],
+            importance_sampling=options.importance_sampling, cascade_factor=options.cascade_factor,
+            memory_budget_mb=options.memory_budget_mb, precision=options.precision
+        )
         
         return {
             "success": True,
-            "analysis_id": str(result.inserted_id),
+            "scenario_id": scenario_id,
+            **results,
+            "elapsed_seconds": time.perf_counter() - started
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid sensitivity request: {str(e)}")
+    except Exception as e:
+        print(f"Error in sensitivity analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Sensitivity analysis failed: {str(e)}")
+
+@router.post("/scenarios/{scenario_id}/horizon")
+async def run_horizon_analysis(scenario_id: str, request: HorizonRequest, db=Depends(get_database)):
+    """
+    Multi-year projection: annual and cumulative loss statistics, expected
+    cost of risk and ruin probability per year, with threat frequencies and
+    impacts trending and defense costs amortized over the horizon
+    """
+    options = request.options or AnalysisOptions()
+    if options.adaptive:
+        raise HTTPException(status_code=400, detail="Horizon projections need a fixed iteration count")
+    try:
+        started = time.perf_counter()
+        components = await load_scenario_components(scenario_id, db)
+        results = await simulation_executor.run_horizon(
+            options.iterations, components["risk_events"], components["business_assets"], components["defense_systems"],
+            request.horizon_options(), plan_key=components["plan_key"],
+            seed=options.seed, sampling=options.sampling, correlation=components["correlation"],
+            importance_sampling=options.importance_sampling, cascade_factor=options.cascade_factor,
+            memory_budget_mb=options.memory_budget_mb, precision=options.precision
+        )
+        
+        return {
+            "success": True,
+            "scenario_id": scenario_id,
+            **results,
+            "elapsed_seconds": time.perf_counter() - started
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid horizon request: {str(e)}")
+    except Exception as e:
+        print(f"Error in horizon analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Horizon analysis failed: {str(e)}")
+
+@router.post("/scenarios/{scenario_id}/optimize-defenses")
+async def optimize_defense_portfolio(scenario_id: str, request: DefenseOptimizationRequest, db=Depends(get_database)):
+    """
+    Subset of candidate defense systems that minimizes expected annual loss
+    or CVaR within the budget. Every portfolio is scored on the baseline's
+    recorded draws, so no further simulations are run.
+    """
+    options = request.options or AnalysisOptions()
+    try:
+        started = time.perf_counter()
+        components = await load_scenario_components(scenario_id, db)
+        samples, cached = await load_baseline_samples(components, options)
+        
+        report = await asyncio.to_thread(
+            optimize_defenses, samples, components["risk_events"], components["business_assets"],
+            components["defense_systems"], request.budget, request.objective, request.candidate_ids,
+            [defense.model_dump() for defense in request.proposed or []], request.max_evaluations,
+            options.cascade_factor
+        )
+        
+        return {
+            "success": True,
+            "scenario_id": scenario_id,
+            **report,
+            "baseline_samples": {**samples.describe(), "cached": cached},
+            "elapsed_seconds": time.perf_counter() - started
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid optimization request: {str(e)}")
+    except Exception as e:
+        print(f"Error in defense optimization: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Defense optimization failed: {str(e)}")
+
+@router.post("/scenarios/{scenario_id}/analysis-jobs", status_code=202)
+async def submit_analysis_job(
+    scenario_id: str,
+    options: Optional[AnalysisOptions] = Body(default=None),
+    db=Depends(get_database)
+):
+    """Queue a Monte Carlo analysis and return its job ID immediately"""
+    if not ObjectId.is_valid(scenario_id):
+        raise HTTPException(status_code=400, detail="Invalid scenario ID")
+    
+    require_distributed_cluster(options)
+    
+    # Verify scenario exists before taking a queue slot
+    scenario = await db.scenarios.find_one({"_id": ObjectId(scenario_id)})
+    if not scenario:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    
+    try:
+        job = job_manager.submit(scenario_id, lambda: _run_and_store_analysis(scenario_id, db, options))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+    
+    return {
+        "success": True,
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/api/analysis/analysis-jobs/{job['job_id']}",
+        "result_url": f"/api/analysis/analysis-jobs/{job['job_id']}/result"
+    }
+
+@router.get("/analysis-jobs")
+async def get_analysis_queue_status():
+    """Report queue depth and worker concurrency"""
+    return {
+        "success": True,
+        "queue": job_manager.get_stats()
+    }
+
+@router.get("/analysis-jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Poll the status of an analysis job"""
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    
+    return {
+        "success": True,
+        "data": serialize_job(job)
+    }
+
+@router.get("/analysis-jobs/{job_id}/result")
+async def get_analysis_job_result(job_id: str):
+    """Return the result of a finished analysis job"""
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Analysis job is still {job['status']}")
+    
+    return {
+        "success": True,
+        "job_id": job_id,
+        "analysis_id": job["result"].get("analysis_id"),
+        "data": job["result"]
+    }
+
+@router.get("/cache/stats")
+async def get_simulation_cache_stats():
+    """Report simulation result cache hit/miss counters"""
+    return {
+        "success": True,
+        "cache": simulation_cache.get_stats(),
+        # Recorded baseline draws for what-if comparisons
+        "samples": sample_cache.status()
+    }
+
+@router.get("/distributions")
+async def get_available_distributions():
+    """List the frequency and severity models, sampling modes, copulas and precisions the engine supports"""
+    return {
+        "success": True,
+        "frequency_distributions": list(FREQUENCY_DISTRIBUTIONS),
+        "severity_distributions": list_severity_distributions(),
+        "sampling_modes": list_samplers(),
+        "copulas": list(COPULAS),
+        "precisions": list(PRECISIONS)
+    }
+
+@router.delete("/cache")
+async def clear_simulation_cache(db=Depends(get_database)):
+    """Drop every cached simulation result"""
+    try:
+        removed = await simulation_cache.clear(db)
+        return {
+            "success": True,
+            "message": "Simulation cache cleared",
+            "persistent_entries_removed": removed
+        }
+    except Exception as e:
+        print(f"Error clearing simulation cache: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to clear simulation cache: {str(e)}")
+
+@router.post("/scenarios/{scenario_id}/results")
+async def store_analysis_results(scenario_id: str, results: Dict[str, Any], db=Depends(get_database)):
+    """Store Monte Carlo analysis results in database"""
+    if not ObjectId.is_valid(scenario_id):
+        raise HTTPException(status_code=400, detail="Invalid scenario ID")
+    
+    # Verify scenario exists
+    scenario = await db.scenarios.find_one({"_id": ObjectId(scenario_id)})
+    if not scenario:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    
+    try:
+        analysis_id = await save_analysis_result(scenario_id, results, db)
+        
+        return {
+            "success": True,
+            "analysis_id": str(analysis_id),
             "message": "Monte Carlo analysis results stored in database successfully",
             "stored_at": datetime.utcnow().isoformat()
         }
@@ -416,29 +1063,13 @@ async def get_analysis_summary(scenario_id: str, db=Depends(get_database)):
         print(f"Error generating analysis summary: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate analysis summary: {str(e)}")
 
-def calculate_security_roi(results: Dict[str, Any], defense_systems: List[Dict]) -> float:
+def calculate_security_roi(results: Dict[str, Any]) -> float:
     """
-    Calculate Security Return on Investment based on real Monte Carlo results
+    Security Return on Investment (%) of all defenses: the expected loss they
+    remove, simulated on the run's own draws (see app.services.defense_value),
+    net of their implementation and maintenance cost. Signed; 0 without
+    defense costs.
     """
-    total_defense_cost = sum(
-        defense.get('cost', 0) + defense.get('maintenance_cost', 0) 
-        for defense in defense_systems
-    )
-    
-    if total_defense_cost == 0:
-        return 0.0
-    
-    # More sophisticated ROI calculation using real simulation results
-    # Estimate risk reduction based on defense effectiveness
-    total_effectiveness = sum(defense.get('effectiveness', 0) for defense in defense_systems)
-    avg_effectiveness = total_effectiveness / len(defense_systems) if defense_systems else 0
-    
-    # Estimate potential loss reduction (conservative approach)
-    risk_reduction_factor = min(avg_effectiveness / 100 * 0.8, 0.9)  # Max 90% reduction
-    potential_loss_reduction = results.get("expected_annual_loss", 0) * risk_reduction_factor
-    
-    # Calculate ROI: (Benefit - Cost) / Cost * 100
-    net_benefit = potential_loss_reduction - total_defense_cost
-    roi = (net_benefit / total_defense_cost) * 100 if total_defense_cost > 0 else 0
-    
-    return max(0, roi)  # Ensure non-negative ROI
\ No newline at end of file
+    defense_value = results.get("defense_value") or {}
+    roi = defense_value.get("security_roi")
+    return float(roi) if roi is not None else 0.0
@@ -5,6 +5,7 @@ from bson import ObjectId
 from datetime import datetime
 from app.models.business_assets import BusinessAsset, BusinessAssetCreate, BusinessAssetUpdate
 from app.services.database import get_database
+from app.services.simulation_plan import invalidate_scenario_plan
 
 router = APIRouter()
 
@@ -74,6 +75,7 @@ async def create_business_asset(scenario_id: str, business_asset: BusinessAssetC
         business_asset_dict["created_at"] = datetime.utcnow()
         business_asset_dict["updated_at"] = datetime.utcnow()
         
+        await invalidate_scenario_plan(scenario_id, db)
         # Insert into database
         result = await db.business_assets.insert_one(business_asset_dict)
         
@@ -102,6 +104,7 @@ async def update_business_asset(scenario_id: str, asset_id: str, business_asset:
         update_data = {k: v for k, v in business_asset.model_dump().items() if v is not None}
         update_data["updated_at"] = datetime.utcnow()
         
+        await invalidate_scenario_plan(scenario_id, db)
         # Update in database
         result = await db.business_assets.update_one(
             {"_id": ObjectId(asset_id), "scenario_id": ObjectId(scenario_id)}, 
@@ -132,6 +135,8 @@ async def delete_business_asset(scenario_id: str, asset_id: str, db=Depends(get_
         if not ObjectId.is_valid(scenario_id) or not ObjectId.is_valid(asset_id):
             raise HTTPException(status_code=400, detail="Invalid ID format")
         
+        await invalidate_scenario_plan(scenario_id, db)
+        
         result = await db.business_assets.delete_one({
             "_id": ObjectId(asset_id), 
             "scenario_id": ObjectId(scenario_id)
@@ -5,6 +5,7 @@ from bson import ObjectId
 from datetime import datetime
 from app.models.defense_system import DefenseSystem, DefenseSystemCreate, DefenseSystemUpdate
 from app.services.database import get_database
+from app.services.simulation_plan import invalidate_scenario_plan
 
 router = APIRouter()
 
@@ -74,6 +75,7 @@ async def create_defense_system(scenario_id: str, defense_system: DefenseSystemC
         defense_system_dict["created_at"] = datetime.utcnow()
         defense_system_dict["updated_at"] = datetime.utcnow()
         
+        await invalidate_scenario_plan(scenario_id, db)
         # Insert into database
         result = await db.defense_systems.insert_one(defense_system_dict)
         
@@ -102,6 +104,7 @@ async def update_defense_system(scenario_id: str, defense_id: str, defense_syste
         update_data = {k: v for k, v in defense_system.model_dump().items() if v is not None}
         update_data["updated_at"] = datetime.utcnow()
         
+        await invalidate_scenario_plan(scenario_id, db)
         # Update in database
         result = await db.defense_systems.update_one(
             {"_id": ObjectId(defense_id), "scenario_id": ObjectId(scenario_id)}, 
@@ -132,6 +135,8 @@ async def delete_defense_system(scenario_id: str, defense_id: str, db=Depends(ge
         if not ObjectId.is_valid(scenario_id) or not ObjectId.is_valid(defense_id):
             raise HTTPException(status_code=400, detail="Invalid ID format")
         
+        await invalidate_scenario_plan(scenario_id, db)
+        
         result = await db.defense_systems.delete_one({
             "_id": ObjectId(defense_id), 
             "scenario_id": ObjectId(scenario_id)
@@ -5,6 +5,7 @@ from bson import ObjectId
 from datetime import datetime
 from app.models.risk_event import RiskEvent, RiskEventCreate, RiskEventUpdate
 from app.services.database import get_database
+from app.services.simulation_plan import invalidate_scenario_plan
 
 router = APIRouter()
 
@@ -74,6 +75,7 @@ async def create_risk_event(scenario_id: str, risk_event: RiskEventCreate, db=De
         risk_event_dict["created_at"] = datetime.utcnow()
         risk_event_dict["updated_at"] = datetime.utcnow()
         
+        await invalidate_scenario_plan(scenario_id, db)
         # Insert into database
         result = await db.risk_events.insert_one(risk_event_dict)
         
@@ -102,6 +104,7 @@ async def update_risk_event(scenario_id: str, event_id: str, risk_event: RiskEve
         update_data = {k: v for k, v in risk_event.model_dump().items() if v is not None}  # Use model_dump()
         update_data["updated_at"] = datetime.utcnow()
         
+        await invalidate_scenario_plan(scenario_id, db)
         # Update in database
         result = await db.risk_events.update_one(
             {"_id": ObjectId(event_id), "scenario_id": ObjectId(scenario_id)}, 
@@ -132,6 +135,8 @@ async def delete_risk_event(scenario_id: str, event_id: str, db=Depends(get_data
         if not ObjectId.is_valid(scenario_id) or not ObjectId.is_valid(event_id):
             raise HTTPException(status_code=400, detail="Invalid ID format")
         
+        await invalidate_scenario_plan(scenario_id, db)
+        
         result = await db.risk_events.delete_one({
             "_id": ObjectId(event_id), 
             "scenario_id": ObjectId(scenario_id)
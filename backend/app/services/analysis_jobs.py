@@ -0,0 +1,142 @@
+# backend/app/services/analysis_jobs.py
+# In-process job queue for Monte Carlo analyses. Submitting a job returns
+# immediately with a job ID; a fixed number of worker tasks drain the queue so
+# at most `concurrency` simulations hit the process pool at once, and a bounded
+# queue pushes back on bursts instead of piling up work.
+# Jobs live in memory, so each uvicorn worker process has its own queue.
+import os
+import uuid
+import asyncio
+import traceback
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+from app.services.simulation_executor import SIMULATION_WORKERS
+
+ANALYSIS_JOB_CONCURRENCY = int(os.getenv("ANALYSIS_JOB_CONCURRENCY", str(SIMULATION_WORKERS)))
+ANALYSIS_JOB_QUEUE_SIZE = int(os.getenv("ANALYSIS_JOB_QUEUE_SIZE", "100"))
+# Finished jobs are forgotten after this many seconds
+ANALYSIS_JOB_RETENTION_SECONDS = int(os.getenv("ANALYSIS_JOB_RETENTION_SECONDS", "3600"))
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+class QueueFullError(Exception):
+    """Raised when the analysis queue cannot accept more jobs"""
+
+class AnalysisJobManager:
+    def __init__(
+        self,
+        concurrency: int = ANALYSIS_JOB_CONCURRENCY,
+        max_queue_size: int = ANALYSIS_JOB_QUEUE_SIZE,
+        retention_seconds: int = ANALYSIS_JOB_RETENTION_SECONDS
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_queue_size = max(1, max_queue_size)
+        self.retention_seconds = retention_seconds
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.running_count = 0
+
+    async def start(self):
+        """Create the queue and spawn the worker tasks"""
+        if self.workers:
+            return
+
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.workers = [
+            asyncio.create_task(self._worker(index)) for index in range(self.concurrency)
+        ]
+        print(f"✓ Analysis job queue started ({self.concurrency} workers, {self.max_queue_size} slots)")
+
+    async def stop(self):
+        """Cancel the worker tasks; queued jobs are dropped"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        print("✓ Analysis job queue stopped")
+
+    def submit(self, scenario_id: str, handler: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Enqueue a job, raising QueueFullError when there is no room"""
+        if self.queue is None:
+            raise RuntimeError("Analysis job queue has not been started")
+
+        self._prune_finished_jobs()
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "scenario_id": scenario_id,
+            "status": "queued",
+            "submitted_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+
+        try:
+            self.queue.put_nowait((job, handler))
+        except asyncio.QueueFull:
+            raise QueueFullError(
+                f"Analysis queue is full ({self.max_queue_size} jobs waiting), retry later"
+            )
+
+        self.jobs[job["job_id"]] = job
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        counts = {status: 0 for status in JOB_STATUSES}
+        for job in self.jobs.values():
+            counts[job["status"]] += 1
+
+        return {
+            "concurrency": self.concurrency,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "running": self.running_count,
+            "jobs": counts,
+        }
+
+    async def _worker(self, index: int):
+        while True:
+            job, handler = await self.queue.get()
+            job["status"] = "running"
+            job["started_at"] = datetime.utcnow()
+            self.running_count += 1
+
+            try:
+                job["result"] = await handler()
+                job["status"] = "done"
+            except Exception as e:
+                # HTTPException carries its message in .detail
+                job["error"] = getattr(e, "detail", None) or str(e)
+                job["status"] = "failed"
+                print(f"Analysis job {job['job_id']} failed: {job['error']}")
+                traceback.print_exc()
+            finally:
+                job["finished_at"] = datetime.utcnow()
+                self.running_count -= 1
+                self.queue.task_done()
+
+    def _prune_finished_jobs(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention_seconds)
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["finished_at"] and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a job record to API response format (result is served separately)"""
+    data = {key: value for key, value in job.items() if key != "result"}
+    for field in ["submitted_at", "started_at", "finished_at"]:
+        if isinstance(data.get(field), datetime):
+            data[field] = data[field].isoformat()
+    data["has_result"] = job["result"] is not None
+    return data
+
+job_manager = AnalysisJobManager()
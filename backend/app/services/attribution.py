@@ -0,0 +1,198 @@
+# backend/app/services/attribution.py
+# Per-risk-event loss attribution from the vectorized engine's per-event loss
+# columns. Each event gets its mean (mitigated) loss, its occurrence rate and
+# its Euler contributions to VaR95 and CVaR95: the expected event loss given
+# that the total lands at (VaR) or beyond (CVaR) the 95th percentile.
+# Contributions add up to the total, so the shares say which events drive
+# the tail. Accumulators are mergeable like StreamingStatistics; memory is
+# bounded by keeping only the per-event rows of the worst iterations. When a
+# memory budget caps those rows below the full 95% tail, the contributions
+# come from the worst rows kept and are rescaled to the run's VaR and CVaR.
+import math
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+# Confidence level of the allocated risk measures
+ALLOCATION_LEVEL = 0.95
+# Iterations whose tail probability is within this distance of 5% estimate
+# the VaR contribution (a VaR allocation needs a window around the quantile)
+VAR_WINDOW = 0.005
+
+def tail_capacity(iterations: int, weighted: bool = False) -> int:
+    """
+    Rows to keep so the CVaR tail and the VaR window are always complete.
+    Importance-sampled runs oversample the tail, so they keep every row.
+    """
+    if weighted:
+        return iterations
+    return int(math.ceil((1 - ALLOCATION_LEVEL + VAR_WINDOW) * iterations)) + 1
+
+class LossAttribution:
+    """Mergeable per-event loss sums plus the per-event rows of the worst iterations"""
+
+    def __init__(self, risk_events: List[Dict], capacity: int):
+        self.events = [
+            {"risk_event_id": str(event.get('_id', event.get('id', ''))), "name": event.get('name', '')}
+            for event in risk_events
+        ]
+        self.capacity = capacity
+        event_count = len(risk_events)
+        # Per-block (weight, loss sums, occurrences), summed only at the end
+        # so the result does not depend on how blocks were split over workers
+        self._block_totals: List[np.ndarray] = []
+        self.tail_losses = np.empty(0)
+        self.tail_weights = np.empty(0)
+        self.tail_rows = np.empty((0, event_count))
+        self._pending = []
+        self._pending_rows = 0
+        self._cutoff = -math.inf
+        # Whether the kept rows covered the whole tail at the last to_result()
+        self.tail_complete = True
+
+    def update(
+        self,
+        losses: np.ndarray,
+        event_losses: np.ndarray,
+        occurred: np.ndarray,
+        weights: Optional[np.ndarray] = None
+    ):
+        """
+        Fold in one block: total losses, the (iterations x events) mitigated
+        loss matrix, which events occurred, and importance weights if any
+        """
+        if weights is None:
+            weights = np.ones(len(losses))
+        self._block_totals.append(np.concatenate(([weights.sum()], weights @ event_losses, weights @ occurred)))
+        self._keep_tail(losses, weights, event_losses)
+
+    def merge(self, other: "LossAttribution"):
+        self._block_totals.extend(other._block_totals)
+        other._compact()
+        self._keep_tail(other.tail_losses, other.tail_weights, other.tail_rows)
+
+    def to_result(self, value_at_risk: float, conditional_var: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Per-event attribution given the run's VaR95 (and CVaR95, used when the tail ties at VaR or was truncated)"""
+        if not self._block_totals:
+            return []
+        self._compact()
+        totals = np.sum(self._block_totals, axis=0)
+        event_count = len(self.events)
+        weight_total = totals[0]
+        mean_losses = totals[1:event_count + 1] / weight_total
+        occurrence_rates = totals[event_count + 1:] / weight_total
+
+        # Tail probability of each kept row, counted from the worst one down
+        order = np.argsort(self.tail_losses, kind="stable")[::-1]
+        losses, weights, rows = self.tail_losses[order], self.tail_weights[order], self.tail_rows[order]
+        exceedance = (np.cumsum(weights) - weights / 2) / weight_total
+        self.tail_complete = bool(
+            len(losses) < self.capacity or exceedance[-1] >= 1 - ALLOCATION_LEVEL + VAR_WINDOW
+        )
+
+        if self.tail_complete:
+            cvar_contributions = self._tail_means(losses, weights, rows, value_at_risk, conditional_var)
+            window = np.abs(exceedance - (1 - ALLOCATION_LEVEL)) <= VAR_WINDOW
+        else:
+            # Only the worst rows survived: they stand in for the tail, and the
+            # least bad of them for the VaR window
+            cvar_contributions = self._conditional_means(rows, weights, np.ones(len(losses), dtype=bool))
+            if conditional_var is not None and cvar_contributions.sum() > 0:
+                cvar_contributions *= conditional_var / cvar_contributions.sum()
+            window = exceedance >= exceedance[-1] - 2 * VAR_WINDOW
+        var_contributions = self._conditional_means(rows, weights, window)
+        window_mean = self._conditional_means(losses[:, None], weights, window)[0]
+        # Rescale so the contributions add up to VaR exactly
+        if window_mean > 0:
+            var_contributions *= value_at_risk / window_mean
+
+        return [
+            {
+                **event,
+                "mean_loss": float(mean_losses[index]),
+                "expected_loss_share": _share(mean_losses, index),
+                "occurrence_rate": float(occurrence_rates[index]),
+                "var_95_contribution": float(var_contributions[index]),
+                "var_95_share": _share(var_contributions, index),
+                "cvar_95_contribution": float(cvar_contributions[index]),
+                "cvar_95_share": _share(cvar_contributions, index),
+            }
+            for index, event in enumerate(self.events)
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the kept and queued tail rows"""
+        kept = self.tail_losses.nbytes + self.tail_weights.nbytes + self.tail_rows.nbytes
+        return kept + sum(sum(array.nbytes for array in block) for block in self._pending)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"tail_capacity": self.capacity, "tail_complete": self.tail_complete}
+
+    def _tail_means(
+        self,
+        losses: np.ndarray,
+        weights: np.ndarray,
+        rows: np.ndarray,
+        value_at_risk: float,
+        conditional_var: Optional[float]
+    ) -> np.ndarray:
+        """
+        CVaR contributions over the same tail as the run's CVaR. When losses tie
+        at VaR (say VaR95 = 0) the headline CVaR counts only part of the tied
+        mass, or tied rows beyond the kept ones, so the tied rows are weighted
+        to the mass that reproduces conditional_var.
+        """
+        tied = losses == value_at_risk
+        if conditional_var is None or not tied.any():
+            return self._conditional_means(rows, weights, losses >= value_at_risk)
+        tied_means = self._conditional_means(rows, weights, tied)
+        if conditional_var <= value_at_risk:
+            return tied_means
+        above = losses > value_at_risk
+        above_weight = weights[above].sum()
+        # Solve conditional_var = (above sum + tied mass * VaR) / (above weight + tied mass)
+        tied_mass = max(0.0, (weights[above] @ losses[above] - above_weight * conditional_var)
+                        / (conditional_var - value_at_risk))
+        if above_weight + tied_mass == 0:
+            return tied_means
+        return (weights[above] @ rows[above] + tied_mass * tied_means) / (above_weight + tied_mass)
+
+    def _conditional_means(self, rows: np.ndarray, weights: np.ndarray, selected: np.ndarray) -> np.ndarray:
+        total = weights[selected].sum()
+        if total == 0:
+            return np.zeros(rows.shape[1])
+        return weights[selected] @ rows[selected] / total
+
+    def _keep_tail(self, losses: np.ndarray, weights: np.ndarray, rows: np.ndarray):
+        """
+        Queue candidate tail rows; they are compacted to the worst `capacity`
+        only once the queue outgrows the kept tail, so the cost is amortized
+        """
+        # Anything below the current cut-off can never make it back in. Selecting
+        # also copies, so callers may reuse their buffers.
+        candidates = losses > self._cutoff
+        losses, weights, rows = losses[candidates], weights[candidates], rows[candidates]
+        if len(losses) == 0:
+            return
+        self._pending.append((losses, weights, rows))
+        self._pending_rows += len(losses)
+        if self._pending_rows > max(self.capacity, len(self.tail_losses)):
+            self._compact()
+
+    def _compact(self):
+        if not self._pending:
+            return
+        losses = np.concatenate([self.tail_losses] + [block[0] for block in self._pending])
+        weights = np.concatenate([self.tail_weights] + [block[1] for block in self._pending])
+        rows = np.concatenate([self.tail_rows] + [block[2] for block in self._pending])
+        self._pending, self._pending_rows = [], 0
+        if len(losses) > self.capacity:
+            keep = np.argpartition(losses, len(losses) - self.capacity)[-self.capacity:]
+            losses, weights, rows = losses[keep], weights[keep], rows[keep]
+        self.tail_losses, self.tail_weights, self.tail_rows = losses, weights, rows
+        if len(losses) >= self.capacity:
+            self._cutoff = float(losses.min())
+
+def _share(contributions: np.ndarray, index: int) -> float:
+    total = contributions.sum()
+    return float(contributions[index] / total) if total > 0 else 0.0
@@ -0,0 +1,230 @@
+# backend/app/services/copula.py
+# Correlated risk events. A scenario can declare a correlation structure:
+#   {
+#     "copula": "gaussian" | "t",           # default gaussian
+#     "degrees_of_freedom": 4,              # t copula only
+#     "correlate_severity": true,           # also correlate first-occurrence impacts
+#     "groups": [{"events": ["Ransomware", "Downtime"], "correlation": 0.6}],
+#     "matrix": {"events": ["A", "B"], "values": [[1, 0.3], [0.3, 1]]}
+#   }
+# Events are referenced by name or id. Only the correlated events' sampler
+# columns are touched: uniforms -> normals (drawn directly for plain random
+# sampling) -> multiplied by the Cholesky
+# factor -> (t: divided by a shared chi mixing variable). Occurrence counts
+# are read straight off the latent values with count tables mapped into
+# latent space once per scenario; impacts go back to uniforms (the t CDF is
+# tabulated, like the PERT inverse). The correlation matrix is split into
+# connected blocks, each with its own cached Cholesky factor, so independent
+# events cost nothing and a block of k events costs O(k^2) per iteration.
+from functools import lru_cache
+import numpy as np
+from scipy import special
+from scipy.sparse.csgraph import connected_components
+from typing import List, Dict, Any, Optional, Tuple
+from app.services.distributions import interp_uniform_grid
+from app.services.samplers import UniformSampler
+
+COPULAS = ("gaussian", "t")
+DEFAULT_DEGREES_OF_FREEDOM = 4.0
+
+# Keep transformed uniforms strictly inside (0, 1) so inverse CDFs stay finite
+_ABOVE_ZERO = 2.0 ** -53
+_BELOW_ONE = 1.0 - 2.0 ** -53
+
+# The t CDF is tabulated against w = x / sqrt(df + x^2), which maps the real
+# line onto (-1, 1) and keeps the table smooth out to the far tails
+_T_TABLE_SIZE = 16385
+
+@lru_cache(maxsize=256)
+def _cholesky_factor(matrix_bytes: bytes, size: int) -> np.ndarray:
+    """Lower Cholesky factor of a correlation block, shared by every run using it"""
+    matrix = np.frombuffer(matrix_bytes, dtype=float).reshape(size, size)
+    factor = np.linalg.cholesky(matrix)
+    factor.setflags(write=False)
+    return factor
+
+def cholesky_factor(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.ascontiguousarray(matrix, dtype=float)
+    try:
+        return _cholesky_factor(matrix.tobytes(), len(matrix))
+    except np.linalg.LinAlgError:
+        raise ValueError("Correlation matrix is not positive definite")
+
+@lru_cache(maxsize=32)
+def _t_cdf_table(degrees_of_freedom: float) -> np.ndarray:
+    w = np.linspace(-1.0, 1.0, _T_TABLE_SIZE)[1:-1]
+    x = w * np.sqrt(degrees_of_freedom / (1 - w * w))
+    table = np.concatenate(([0.0], special.stdtr(degrees_of_freedom, x), [1.0]))
+    table.setflags(write=False)
+    return table
+
+def describe_correlation(spec: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Copula settings reported with a result, or None for independent events"""
+    if not spec:
+        return None
+    copula = spec.get("copula") or "gaussian"
+    return {
+        "copula": copula,
+        "degrees_of_freedom": float(spec.get("degrees_of_freedom") or DEFAULT_DEGREES_OF_FREEDOM)
+        if copula == "t" else None,
+        "correlate_severity": bool(spec.get("correlate_severity", True)),
+    }
+
+class Copula:
+    """
+    Correlation structure of one scenario, resolved against its risk events.
+    Built once per scenario; apply() is the per-block vectorized transform.
+    """
+
+    def __init__(self, spec: Dict[str, Any], risk_events: List[Dict], count_tables: List[Optional[np.ndarray]]):
+        self.name = spec.get("copula") or "gaussian"
+        if self.name not in COPULAS:
+            raise ValueError(f"Unknown copula '{self.name}'. Available: {', '.join(COPULAS)}")
+        self.degrees_of_freedom = float(spec.get("degrees_of_freedom") or DEFAULT_DEGREES_OF_FREEDOM)
+        if self.degrees_of_freedom <= 0:
+            raise ValueError("degrees_of_freedom must be positive")
+        self.correlate_severity = bool(spec.get("correlate_severity", True))
+        self.event_count = len(risk_events)
+
+        correlation = self._correlation_matrix(spec, risk_events)
+        self.blocks = self._factor_blocks(correlation)
+        self.indices = np.concatenate([indices for indices, _ in self.blocks]) if self.blocks \
+            else np.empty(0, dtype=np.int64)
+
+        # Count tables in latent space: count = #{thresholds <= latent value}.
+        # A Bernoulli event occurs on a low uniform, i.e. a high latent value.
+        self.thresholds = []
+        self.bernoulli = np.array([count_tables[index] is None for index in self.indices], dtype=bool)
+        for index in self.indices:
+            table = count_tables[index]
+            if table is None:
+                table = np.array([1 - risk_events[index].get('probability', 0) / 100])
+            self.thresholds.append(self._quantile(table))
+
+    def apply(self, uniforms: np.ndarray, counts: np.ndarray, sampler: UniformSampler):
+        """
+        Overwrite the correlated events' counts and, in place, their
+        first-impact uniforms. uniforms is the (iterations x 2 * events)
+        sampler matrix: occurrence columns followed by first-impact columns.
+        """
+        mixing = self._mixing(sampler, len(uniforms))
+        latent = self._latent(sampler.normals(uniforms[:, self.indices]), mixing)
+        for column, index in enumerate(self.indices):
+            counts[:, index] = np.searchsorted(self.thresholds[column], latent[:, column], side="right")
+
+        if self.correlate_severity:
+            columns = self.indices + self.event_count
+            uniforms[:, columns] = self._cdf(self._latent(sampler.normals(uniforms[:, columns]), mixing))
+
+    def count_uniforms(self, uniforms: np.ndarray, sampler: UniformSampler):
+        """
+        Like apply(), but leave the correlated events' occurrence columns as
+        correlated uniforms instead of counts, so counts can be read off for
+        other occurrence probabilities. Bernoulli columns are flipped to
+        match sample_counts, where an event occurs on a low uniform.
+        """
+        mixing = self._mixing(sampler, len(uniforms))
+        occurrence = self._cdf(self._latent(sampler.normals(uniforms[:, self.indices]), mixing))
+        occurrence[:, self.bernoulli] = 1 - occurrence[:, self.bernoulli]
+        uniforms[:, self.indices] = np.minimum(occurrence, _BELOW_ONE)
+
+        if self.correlate_severity:
+            columns = self.indices + self.event_count
+            uniforms[:, columns] = self._cdf(self._latent(sampler.normals(uniforms[:, columns]), mixing))
+
+    def _mixing(self, sampler: UniformSampler, rows: int) -> Optional[np.ndarray]:
+        if self.name != "t":
+            return None
+        # One chi-square shock per iteration drives the joint tail
+        shocks = sampler.rng.chisquare(self.degrees_of_freedom, rows)
+        return np.sqrt(shocks / self.degrees_of_freedom)
+
+    def _latent(self, latent: np.ndarray, mixing: Optional[np.ndarray]) -> np.ndarray:
+        """Correlated normal (or t) values; columns are ordered as self.indices"""
+        start = 0
+        for indices, factor in self.blocks:
+            stop = start + len(indices)
+            latent[:, start:stop] = latent[:, start:stop] @ factor.T
+            start = stop
+        if mixing is not None:
+            latent /= mixing[:, None]
+        return latent
+
+    def _cdf(self, latent: np.ndarray) -> np.ndarray:
+        if self.name == "gaussian":
+            uniforms = special.ndtr(latent)
+        else:
+            w = latent / np.sqrt(self.degrees_of_freedom + latent * latent)
+            uniforms = interp_uniform_grid((w + 1) / 2, _t_cdf_table(self.degrees_of_freedom))
+        return np.clip(uniforms, 0.0, _BELOW_ONE)
+
+    def _quantile(self, probabilities: np.ndarray) -> np.ndarray:
+        probabilities = np.asarray(probabilities, dtype=float)
+        if self.name == "gaussian":
+            return special.ndtri(probabilities)
+        # stdtrit does not return -inf at 0
+        quantiles = special.stdtrit(self.degrees_of_freedom, np.clip(probabilities, _ABOVE_ZERO, 1.0))
+        return np.where(probabilities <= 0, -np.inf, quantiles)
+
+    def _correlation_matrix(self, spec: Dict[str, Any], risk_events: List[Dict]) -> np.ndarray:
+        lookup = {}
+        for index, event in enumerate(risk_events):
+            for key in (event.get("name"), event.get("_id"), event.get("id")):
+                if key is not None:
+                    lookup[str(key)] = index
+
+        def resolve(references) -> np.ndarray:
+            indices = []
+            for reference in references or []:
+                if str(reference) not in lookup:
+                    raise ValueError(f"Correlation references unknown risk event '{reference}'")
+                indices.append(lookup[str(reference)])
+            if len(set(indices)) != len(indices):
+                raise ValueError("A correlation group lists the same risk event twice")
+            return np.array(indices, dtype=np.int64)
+
+        correlation = np.eye(self.event_count)
+        for group in spec.get("groups") or []:
+            indices = resolve(group.get("events"))
+            rho = float(group.get("correlation", 0))
+            if not -1 < rho < 1:
+                raise ValueError("Group correlation must be strictly between -1 and 1")
+            correlation[np.ix_(indices, indices)] = rho
+
+        matrix = spec.get("matrix")
+        if matrix:
+            indices = resolve(matrix.get("events"))
+            values = np.asarray(matrix.get("values"), dtype=float)
+            if values.shape != (len(indices), len(indices)):
+                raise ValueError("Correlation matrix size must match its events list")
+            if not np.allclose(values, values.T) or not np.allclose(np.diag(values), 1) \
+                    or np.abs(values).max() > 1:
+                raise ValueError("Correlation matrix must be symmetric with unit diagonal and entries in [-1, 1]")
+            correlation[np.ix_(indices, indices)] = values
+
+        np.fill_diagonal(correlation, 1.0)
+        return correlation
+
+    def _factor_blocks(self, correlation: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Cholesky factors of the connected blocks; uncorrelated events are left out"""
+        linked = correlation != 0
+        np.fill_diagonal(linked, False)
+        component_count, labels = connected_components(linked, directed=False)
+        blocks = []
+        for component in range(component_count):
+            indices = np.flatnonzero(labels == component)
+            if len(indices) < 2:
+                continue
+            blocks.append((indices, cholesky_factor(correlation[np.ix_(indices, indices)])))
+        return blocks
+
+def build_copula(
+    spec: Optional[Dict[str, Any]],
+    risk_events: List[Dict],
+    count_tables: List[Optional[np.ndarray]]
+) -> Optional[Copula]:
+    """Copula for a scenario's correlation spec, or None when events are independent"""
+    if not spec:
+        return None
+    copula = Copula(spec, risk_events, count_tables)
+    return copula if len(copula.indices) else None
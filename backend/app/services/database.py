@@ -104,7 +104,8 @@ async def create_collections():
         "risk_events",
         "business_assets",
         "defense_systems",
-        "analysis_results"  # Collection for storing Monte Carlo results
+        "analysis_results",  # Collection for storing Monte Carlo results
+        "simulation_cache"  # Persistent tier of the simulation result cache
     ]
     
     existing_collections = await database.list_collection_names()
@@ -193,6 +194,13 @@ async def create_indexes_safely():
     except Exception as e:
         print(f"⚠ Analysis results indexes may already exist: {e}")
     
+    # Simulation cache collection - MongoDB drops entries once expires_at passes
+    try:
+        await database.simulation_cache.create_index("expires_at", expireAfterSeconds=0)
+        print("✓ Created simulation cache indexes")
+    except Exception as e:
+        print(f"⚠ Simulation cache indexes may already exist: {e}")
+    
     print("✓ Database indexes created/verified successfully")
 
 async def cleanup_existing_data():
@@ -0,0 +1,110 @@
+# backend/app/services/defense_value.py
+# Security ROI from the simulation itself. Every block's unmitigated
+# (iterations x events) losses are also pushed through the mitigation of
+# other defense configurations: no defenses at all, and every defense but
+# one (leave-one-out). The loss each configuration adds over the run's own
+# losses is measured on the same occurrences and impacts, so it carries no
+# sampling noise of its own, and it costs one small matrix product per block
+# instead of another run.
+#   - expected loss reduction of all defenses: undefended minus defended
+#   - marginal reduction of a defense: the loss added by removing only it
+# ROI is (reduction - cost) / cost, with cost = implementation plus annual
+# maintenance. Marginal reductions of overlapping defenses sum to less than
+# the total, since defenses on the same asset compound.
+# Sums are kept per block like LossAttribution, so shards merge exactly.
+import numpy as np
+from typing import List, Dict, Any, Optional
+from app.services.cascade import build_cascade
+from app.services.what_if import defense_reference
+
+def defense_cost(defense: Dict) -> float:
+    """Implementation plus annual maintenance cost"""
+    return float(defense.get('cost', 0) or 0) + float(defense.get('maintenance_cost', 0) or 0)
+
+class DefenseValue:
+    """Mergeable loss increases of the no-defense and leave-one-out configurations"""
+
+    def __init__(self, plan, business_assets: List[Dict], defense_systems: List[Dict], cascade_factor: float):
+        count = plan.defense_count
+        # Row 0: no defenses; row d + 1: every defense but d
+        configurations = np.ones((count + 1, count))
+        configurations[0] = 0
+        configurations[1:] -= np.eye(count)
+        self.mitigation = np.ascontiguousarray(plan.mitigation_model.portfolio_factors(configurations))
+        self.cascades = None
+        if plan.cascade is not None:
+            self.cascades = [
+                build_cascade(business_assets, plan.mitigation_model, cascade_factor, active)
+                for active in configurations
+            ]
+        self.defenses = [
+            {"defense_id": defense_reference(defense), "name": defense.get('name', ''), "cost": defense_cost(defense)}
+            for defense in defense_systems
+        ]
+        # Per block: weight sum, squared weight sum, then per configuration the
+        # weighted increases, squared-weight increases and squared-weight squares
+        self._block_totals: List[np.ndarray] = []
+
+    def update(self, event_losses: np.ndarray, losses: np.ndarray, weights: Optional[np.ndarray] = None):
+        """Fold in one block: its unmitigated per-event losses and its (defended) total losses"""
+        if weights is None:
+            weights = np.ones(len(losses))
+        increases = np.empty((len(self.mitigation), len(losses)))
+        # Configurations are pushed through in groups no larger than the event matrix
+        step = max(1, event_losses.shape[1])
+        for start in range(0, len(self.mitigation), step):
+            rows = slice(start, start + step)
+            increases[rows] = self.mitigation[rows].astype(event_losses.dtype) @ event_losses.T
+        if self.cascades is not None:
+            for row, cascade in enumerate(self.cascades):
+                increases[row] += cascade.losses(event_losses)
+        increases -= losses
+        squared = weights * weights
+        self._block_totals.append(np.concatenate((
+            [weights.sum(), squared.sum()], increases @ weights, increases @ squared, (increases * increases) @ squared
+        )))
+
+    def merge(self, other: "DefenseValue"):
+        self._block_totals.extend(other._block_totals)
+
+    @property
+    def nbytes(self) -> int:
+        return self.mitigation.nbytes + sum(block.nbytes for block in self._block_totals)
+
+    def to_result(self, expected_loss: float) -> Optional[Dict[str, Any]]:
+        """Loss reductions and ROI given the run's (defended) expected annual loss"""
+        if not self._block_totals:
+            return None
+        totals = np.sum(self._block_totals, axis=0)
+        weight_total, squared_total = totals[0], totals[1]
+        increases, squared_increases, squares = np.split(totals[2:], 3)
+        reductions = increases / weight_total
+        # Self-normalized standard error, as for the expected loss itself
+        variances = squares - 2 * reductions * squared_increases + reductions ** 2 * squared_total
+        standard_errors = np.sqrt(np.maximum(variances, 0)) / weight_total
+
+        def roi(reduction: float, cost: float) -> Optional[float]:
+            return float((reduction - cost) / cost * 100) if cost > 0 else None
+
+        total_cost = sum(defense["cost"] for defense in self.defenses)
+        defenses = [
+            {
+                **defense,
+                "marginal_loss_reduction": float(reductions[index + 1]),
+                "standard_error": float(standard_errors[index + 1]),
+                "marginal_roi": roi(reductions[index + 1], defense["cost"]),
+            }
+            for index, defense in enumerate(self.defenses)
+        ]
+        return {
+            "method": "common_random_numbers",
+            "defended_expected_loss": float(expected_loss),
+            "undefended_expected_loss": float(expected_loss + reductions[0]),
+            "expected_loss_reduction": float(reductions[0]),
+            "standard_error": float(standard_errors[0]),
+            "total_cost": float(total_cost),
+            "security_roi": roi(reductions[0], total_cost),
+            # Below the total when defenses protect the same assets
+            "marginal_reduction_sum": float(reductions[1:].sum()),
+            "defenses": sorted(defenses, key=lambda defense: -defense["marginal_loss_reduction"]),
+        }
@@ -0,0 +1,351 @@
+# backend/app/services/distributed.py
+# Shards a run's random stream blocks across the worker nodes listed in SIMULATION_CLUSTER; a node is
+#     SIMULATION_CLUSTER_TOKEN=... python -m app.services.distributed worker --listen tcp://0.0.0.0:7400
+# Frames carry an HMAC of the payload under the shared token and are never unpickled unverified.
+import os
+import sys
+import hmac
+import time
+import pickle
+import struct
+import asyncio
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from app.services.simulation_executor import _simulate_blocks, split_blocks, merge_shards
+
+# Comma separated node addresses, e.g. "tcp://10.0.0.5:7400,unix:///run/sim/worker.sock"
+SIMULATION_CLUSTER = os.getenv("SIMULATION_CLUSTER", "")
+# A node silent for this many seconds is dropped and its shard goes back to the queue
+SIMULATION_SHARD_TIMEOUT = float(os.getenv("SIMULATION_SHARD_TIMEOUT", "600"))
+CONNECT_TIMEOUT = 10.0
+# Shards per node: enough for fast nodes to pick up the slack of slow ones.
+# Only the scheduling depends on it, never the result.
+SHARDS_PER_WORKER = 4
+MAX_FRAME_BYTES = 2 ** 31
+_HEADER = struct.Struct("!Q32s")
+# _simulate_blocks(iterations, engine_options, risk_events, business_assets, defense_systems, blocks, plan_key)
+SHARD_ARGUMENTS = 7
+
+class ProtocolError(ConnectionError):
+    """A frame that is oversized or fails authentication"""
+
+class ClusterNotConfiguredError(Exception):
+    """Raised when a distributed run is asked for without worker nodes or a cluster token"""
+
+def cluster_token(token: Optional[str] = None) -> bytes:
+    token = token or os.getenv("SIMULATION_CLUSTER_TOKEN", "")
+    if not token:
+        raise ClusterNotConfiguredError("SIMULATION_CLUSTER_TOKEN must be set to run distributed simulations")
+    return token.encode()
+
+def cluster_addresses() -> List[str]:
+    return [address.strip() for address in SIMULATION_CLUSTER.split(",") if address.strip()]
+
+def require_cluster() -> None:
+    """Raise ClusterNotConfiguredError unless worker nodes and the cluster token are configured"""
+    if not cluster_addresses():
+        raise ClusterNotConfiguredError("No simulation worker nodes configured (set SIMULATION_CLUSTER)")
+    cluster_token()
+
+def parse_address(address: str) -> Tuple[str, Any]:
+    """("unix", path) for unix:///path, else ("tcp", (host, port)) for tcp://host:port or host:port"""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    host, _, port = address[len("tcp://"):].rpartition(":") if address.startswith("tcp://") else address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid worker address {address!r}: expected tcp://host:port or unix:///path")
+    return "tcp", (host.strip("[]"), int(port))
+
+async def _connect(address: str):
+    kind, target = parse_address(address)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(target)
+    return await asyncio.open_connection(*target)
+
+async def send_frame(writer: asyncio.StreamWriter, message: Any, key: bytes):
+    payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    writer.write(_HEADER.pack(len(payload), hmac.new(key, payload, hashlib.sha256).digest()))
+    writer.write(payload)
+    await writer.drain()
+
+async def receive_frame(reader: asyncio.StreamReader, key: bytes) -> Any:
+    size, digest = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ProtocolError(f"Frame of {size} bytes exceeds the limit")
+    payload = await reader.readexactly(size)
+    if not hmac.compare_digest(digest, hmac.new(key, payload, hashlib.sha256).digest()):
+        raise ProtocolError("Frame failed authentication")
+    return pickle.loads(payload)
+
+class SimulationWorker:
+    """Serves simulation shards to coordinators holding the cluster token"""
+
+    def __init__(self, address: str, token: Optional[str] = None):
+        self.address = address
+        self.key = cluster_token(token)
+        self.shards_served = 0
+        # Shards run one at a time on a single thread: the compiled plan cache
+        # and the engine's other per-process caches are not thread-safe
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="simulation-shard")
+
+    async def start(self) -> asyncio.AbstractServer:
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            return await asyncio.start_unix_server(self._serve, target)
+        return await asyncio.start_server(self._serve, *target)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request = await receive_frame(reader, self.key)
+                error = _invalid_request(request)
+                if error is not None:
+                    shard = request.get("shard") if isinstance(request, dict) else None
+                    await send_frame(writer, {"status": "invalid", "shard": shard, "error": error}, self.key)
+                    continue
+                if request["type"] == "ping":
+                    await send_frame(writer, {"status": "ok", "shards_served": self.shards_served}, self.key)
+                    continue
+                # Simulated on the shard thread, so pings are still answered meanwhile
+                try:
+                    result = await loop.run_in_executor(self._executor, _simulate_blocks, *request["arguments"])
+                    reply = {"status": "ok", "shard": request["shard"], "result": result}
+                    self.shards_served += 1
+                except ValueError as error:
+                    reply = {"status": "invalid", "shard": request["shard"], "error": str(error)}
+                except Exception as error:
+                    reply = {"status": "failed", "shard": request["shard"], "error": repr(error)}
+                await send_frame(writer, reply, self.key)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+def _invalid_request(request: Any) -> Optional[str]:
+    """Why an authenticated frame is not a request this worker serves, or None"""
+    if not isinstance(request, dict) or request.get("type") not in ("ping", "shard"):
+        return "Expected a ping or shard request"
+    if request["type"] == "shard":
+        arguments = request.get("arguments")
+        if not isinstance(request.get("shard"), int) or not isinstance(arguments, tuple) or len(arguments) != SHARD_ARGUMENTS:
+            return f"A shard request needs an integer shard and a tuple of {SHARD_ARGUMENTS} arguments"
+    return None
+
+class _ShardQueue:
+    """Pending shards, finished results and lost nodes of one distributed run"""
+
+    def __init__(self, shard_count: int):
+        self.pending: asyncio.Queue = asyncio.Queue()
+        for index in range(shard_count):
+            self.pending.put_nowait(index)
+        self.results: Dict[int, Tuple] = {}
+        self.assignments: Dict[int, str] = {}
+        self.lost: Dict[str, str] = {}
+        self.reassigned = 0
+        self.error: Optional[Exception] = None
+        self.changed = asyncio.Event()
+
+    def complete(self, index: int, result: Tuple, address: str):
+        self.results[index] = result
+        self.assignments[index] = address
+        self.changed.set()
+
+    def lose(self, address: str, reason: str, index: Optional[int] = None):
+        if index is not None:
+            self.pending.put_nowait(index)
+            self.reassigned += 1
+        self.lost[address] = reason
+        self.changed.set()
+
+    def fail(self, error: Exception):
+        self.error = error
+        self.changed.set()
+
+class SimulationCoordinator:
+    """Splits a fixed-size run into shards and farms them out to worker nodes"""
+
+    def __init__(
+        self,
+        addresses: List[str],
+        token: Optional[str] = None,
+        shard_timeout: float = SIMULATION_SHARD_TIMEOUT,
+        shards_per_worker: int = SHARDS_PER_WORKER
+    ):
+        # Each node gets one connection, however often it is listed
+        self.addresses = list(dict.fromkeys(addresses))
+        if not self.addresses:
+            raise ClusterNotConfiguredError("No simulation worker nodes configured (set SIMULATION_CLUSTER)")
+        for address in self.addresses:
+            parse_address(address)
+        self.key = cluster_token(token)
+        self.shard_timeout = shard_timeout
+        self.shards_per_worker = shards_per_worker
+
+    async def run_simulation(
+        self,
+        iterations: int,
+        risk_events: List[Dict],
+        business_assets: List[Dict],
+        defense_systems: List[Dict],
+        plan_key: Optional[Tuple[str, int, str]] = None,
+        **engine_options
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        monte_carlo, engine_options, shards = split_blocks(
+            iterations, risk_events, self.shards_per_worker * len(self.addresses), **engine_options
+        )
+        shard_count = len(shards)
+        queue = _ShardQueue(shard_count)
+
+        def arguments(index: int) -> Tuple:
+            return (iterations, engine_options, risk_events, business_assets, defense_systems, shards[index], plan_key)
+
+        drivers = [asyncio.create_task(self._drive(address, queue, arguments)) for address in self.addresses]
+        try:
+            while len(queue.results) < shard_count:
+                if queue.error is not None:
+                    raise queue.error
+                if len(queue.lost) == len(self.addresses):
+                    reasons = "; ".join(f"{address}: {reason}" for address, reason in queue.lost.items())
+                    raise RuntimeError(
+                        f"All simulation workers were lost with {shard_count - len(queue.results)} shards left ({reasons})"
+                    )
+                await queue.changed.wait()
+                queue.changed.clear()
+        finally:
+            for driver in drivers:
+                driver.cancel()
+            await asyncio.gather(*drivers, return_exceptions=True)
+
+        results = await asyncio.to_thread(merge_shards, monte_carlo, [queue.results[index] for index in range(shard_count)])
+        results["random_stream"]["workers"] = len(self.addresses) - len(queue.lost)
+        results["distributed"] = {
+            "workers": self.addresses,
+            "shards": shard_count,
+            "shards_per_worker": {
+                address: sum(1 for assigned in queue.assignments.values() if assigned == address)
+                for address in self.addresses
+            },
+            "lost_workers": queue.lost,
+            "reassigned_shards": queue.reassigned,
+            "elapsed_seconds": time.perf_counter() - started,
+        }
+        return results
+
+    async def _drive(self, address: str, queue: _ShardQueue, arguments):
+        """Feed one node the next pending shard until the run completes or the node is lost"""
+        try:
+            reader, writer = await asyncio.wait_for(_connect(address), CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError) as error:
+            queue.lose(address, f"unreachable: {error!r}")
+            return
+        try:
+            while True:
+                index = await queue.pending.get()
+                try:
+                    await send_frame(writer, {"type": "shard", "shard": index, "arguments": arguments(index)}, self.key)
+                    reply = await asyncio.wait_for(receive_frame(reader, self.key), self.shard_timeout)
+                except asyncio.TimeoutError:
+                    queue.lose(address, f"no reply within {self.shard_timeout:g}s", index)
+                    return
+                except (OSError, EOFError) as error:
+                    queue.lose(address, f"connection lost: {error!r}", index)
+                    return
+                if reply["status"] == "invalid":
+                    # Bad input fails the same way on every node
+                    queue.fail(ValueError(reply["error"]))
+                    return
+                if reply["status"] != "ok":
+                    queue.lose(address, f"shard failed: {reply['error']}", index)
+                    return
+                queue.complete(index, reply["result"], address)
+        finally:
+            writer.close()
+
+    async def ping(self) -> Dict[str, Any]:
+        """Reachability and shards served of every node"""
+        async def ping_one(address: str) -> Dict[str, Any]:
+            try:
+                reader, writer = await asyncio.wait_for(_connect(address), CONNECT_TIMEOUT)
+                try:
+                    await send_frame(writer, {"type": "ping"}, self.key)
+                    reply = await asyncio.wait_for(receive_frame(reader, self.key), CONNECT_TIMEOUT)
+                finally:
+                    writer.close()
+                return {"address": address, "reachable": True, "shards_served": reply["shards_served"]}
+            except (OSError, EOFError, asyncio.TimeoutError) as error:
+                return {"address": address, "reachable": False, "error": repr(error)}
+
+        return {"workers": list(await asyncio.gather(*(ping_one(address) for address in self.addresses)))}
+
+async def run_distributed_simulation(
+    iterations: int,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    plan_key: Optional[Tuple[str, int, str]] = None,
+    addresses: Optional[List[str]] = None,
+    **engine_options
+) -> Dict[str, Any]:
+    """Run a fixed-size simulation on the SIMULATION_CLUSTER nodes (or the given addresses)"""
+    coordinator = SimulationCoordinator(addresses or cluster_addresses())
+    return await coordinator.run_simulation(
+        iterations, risk_events, business_assets, defense_systems, plan_key, **engine_options
+    )
+
+def get_cluster_status() -> Dict[str, Any]:
+    """Report the configured worker nodes"""
+    return {
+        "workers": cluster_addresses(),
+        "token_configured": bool(os.getenv("SIMULATION_CLUSTER_TOKEN")),
+        "shard_timeout_seconds": SIMULATION_SHARD_TIMEOUT,
+    }
+
+def start_local_workers(count: int, token: str, address: str = "tcp://127.0.0.1:0") -> List[Tuple[str, subprocess.Popen]]:
+    """
+    Start worker node processes on this machine, e.g. to try out a cluster or
+    exercise worker loss. Each binds the given address (port 0 picks a free
+    port) and the bound address is returned with the process.
+    """
+    backend = Path(__file__).resolve().parents[2]
+    workers = []
+    for _ in range(count):
+        process = subprocess.Popen(
+            [sys.executable, "-m", "app.services.distributed", "worker", "--listen", address],
+            cwd=backend, env={**os.environ, "SIMULATION_CLUSTER_TOKEN": token},
+            stdout=subprocess.PIPE, text=True
+        )
+        line = process.stdout.readline().split()
+        if len(line) != 2 or line[0] != "listening":
+            process.kill()
+            raise RuntimeError("Simulation worker failed to start")
+        workers.append((line[1], process))
+    return workers
+
+async def _serve_worker(address: str):
+    worker = SimulationWorker(address)
+    server = await worker.start()
+    socket = server.sockets[0].getsockname()
+    bound = address if isinstance(socket, str) else f"tcp://{socket[0]}:{socket[1]}"
+    print(f"listening {bound}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.services.distributed")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="serve simulation shards")
+    worker.add_argument("--listen", default="tcp://127.0.0.1:7400", help="tcp://host:port or unix:///path")
+    arguments = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve_worker(arguments.listen))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
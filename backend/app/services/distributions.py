@@ -0,0 +1,324 @@
+# backend/app/services/distributions.py
+# Frequency and severity models for risk events.
+# Counts are drawn by inverse-CDF lookup: each event's CDF is tabulated once
+# per scenario and a whole column of uniforms is mapped to counts with a
+# single np.searchsorted, so a 500-per-year event costs the same as a rare one.
+# Severities come from a registry of samplers that also work from uniforms,
+# validating and precomputing their parameters once per scenario.
+import math
+import numpy as np
+from scipy import special
+from typing import List, Dict, Any, Optional, Type
+
+FREQUENCY_DISTRIBUTIONS = ("bernoulli", "poisson", "negative_binomial")
+
+# CDF tables stop once this much probability mass is covered
+_TABLE_TAIL_MASS = 1e-12
+
+def resolve_frequency_distribution(event: Dict) -> str:
+    """
+    The event's frequency model. Without an explicit choice the event keeps
+    the original once-a-year Bernoulli behaviour whatever its frequency; a
+    counting process has to be asked for, so editing frequency never
+    switches the model.
+    """
+    distribution = event.get('frequency_distribution')
+    if distribution is None:
+        return "bernoulli"
+    if distribution not in FREQUENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown frequency distribution '{distribution}' for risk event '{event.get('name', '')}'")
+    return distribution
+
+def expected_frequency(event: Dict) -> float:
+    """
+    Expected occurrences per year: frequency scaled by the occurrence
+    probability for a counting process, the probability alone for Bernoulli
+    """
+    if resolve_frequency_distribution(event) == "bernoulli":
+        return event.get('probability', 0) / 100
+    return event.get('frequency', 1.0) * event.get('probability', 0) / 100
+
+def scale_frequency(event: Dict, scale: float) -> Dict:
+    """
+    Copy of the event with its expected occurrences per year multiplied by
+    scale. The frequency model is pinned first, then a Bernoulli event scales
+    its probability (at most 100%) and a counting process its frequency.
+    """
+    distribution = resolve_frequency_distribution(event)
+    scaled = {**event, 'frequency_distribution': distribution}
+    if distribution == "bernoulli":
+        scaled['probability'] = min(event.get('probability', 0) * scale, 100.0)
+    else:
+        scaled['frequency'] = event.get('frequency', 1.0) * scale
+    return scaled
+
+def frequency_cdf_table(event: Dict) -> Optional[np.ndarray]:
+    """
+    CDF of the event's annual count at k = 0, 1, 2, ..., or None for a
+    Bernoulli event, which is a plain threshold on the uniform
+    """
+    distribution = resolve_frequency_distribution(event)
+    if distribution == "bernoulli":
+        return None
+
+    rate = expected_frequency(event)
+    if rate <= 0:
+        return np.ones(1)
+
+    if distribution == "poisson":
+        spread = math.sqrt(rate)
+        log_pmf = lambda k: -rate + k * math.log(rate) - math.lgamma(k + 1)
+    else:
+        # Dispersion is the variance-to-mean ratio, so it must exceed 1
+        dispersion = event.get('frequency_dispersion') or 2.0
+        if dispersion <= 1:
+            raise ValueError(f"frequency_dispersion must be greater than 1 for risk event '{event.get('name', '')}'")
+        size = rate / (dispersion - 1)
+        success = 1 / dispersion
+        spread = math.sqrt(rate * dispersion)
+        log_pmf = lambda k: (math.lgamma(k + size) - math.lgamma(size) - math.lgamma(k + 1)
+                             + size * math.log(success) + k * math.log1p(-success))
+
+    # Start well past the mean and extend until the tail mass is negligible
+    upper = int(rate + 12 * spread + 20)
+    while True:
+        pmf = np.exp([log_pmf(k) for k in range(upper + 1)])
+        cdf = np.cumsum(pmf)
+        if cdf[-1] >= 1 - _TABLE_TAIL_MASS:
+            break
+        upper *= 2
+
+    cdf = cdf[:int(np.searchsorted(cdf, 1 - _TABLE_TAIL_MASS)) + 1]
+    cdf[-1] = 1.0
+    return cdf
+
+def sample_counts(uniforms: np.ndarray, probability: float, cdf_table: Optional[np.ndarray]) -> np.ndarray:
+    """Map uniforms in [0, 1) to annual occurrence counts"""
+    if cdf_table is None:
+        return (uniforms * 100 < probability).astype(np.int64)
+    return np.searchsorted(cdf_table, uniforms, side="right").astype(np.int64)
+
+def sample_count(rng, distribution: str, probability: float, rate: float, dispersion: float) -> int:
+    """Scalar draw used by the reference engine, from a compiled plan's parameters"""
+    if distribution == "bernoulli":
+        return int(rng.random() * 100 < probability)
+
+    if distribution == "poisson":
+        return int(rng.poisson(rate))
+
+    return int(rng.negative_binomial(rate / (dispersion - 1), 1 / dispersion))
+
+def interp_uniform_grid(uniforms: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """
+    Linear interpolation of a table sampled on an evenly spaced [0, 1] grid.
+    The bin index is computed directly, avoiding np.interp's binary search.
+    """
+    position = uniforms * (len(table) - 1)
+    index = np.minimum(position.astype(np.int64), len(table) - 2)
+    fraction = position - index
+    lower = table[index]
+    return lower + fraction * (table[index + 1] - lower)
+
+class SeverityDistribution:
+    """
+    Base class for severity samplers. Subclasses read their parameters from
+    the risk event (severity_params, falling back to impact_min/impact_max),
+    validate them in __init__ and map uniforms to impacts with an inverse CDF.
+    """
+    name = ""
+
+    def __init__(self, event: Dict):
+        self.event_name = event.get('name', '')
+        self.impact_min = float(event.get('impact_min', 0))
+        self.impact_max = float(event.get('impact_max', 0))
+        self.params = event.get('severity_params') or {}
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def describe(self) -> Dict[str, Any]:
+        return {"distribution": self.name}
+
+    def _param(self, key: str, default: Optional[float] = None) -> float:
+        value = self.params.get(key, default)
+        if value is None:
+            raise ValueError(f"Severity distribution '{self.name}' needs '{key}' for risk event '{self.event_name}'")
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise self._invalid(f"'{key}' must be a number")
+
+    def _invalid(self, message: str) -> ValueError:
+        return ValueError(f"Invalid {self.name} severity for risk event '{self.event_name}': {message}")
+
+class UniformSeverity(SeverityDistribution):
+    """Flat between impact_min and impact_max (the original model)"""
+    name = "uniform"
+
+    def __init__(self, event: Dict):
+        super().__init__(event)
+        self.low = self._param("min", self.impact_min)
+        self.span = self._param("max", self.impact_max) - self.low
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        return self.low + uniforms * self.span
+
+class LognormalSeverity(SeverityDistribution):
+    """
+    Lognormal from mu/sigma of the log loss, or fitted so impact_min and
+    impact_max are its 5th and 95th percentiles
+    """
+    name = "lognormal"
+
+    def __init__(self, event: Dict):
+        super().__init__(event)
+        if "mu" in self.params or "sigma" in self.params:
+            self.mu = self._param("mu")
+            self.sigma = self._param("sigma")
+        else:
+            if self.impact_min <= 0 or self.impact_max <= self.impact_min:
+                raise self._invalid("impact_min must be positive and below impact_max to fit a lognormal")
+            z_95 = special.ndtri(0.95)
+            self.mu = (math.log(self.impact_min) + math.log(self.impact_max)) / 2
+            self.sigma = (math.log(self.impact_max) - math.log(self.impact_min)) / (2 * z_95)
+        if self.sigma <= 0:
+            raise self._invalid("sigma must be positive")
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        return np.exp(self.mu + self.sigma * special.ndtri(uniforms))
+
+    def describe(self) -> Dict[str, Any]:
+        return {"distribution": self.name, "mu": self.mu, "sigma": self.sigma}
+
+class TriangularSeverity(SeverityDistribution):
+    """Triangular on [min, max] peaking at mode (default: midpoint)"""
+    name = "triangular"
+
+    def __init__(self, event: Dict):
+        super().__init__(event)
+        self.low = self._param("min", self.impact_min)
+        self.high = self._param("max", self.impact_max)
+        self.mode = self._param("mode", (self.low + self.high) / 2)
+        if not self.low <= self.mode <= self.high or self.low == self.high:
+            raise self._invalid("expected min <= mode <= max with min < max")
+        self.split = (self.mode - self.low) / (self.high - self.low)
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        width = self.high - self.low
+        rising = self.low + np.sqrt(uniforms * width * (self.mode - self.low))
+        falling = self.high - np.sqrt((1 - uniforms) * width * (self.high - self.mode))
+        return np.where(uniforms < self.split, rising, falling)
+
+class PertSeverity(SeverityDistribution):
+    """
+    Beta-PERT on [min, max] with the given mode and shape (lambda, default 4).
+    The beta inverse CDF is tabulated once so sampling is a table lookup.
+    """
+    name = "pert"
+    _grid = np.linspace(0.0, 1.0, 16385)
+
+    def __init__(self, event: Dict):
+        super().__init__(event)
+        self.low = self._param("min", self.impact_min)
+        self.high = self._param("max", self.impact_max)
+        self.mode = self._param("mode", (self.low + self.high) / 2)
+        shape = self._param("lambda", 4.0)
+        if not self.low <= self.mode <= self.high or self.low == self.high:
+            raise self._invalid("expected min <= mode <= max with min < max")
+        if shape <= 0:
+            raise self._invalid("lambda must be positive")
+
+        width = self.high - self.low
+        self.alpha = 1 + shape * (self.mode - self.low) / width
+        self.beta = 1 + shape * (self.high - self.mode) / width
+        self.table = self.low + width * special.betaincinv(self.alpha, self.beta, self._grid)
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        return interp_uniform_grid(uniforms, self.table)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"distribution": self.name, "alpha": self.alpha, "beta": self.beta}
+
+class ParetoSeverity(SeverityDistribution):
+    """
+    Pareto with scale (default impact_min) and tail index alpha; an optional
+    cap truncates single losses
+    """
+    name = "pareto"
+
+    def __init__(self, event: Dict):
+        super().__init__(event)
+        self.scale = self._param("scale", self.impact_min)
+        self.alpha = self._param("alpha")
+        self.cap = self._param("cap") if self.params.get("cap") is not None else None
+        if self.scale <= 0 or self.alpha <= 0:
+            raise self._invalid("scale and alpha must be positive")
+        if self.cap is not None:
+            if not math.isfinite(self.cap) or self.cap <= 0:
+                raise self._invalid("cap must be a positive, finite number")
+            if self.cap < self.scale:
+                raise self._invalid("cap must not be below scale")
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        impacts = self.scale * np.power(1 - uniforms, -1 / self.alpha)
+        if self.cap is not None:
+            np.minimum(impacts, self.cap, out=impacts)
+        return impacts
+
+    def describe(self) -> Dict[str, Any]:
+        return {"distribution": self.name, "alpha": self.alpha, "scale": self.scale, "cap": self.cap}
+
+class EmpiricalSeverity(SeverityDistribution):
+    """Resamples historical losses (severity_params.values) by interpolating their empirical CDF"""
+    name = "empirical"
+
+    def __init__(self, event: Dict):
+        super().__init__(event)
+        values = self.params.get("values") or []
+        if len(values) < 2:
+            raise self._invalid("needs at least two historical loss values")
+        self.values = np.sort(np.asarray(values, dtype=float))
+        if self.values[0] < 0:
+            raise self._invalid("historical losses must be non-negative")
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        return interp_uniform_grid(uniforms, self.values)
+
+class ScaledSeverity:
+    """Another sampler's impacts times a constant, e.g. a later year's inflation"""
+
+    def __init__(self, severity: SeverityDistribution, scale: float):
+        self.severity = severity
+        self.scale = scale
+        self.name = severity.name
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        return self.severity.sample(uniforms) * self.scale
+
+    def describe(self) -> Dict[str, Any]:
+        return {**self.severity.describe(), "scale": self.scale}
+
+SEVERITY_DISTRIBUTIONS: Dict[str, Type[SeverityDistribution]] = {}
+
+def register_severity_distribution(distribution: Type[SeverityDistribution]):
+    """Make a severity distribution available to risk events by its name"""
+    SEVERITY_DISTRIBUTIONS[distribution.name] = distribution
+    return distribution
+
+for _distribution in (UniformSeverity, LognormalSeverity, TriangularSeverity,
+                      PertSeverity, ParetoSeverity, EmpiricalSeverity):
+    register_severity_distribution(_distribution)
+
+def build_severity_sampler(event: Dict) -> SeverityDistribution:
+    """Validated severity sampler for a risk event (uniform by default)"""
+    name = event.get('severity_distribution') or "uniform"
+    distribution = SEVERITY_DISTRIBUTIONS.get(name)
+    if distribution is None:
+        raise ValueError(
+            f"Unknown severity distribution '{name}' for risk event '{event.get('name', '')}'. "
+            f"Available: {', '.join(sorted(SEVERITY_DISTRIBUTIONS))}"
+        )
+    return distribution(event)
+
+def list_severity_distributions() -> List[str]:
+    return sorted(SEVERITY_DISTRIBUTIONS)
@@ -0,0 +1,140 @@
+# backend/app/services/horizon.py
+# Multi-year loss projections: each year has its own compiled plan with trended frequencies and impacts,
+# and year y of block b draws from its own child stream, so the first year is the one-year run.
+# Annual and cumulative losses stream into accumulators; defense costs are amortized straight-line.
+import math
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+MAX_HORIZON_YEARS = 10
+PERIOD_METRICS = (
+    "expected_annual_loss",
+    "p50_median_impact",
+    "p90_severe_impact",
+    "p95_impact",
+    "p99_worst_case",
+    "conditional_var_95",
+    "standard_deviation",
+)
+
+def _scales(years: int, trend: float, multipliers: Optional[List[float]], name: str) -> np.ndarray:
+    """Per-year multipliers: explicit, or compounding the annual trend from 1 in the first year"""
+    if multipliers is not None:
+        if len(multipliers) != years:
+            raise ValueError(f"{name}_multipliers needs one value per year ({years})")
+        scales = np.asarray(multipliers, dtype=float)
+        if np.any(scales <= 0):
+            raise ValueError(f"{name}_multipliers must be positive")
+        return scales
+    if trend <= -1:
+        raise ValueError(f"{name}_trend must be above -100% a year")
+    return (1 + trend) ** np.arange(years)
+
+class HorizonSchedule:
+    """Per-year parameter multipliers, defense spending and discounting of a horizon run"""
+
+    def __init__(
+        self,
+        years: int,
+        frequency_trend: float = 0.0,
+        impact_trend: float = 0.0,
+        frequency_multipliers: Optional[List[float]] = None,
+        impact_multipliers: Optional[List[float]] = None,
+        amortization_years: Optional[int] = None,
+        discount_rate: float = 0.0,
+        ruin_capital: Optional[float] = None
+    ):
+        if not 1 <= years <= MAX_HORIZON_YEARS:
+            raise ValueError(f"A horizon covers 1 to {MAX_HORIZON_YEARS} years")
+        if amortization_years is not None and amortization_years < 1:
+            raise ValueError("amortization_years must be at least 1")
+        if discount_rate < 0:
+            raise ValueError("discount_rate must not be negative")
+        self.years = years
+        self.frequency_scales = _scales(years, frequency_trend, frequency_multipliers, "frequency")
+        self.impact_scales = _scales(years, impact_trend, impact_multipliers, "impact")
+        self.amortization_years = amortization_years or years
+        self.discount_rate = discount_rate
+        # Losses are discounted from the end of the year they fall in
+        self.discount_factors = (1 + discount_rate) ** -np.arange(1.0, years + 1)
+        self.ruin_capital = ruin_capital
+
+    def defense_costs(self, defense_systems: List[Dict]) -> np.ndarray:
+        """Defense spending per year: amortized implementation cost plus maintenance"""
+        implementation = sum(float(defense.get('cost', 0) or 0) for defense in defense_systems)
+        maintenance = sum(float(defense.get('maintenance_cost', 0) or 0) for defense in defense_systems)
+        amortized = np.where(np.arange(self.years) < self.amortization_years, implementation / self.amortization_years, 0.0)
+        return amortized + maintenance
+
+    def capital(self, business_assets: List[Dict]) -> Optional[float]:
+        """Ruin capital: the given one, or the assets' total value; None when there is nothing to lose"""
+        if self.ruin_capital is not None:
+            return float(self.ruin_capital)
+        total = sum(max(float(asset.get('value', 0) or 0), 0.0) for asset in business_assets)
+        return total if total > 0 else None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "years": self.years,
+            "frequency_scales": self.frequency_scales.tolist(),
+            "impact_scales": self.impact_scales.tolist(),
+            "amortization_years": self.amortization_years,
+            "discount_rate": self.discount_rate,
+        }
+
+def _metrics(statistics: Dict[str, Any]) -> Dict[str, float]:
+    return {metric: statistics[metric] for metric in PERIOD_METRICS}
+
+def horizon_report(
+    schedule: HorizonSchedule,
+    annual: List[Dict[str, Any]],
+    cumulative: List[Dict[str, Any]],
+    present_value: Dict[str, Any],
+    ruin_counts: np.ndarray,
+    iterations: int,
+    defense_costs: np.ndarray,
+    capital: Optional[float]
+) -> Dict[str, Any]:
+    """Per-year annual and cumulative loss statistics, ruin probabilities and the curves over the horizon"""
+    cumulative_costs = np.cumsum(defense_costs)
+    ruin = ruin_counts / iterations if capital is not None else None
+    periods = []
+    for year in range(schedule.years):
+        probability = float(ruin[year]) if ruin is not None else None
+        periods.append({
+            "year": year + 1,
+            "frequency_scale": float(schedule.frequency_scales[year]),
+            "impact_scale": float(schedule.impact_scales[year]),
+            "annual_loss": _metrics(annual[year]),
+            "cumulative_loss": _metrics(cumulative[year]),
+            "defense_cost": float(defense_costs[year]),
+            "cumulative_defense_cost": float(cumulative_costs[year]),
+            # Expected losses plus defense spending so far
+            "expected_cost_of_risk": cumulative[year]["expected_annual_loss"] + float(cumulative_costs[year]),
+            "ruin_probability": probability,
+            "ruin_standard_error": (
+                math.sqrt(probability * (1 - probability) / iterations) if probability is not None else None
+            ),
+        })
+
+    final = cumulative[-1]
+    return {
+        "horizon": {
+            **schedule.describe(),
+            "ruin_capital": capital,
+            "expected_total_loss": final["expected_annual_loss"],
+            "total_defense_cost": float(cumulative_costs[-1]),
+            # Losses discounted from the end of their year, per iteration
+            "present_value": _metrics(present_value),
+            "ruin_probability": periods[-1]["ruin_probability"],
+        },
+        "periods": periods,
+        "curves": {
+            "years": [period["year"] for period in periods],
+            "expected_cumulative_loss": [period["cumulative_loss"]["expected_annual_loss"] for period in periods],
+            "p90_cumulative_loss": [period["cumulative_loss"]["p90_severe_impact"] for period in periods],
+            "p99_cumulative_loss": [period["cumulative_loss"]["p99_worst_case"] for period in periods],
+            "expected_cost_of_risk": [period["expected_cost_of_risk"] for period in periods],
+            "ruin_probability": [period["ruin_probability"] for period in periods],
+        },
+    }
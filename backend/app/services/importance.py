@@ -0,0 +1,124 @@
+# backend/app/services/importance.py
+# Tail-focused importance sampling. The vectorized engine maps uniforms to
+# occurrences and impacts by inverse CDF, so oversampling the tail is a
+# change of the uniforms' density: for a handful of rare, high-impact risk
+# events the occurrence uniform is drawn from a mixture that lands in the
+# "occurs" region far more often, and the first impact from one that favours
+# its top decile. Each iteration carries the likelihood ratio of the
+# original to the proposal density, and the statistics are weighted by it.
+# The transform is a monotone piecewise-linear map of the sampler's
+# uniforms, so it composes with Latin hypercube and Sobol sampling.
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+
+# Occurrence probability of a tilted event: boost times the original, capped
+DEFAULT_BOOST = 5.0
+MAX_TILTED_PROBABILITY = 0.5
+# Only the highest-impact rare events are tilted, which keeps the weights'
+# variance (and so the effective sample size) under control
+MAX_TILTED_EVENTS = 8
+# Fraction of the proposal put on the top SEVERITY_TAIL of the impact distribution
+SEVERITY_TAIL = 0.1
+SEVERITY_MIX = 0.5
+
+_BELOW_ONE = 1.0 - 2.0 ** -53
+
+def _mixture_map(uniforms: np.ndarray, tail: float, mix: float, upper: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Map uniforms through the inverse CDF of the proposal density: a (1 - mix)
+    share of plain uniforms plus a mix share confined to the tail region
+    [1 - tail, 1) (upper) or [0, tail). Returns the new uniforms and their
+    likelihood ratios (original density / proposal density).
+    """
+    inside = (1 - mix) + mix / tail
+    outside = 1 - mix
+    if upper:
+        split = outside * (1 - tail)
+        in_tail = uniforms >= split
+        mapped = np.where(in_tail, 1 - tail + (uniforms - split) / inside, uniforms / outside)
+    else:
+        split = inside * tail
+        in_tail = uniforms < split
+        mapped = np.where(in_tail, uniforms / inside, tail + (uniforms - split) / outside)
+    ratios = np.where(in_tail, 1 / inside, 1 / outside)
+    return np.minimum(mapped, _BELOW_ONE), ratios
+
+class TailImportance:
+    """
+    Proposal for one scenario: which events are tilted and by how much.
+    Built once per scenario; apply() and weights() run per block.
+    """
+
+    def __init__(
+        self,
+        risk_events: List[Dict],
+        count_tables: List[Optional[np.ndarray]],
+        severity: List,
+        mitigation: np.ndarray,
+        excluded: Optional[np.ndarray] = None,
+        boost: float = DEFAULT_BOOST
+    ):
+        self.event_count = len(risk_events)
+        excluded = set() if excluded is None else {int(index) for index in excluded}
+
+        candidates = []
+        for index, event in enumerate(risk_events):
+            table = count_tables[index]
+            occurrence = event.get('probability', 0) / 100 if table is None else 1 - table[0]
+            if index in excluded or not 0 < occurrence < MAX_TILTED_PROBABILITY:
+                continue
+            # Rank by how bad a single bad occurrence is after mitigation
+            impact = float(severity[index].sample(np.array([0.99]))[0]) * mitigation[index]
+            if impact > 0:
+                candidates.append((impact, index, occurrence, table is None))
+        candidates.sort(reverse=True)
+
+        self.events = []
+        for _, index, occurrence, bernoulli in candidates[:MAX_TILTED_EVENTS]:
+            target = min(boost * occurrence, max(MAX_TILTED_PROBABILITY, occurrence))
+            self.events.append({
+                "index": index,
+                "occurrence": occurrence,
+                "target": target,
+                # Mixture weight that lifts the occurrence probability to target
+                "mix": (target - occurrence) / (1 - occurrence),
+                # A Bernoulli event occurs on a low uniform, a counted one on a high one
+                "upper": not bernoulli,
+            })
+        self.indices = np.array([event["index"] for event in self.events], dtype=np.int64)
+
+    def apply(self, uniforms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tilt, in place, the (iterations x 2 * events) sampler matrix. Returns
+        the occurrence likelihood ratio per iteration and the first-impact
+        ratios per (iteration, tilted event); the latter only apply to
+        iterations where the event occurred.
+        """
+        occurrence_ratios = np.ones(len(uniforms))
+        severity_ratios = np.empty((len(uniforms), len(self.events)))
+        for column, event in enumerate(self.events):
+            index = event["index"]
+            uniforms[:, index], ratios = _mixture_map(
+                uniforms[:, index], event["occurrence"], event["mix"], event["upper"]
+            )
+            occurrence_ratios *= ratios
+            uniforms[:, self.event_count + index], severity_ratios[:, column] = _mixture_map(
+                uniforms[:, self.event_count + index], SEVERITY_TAIL, SEVERITY_MIX, True
+            )
+        return occurrence_ratios, severity_ratios
+
+    def weights(self, counts: np.ndarray, occurrence_ratios: np.ndarray, severity_ratios: np.ndarray) -> np.ndarray:
+        """Likelihood ratio of each iteration given its occurrence counts"""
+        occurred = counts[:, self.indices] > 0
+        return occurrence_ratios * np.prod(np.where(occurred, severity_ratios, 1.0), axis=1)
+
+def build_importance(
+    risk_events: List[Dict],
+    count_tables: List[Optional[np.ndarray]],
+    severity: List,
+    mitigation: np.ndarray,
+    excluded: Optional[np.ndarray] = None
+) -> Optional[TailImportance]:
+    """Proposal for a scenario, or None when no event is rare enough to tilt"""
+    importance = TailImportance(risk_events, count_tables, severity, mitigation, excluded)
+    return importance if importance.events else None
@@ -0,0 +1,124 @@
+# backend/app/services/memory_budget.py
+# Memory-bounded simulation. A run's memory is split into three shares:
+#   - working: the per-chunk (iterations x events) matrices, preallocated once
+#     and reused for every chunk, so it is sized by the chunk, not the run
+#   - statistics: the raw losses kept for exact percentiles; past this share
+#     StreamingStatistics falls back to its sketch and exact tail
+#   - attribution: the per-event rows of the worst iterations
+# The chunk (random stream block) size is the largest power of two up to
+# DEFAULT_BLOCK_SIZE whose working set fits its share, so peak memory does not
+# grow with the iteration count. Ordinary scenarios keep the default block
+# size and therefore their random streams.
+import os
+import math
+import numpy as np
+from typing import List, Dict, Any, Optional
+from app.services.distributions import expected_frequency
+from app.services.random_streams import DEFAULT_BLOCK_SIZE
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_MEMORY_BUDGET_MB = int(os.getenv("SIMULATION_MEMORY_BUDGET_MB", "512"))
+WORKING_SHARE = 0.5
+STATISTICS_SHARE = 0.25
+ATTRIBUTION_SHARE = 0.25
+# Smallest chunk worth a vectorized pass, whatever the budget says
+MIN_CHUNK_ITERATIONS = 256
+
+# Working-set estimate per (iteration, event) cell: integer counts and index
+# temporaries, plus the uniforms, loss matrices and float temporaries in the
+# compute precision; and per expected occurrence, the flattened impact draws
+_INDEX_BYTES_PER_CELL = 32
+_FLOATS_PER_CELL = 6
+_FLOATS_PER_OCCURRENCE = 8
+
+def working_bytes_per_iteration(risk_events: List[Dict], itemsize: int = 8) -> float:
+    """Estimated per-iteration working set of the vectorized engine"""
+    occurrences = sum(
+        max(expected_frequency(event), event.get('probability', 0) / 100) for event in risk_events
+    )
+    per_cell = _INDEX_BYTES_PER_CELL + _FLOATS_PER_CELL * itemsize
+    return per_cell * max(len(risk_events), 1) + _FLOATS_PER_OCCURRENCE * itemsize * occurrences
+
+class MemoryBudget:
+    """A run's memory budget and the sizes derived from it"""
+
+    def __init__(self, megabytes: Optional[float] = None):
+        self.megabytes = float(megabytes or DEFAULT_MEMORY_BUDGET_MB)
+        if self.megabytes <= 0:
+            raise ValueError("memory_budget_mb must be positive")
+        self.total_bytes = int(self.megabytes * 2 ** 20)
+
+    def chunk_iterations(self, risk_events: List[Dict], itemsize: int = 8) -> int:
+        """Iterations per chunk: a power of two whose working set fits the working share"""
+        fitting = self.total_bytes * WORKING_SHARE / working_bytes_per_iteration(risk_events, itemsize)
+        if fitting >= DEFAULT_BLOCK_SIZE:
+            return DEFAULT_BLOCK_SIZE
+        return max(MIN_CHUNK_ITERATIONS, 2 ** int(math.floor(math.log2(max(fitting, 1)))))
+
+    def statistics_limit(self, accumulators: int = 1) -> int:
+        """
+        Losses kept exactly before the statistics fall back to streaming
+        estimates, when the share is split between several accumulators
+        """
+        return int(self.total_bytes * STATISTICS_SHARE // (8 * accumulators))
+
+    def weighted_rows_fit(self, iterations: int) -> bool:
+        """Importance sampling keeps every (loss, weight) row"""
+        return iterations * 16 <= self.total_bytes * STATISTICS_SHARE
+
+    def sample_matrix_fits(self, iterations: int, columns: int, itemsize: int = 8) -> bool:
+        """
+        A recorded sample matrix (per-event losses plus a weight per row)
+        takes the place of the statistics and attribution shares
+        """
+        return iterations * (columns * itemsize + 8) <= self.total_bytes * (STATISTICS_SHARE + ATTRIBUTION_SHARE)
+
+    def attribution_capacity(self, columns: int) -> int:
+        """
+        Tail rows of per-event losses (plus loss and weight) that fit the
+        attribution share; up to as many again can be queued before compaction
+        """
+        return max(1, int(self.total_bytes * ATTRIBUTION_SHARE // (2 * 8 * (columns + 2))))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "budget_mb": self.megabytes,
+            "budget_bytes": self.total_bytes,
+            "working_bytes": int(self.total_bytes * WORKING_SHARE),
+            "statistics_bytes": int(self.total_bytes * STATISTICS_SHARE),
+            "attribution_bytes": int(self.total_bytes * ATTRIBUTION_SHARE),
+        }
+
+class ChunkBuffers:
+    """
+    Named scratch arrays reused across chunks. take() returns a view of the
+    leading elements, growing the buffer only when a larger chunk needs it.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def take(self, name: str, shape, dtype=np.float64) -> np.ndarray:
+        shape = tuple(np.atleast_1d(shape).tolist())
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = np.empty(size, dtype=dtype)
+            self._buffers[name] = buffer
+        return buffer[:size].reshape(shape)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+def process_peak_rss() -> Optional[int]:
+    """High-water resident set size of this process in bytes, where the OS reports it"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak if os.uname().sysname == "Darwin" else peak * 1024)
@@ -0,0 +1,122 @@
+# backend/app/services/mitigation.py
+# Defense-aware mitigation. Losses are routed through the scenario's assets:
+#   - a risk event hits its affected_assets (default: every asset), and its
+#     impact is split across them in proportion to asset value
+#   - a defense reduces losses on its protected_assets (default: every asset)
+#     by effectiveness x coverage; several defenses on one asset compound
+# The event's mitigation factor is the value-weighted residual over its
+# assets. Both linkages are sparse (event x asset, defense x asset) and built
+# once per run, so the cost is linear in the number of links. A scenario
+# without assets behaves as one implicit asset covering everything, which is
+# exactly the original "every defense mitigates every event" model.
+import numpy as np
+from scipy import sparse
+from typing import List, Dict, Optional
+
+# Stand-in for a 100% reduction in log space, so exp() gives exactly 0
+_LOG_ZERO = -1e4
+
+def _references(document: Dict, field: str) -> List[str]:
+    return [str(reference) for reference in document.get(field) or []]
+
+class MitigationModel:
+    """
+    Sparse exposure (event x asset value shares) and protection (defense x
+    asset log residuals) for one scenario
+    """
+
+    def __init__(self, risk_events: List[Dict], business_assets: List[Dict], defense_systems: List[Dict]):
+        if not business_assets:
+            business_assets = [{"name": "organization", "value": 1.0}]
+        self.asset_count = len(business_assets)
+        self.defense_count = len(defense_systems)
+        self.asset_index = {}
+        for index, asset in enumerate(business_assets):
+            for key in (asset.get('_id'), asset.get('id'), asset.get('name')):
+                if key is not None:
+                    self.asset_index.setdefault(str(key), index)
+        values = np.array([max(float(asset.get('value', 0) or 0), 0.0) for asset in business_assets])
+
+        # Exposure: each event's impact split over its assets by value
+        rows, columns, shares = [], [], []
+        for event_index, event in enumerate(risk_events):
+            assets = self._resolve(_references(event, 'affected_assets'))
+            if len(assets) == 0:
+                # Every referenced asset is gone; the loss still lands somewhere
+                assets = np.arange(self.asset_count)
+            weights = values[assets]
+            weights = weights / weights.sum() if weights.sum() > 0 else np.full(len(assets), 1 / len(assets))
+            rows.extend([event_index] * len(assets))
+            columns.extend(assets)
+            shares.extend(weights)
+        self.exposure = sparse.csr_matrix(
+            (shares, (rows, columns)), shape=(len(risk_events), self.asset_count)
+        )
+
+        # Protection: log of each defense's residual on the assets it covers
+        rows, columns, log_residuals = [], [], []
+        self.reductions = np.zeros(self.defense_count)
+        self.effectiveness = np.zeros(self.defense_count)
+        for defense_index, defense in enumerate(defense_systems):
+            self.effectiveness[defense_index] = defense.get('effectiveness', 0) / 100
+            reduction = defense.get('effectiveness', 0) / 100 * defense.get('coverage_percentage', 100) / 100
+            residual = min(max(1 - reduction, 0.0), 1.0)
+            self.reductions[defense_index] = 1 - residual
+            assets = self._resolve(_references(defense, 'protected_assets'))
+            rows.extend([defense_index] * len(assets))
+            columns.extend(assets)
+            log_residuals.extend([np.log(residual) if residual > 0 else _LOG_ZERO] * len(assets))
+        self.protection = sparse.csr_matrix(
+            (log_residuals, (rows, columns)), shape=(self.defense_count, self.asset_count)
+        )
+        # Which assets each defense protects, for other reductions (see reduction_factors)
+        self.coverage = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)), shape=(self.defense_count, self.asset_count)
+        )
+
+    def factors(self, active: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Per-event impact multiplier with the given defenses in place (a
+        boolean mask over defense_systems; default: all of them)
+        """
+        if active is None:
+            active = np.ones(self.defense_count)
+        return self.portfolio_factors(np.asarray(active, dtype=float)[None, :])[0]
+
+    def portfolio_factors(self, portfolios: np.ndarray) -> np.ndarray:
+        """
+        Mitigation factors for many defense subsets at once: a (portfolios x
+        defenses) 0/1 matrix in, a (portfolios x events) matrix out
+        """
+        return np.asarray(self.exposure @ self.portfolio_residuals(portfolios).T).T
+
+    def portfolio_residuals(self, portfolios: np.ndarray) -> np.ndarray:
+        """Share of loss left on each asset: (portfolios x defenses) in, (portfolios x assets) out"""
+        portfolios = np.asarray(portfolios, dtype=float)
+        return np.exp(np.asarray(self.protection.T @ portfolios.T).T)
+
+    def reduction_factors(self, reductions: np.ndarray) -> np.ndarray:
+        """
+        Mitigation factors with other reductions (effectiveness x coverage, as
+        fractions) for the same defenses: a (sets x defenses) matrix in, a
+        (sets x events) matrix out
+        """
+        return np.asarray(self.exposure @ self.reduction_residuals(reductions).T).T
+
+    def reduction_residuals(self, reductions: np.ndarray) -> np.ndarray:
+        """Share of loss left on each asset under other reductions: (sets x defenses) in, (sets x assets) out"""
+        residuals = np.clip(1 - np.asarray(reductions, dtype=float), 0.0, 1.0)
+        log_residuals = np.log(residuals, out=np.full_like(residuals, _LOG_ZERO), where=residuals > 0)
+        return np.exp(np.asarray(self.coverage.T @ log_residuals.T).T)
+
+    def asset_residuals(self) -> np.ndarray:
+        """Share of loss left on each asset with every defense in place"""
+        return self.portfolio_residuals(np.ones((1, self.defense_count)))[0]
+
+    def _resolve(self, references: List[str]) -> np.ndarray:
+        """Asset indices for id/name references; none means every asset"""
+        if not references:
+            return np.arange(self.asset_count)
+        # References to deleted assets are ignored
+        indices = {self.asset_index[reference] for reference in references if reference in self.asset_index}
+        return np.array(sorted(indices), dtype=np.int64)
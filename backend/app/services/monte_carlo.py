@@ -2,84 +2,765 @@
 # This code implements a Monte Carlo simulation for risk analysis scenarios.
 # It includes a MonteCarloSimulation class that runs simulations based on risk events, business assets, and defense systems.
 # The results include various statistical measures such as median impact, severe impact, and expected annual loss.
+import time
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from app.services.streaming_stats import (
+    REPORTED_PERCENTILES, StreamingStatistics, WeightedSample, loss_statistics, weighted_loss_statistics
+)
+from app.services.distributions import sample_counts, sample_count
+from app.services.samplers import SAMPLERS, build_sampler, below_one
+from app.services.copula import describe_correlation
+from app.services.attribution import LossAttribution, tail_capacity
+from app.services.cascade import DEFAULT_CASCADE_FACTOR
+from app.services.simulation_plan import SimulationPlan, plan_cache, options_key
+from app.services.sample_matrix import SampleMatrix
+from app.services.defense_value import DefenseValue
+from app.services.horizon import HorizonSchedule, horizon_report
+from app.services.memory_budget import MemoryBudget, ChunkBuffers, working_bytes_per_iteration, process_peak_rss
+from app.services.random_streams import (
+    resolve_seed, block_count, block_iterations, block_generator, stream_layout
+)
+
+# Bump whenever a change alters simulation output; it is part of the result cache key
+ENGINE_VERSION = "2.13"
+
+# "vectorized" draws every iteration at once; "reference" is the original
+# per-iteration loop, kept so the two engines can be checked against each other
+SIMULATION_MODES = ("vectorized", "reference")
+
+# Float type of the sampled uniforms and per-iteration losses. float32 halves
+# the memory traffic of the hot loops; final aggregation is always float64.
+PRECISIONS = ("float64", "float32")
+# Largest relative difference of any reported percentile between the float32
+# and float64 paths on the same draws; above it a float32 run falls back
+FLOAT32_TOLERANCE = 1e-4
+# Iterations simulated twice by that check: at most 2048 and 2% of the run,
+# so it stays cheap next to the run it guards, but never fewer than 256
+PRECISION_CHECK_ITERATIONS = 2048
+PRECISION_CHECK_FRACTION = 0.02
+PRECISION_CHECK_MIN_ITERATIONS = 256
+
+# Metrics whose standard error drives the adaptive stopping rule
+CONVERGENCE_METRICS = (
+    "expected_annual_loss",
+    "p50_median_impact",
+    "p90_severe_impact",
+    "p95_impact",
+    "p99_worst_case",
+    "conditional_var_95",
+)
 
 class MonteCarloSimulation:
-    def __init__(self, iterations: int = 10000):
+    def __init__(
+        self,
+        iterations: int = 10000,
+        mode: str = "vectorized",
+        seed: Optional[int] = None,
+        block_size: Optional[int] = None,
+        sampling: str = "random",
+        correlation: Optional[Dict[str, Any]] = None,
+        importance_sampling: bool = False,
+        cascade_factor: float = DEFAULT_CASCADE_FACTOR,
+        memory_budget_mb: Optional[float] = None,
+        precision: str = "float64"
+    ):
+        if mode not in SIMULATION_MODES:
+            raise ValueError(f"Unknown simulation mode: {mode}")
+        if sampling not in SAMPLERS:
+            raise ValueError(f"Unknown sampling mode: {sampling}")
+        if mode == "reference" and sampling != "random":
+            raise ValueError("The reference engine only supports random sampling")
+        if mode == "reference" and correlation:
+            raise ValueError("The reference engine only supports independent risk events")
+        if mode == "reference" and importance_sampling:
+            raise ValueError("The reference engine does not support importance sampling")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}'. Available: {', '.join(PRECISIONS)}")
+        if mode == "reference" and precision != "float64":
+            raise ValueError("The reference engine only computes in float64")
         self.iterations = iterations
-    
+        self.mode = mode
+        # Uniform sampler feeding the vectorized engine (see app.services.samplers)
+        self.sampling = sampling
+        # Scenario correlation spec for the Gaussian/t copula (see app.services.copula)
+        self.correlation = correlation or None
+        # Oversample rare, high-impact events and weight iterations by their
+        # likelihood ratios (see app.services.importance)
+        self.importance_sampling = importance_sampling
+        # Share of an asset's damage passed on to its dependents (0 disables cascades)
+        self.cascade_factor = cascade_factor
+        # Without a seed, fresh entropy is drawn and reported so the run can be replayed
+        self.seed = resolve_seed(seed)
+        # Iterations per random stream block, which is also the chunk simulated
+        # in one vectorized pass; without one it is sized from the memory budget
+        self.block_size = block_size
+        self.memory_budget = MemoryBudget(memory_budget_mb)
+        # Per-chunk matrices, allocated once and reused by every block
+        self._buffers = ChunkBuffers()
+        self._working_estimate = 0
+        self._peak_bytes = 0
+        self._peak_rss = None
+        # Compute precision; a float32 run is checked against float64 on its
+        # first block and falls back if the check fails (see check_precision)
+        self.precision = precision
+        self.dtype = np.dtype(precision)
+        self._sample_dtype = self.dtype
+        self.precision_check: Optional[Dict[str, Any]] = None
+
     def run_simulation(
-        self, 
-        risk_events: List[Dict], 
-        business_assets: List[Dict], 
+        self,
+        risk_events: List[Dict],
+        business_assets: List[Dict],
+        defense_systems: List[Dict],
+        plan_key: Optional[Tuple[str, int, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run Monte Carlo simulation for risk analysis. plan_key (scenario id,
+        plan version, source hash) lets the compiled plan be reused across runs.
+        """
+        plan = self.compile_plan(risk_events, business_assets, defense_systems, plan_key)
+        self.resolve_block_size(plan.risk_events)
+        self.check_precision(plan)
+        attribution = self.new_attribution(plan)
+        defense_value = self.new_defense_value(plan, business_assets, defense_systems)
+        statistics = self.simulate_blocks(
+            plan, range(block_count(self.iterations, self.block_size)), attribution, defense_value=defense_value
+        )
+        return self.summarize(statistics, attribution, defense_value)
+
+    def summarize(
+        self,
+        results,
+        attribution: Optional[LossAttribution] = None,
+        defense_value: Optional[DefenseValue] = None
+    ) -> Dict[str, Any]:
+        """
+        Statistics for a complete run plus the settings needed to replay it
+        """
+        statistics = self._calculate_statistics(results)
+        if attribution is not None:
+            statistics["event_attribution"] = attribution.to_result(
+                statistics["value_at_risk_95"], statistics["conditional_var_95"]
+            )
+        if defense_value is not None:
+            statistics["defense_value"] = defense_value.to_result(statistics["expected_annual_loss"])
+        if isinstance(results, (StreamingStatistics, WeightedSample)):
+            statistics["statistics_method"] = results.describe()
+        statistics["random_stream"] = stream_layout(self.seed, self.iterations, self.block_size)
+        statistics["sampling"] = self.sampling
+        statistics["correlation"] = describe_correlation(self.correlation)
+        statistics["memory"] = self.memory_report(attribution)
+        statistics["precision"] = self.precision_report()
+        return statistics
+
+    def resolve_block_size(self, risk_events: List[Dict]) -> int:
+        """Fix the chunk size for this run: the given block_size, or the largest that fits the budget"""
+        self._working_estimate = int(working_bytes_per_iteration(risk_events, self.dtype.itemsize))
+        if self.block_size is None:
+            self.block_size = self.memory_budget.chunk_iterations(risk_events, self.dtype.itemsize)
+        return self.block_size
+
+    def check_precision(self, plan: SimulationPlan) -> Optional[Dict[str, Any]]:
+        """
+        Guardrail for float32 runs: simulate a sample from the first block's
+        stream with float32 and with float64 arithmetic on the same float32
+        draws and compare the reported percentiles and the mean. Beyond FLOAT32_TOLERANCE the run
+        switches to the float64 engine (keeping its chunk size). Every shard
+        reaches the same verdict, since the check only depends on the seed.
+        """
+        if self.precision == "float64" or self.precision_check is not None:
+            return self.precision_check
+        iterations = min(
+            PRECISION_CHECK_ITERATIONS,
+            max(PRECISION_CHECK_MIN_ITERATIONS, int(PRECISION_CHECK_FRACTION * self.iterations)),
+            block_iterations(0, self.iterations, self.block_size)
+        )
+        reduced = self._draw_losses(iterations, plan, block_generator(self.seed, 0))
+        self.dtype = np.dtype(np.float64)
+        try:
+            reference = self._draw_losses(iterations, plan, block_generator(self.seed, 0))
+        finally:
+            self.dtype = np.dtype(np.float32)
+
+        # Importance sampling rows are (loss, weight); the weights do not depend on the precision
+        reduced, reference = np.asarray(reduced, dtype=float), np.asarray(reference, dtype=float)
+        if reduced.ndim == 2:
+            reduced, reference = reduced[:, 0], reference[:, 0]
+        reduced_summary = np.append(np.percentile(reduced, REPORTED_PERCENTILES), np.mean(reduced))
+        reference_summary = np.append(np.percentile(reference, REPORTED_PERCENTILES), np.mean(reference))
+        difference = np.abs(reduced_summary - reference_summary)
+        scale = np.abs(reference_summary)
+        relative = np.divide(difference, scale, out=np.where(difference > 0, np.inf, 0.0), where=scale > 0)
+        max_relative_error = float(relative.max())
+
+        passed = max_relative_error <= FLOAT32_TOLERANCE
+        if not passed:
+            self.dtype = self._sample_dtype = np.dtype(np.float64)
+        self.precision_check = {
+            "checked_iterations": iterations,
+            "max_relative_error": max_relative_error,
+            "tolerance": FLOAT32_TOLERANCE,
+            "passed": passed,
+        }
+        return self.precision_check
+
+    def precision_report(self) -> Dict[str, Any]:
+        """Requested and effective precision, with the float32 check if one ran"""
+        return {
+            "requested": self.precision,
+            "used": self.dtype.name,
+            "aggregation": "compensated float64" if self.dtype != np.float64 else "float64",
+            "check": self.precision_check,
+        }
+
+    def new_statistics(self):
+        """Mergeable accumulator for this run's losses, sized by the memory budget"""
+        if self.importance_sampling:
+            if not self.memory_budget.weighted_rows_fit(self.iterations):
+                raise ValueError(
+                    f"Importance sampling keeps every iteration's loss and weight; {self.iterations} iterations "
+                    f"do not fit a {self.memory_budget.megabytes:g} MB memory budget"
+                )
+            return WeightedSample(compensated=self.dtype != np.float64)
+        return StreamingStatistics(
+            exact_limit=self.memory_budget.statistics_limit(), compensated=self.dtype != np.float64
+        )
+
+    def memory_report(self, attribution: Optional[LossAttribution] = None) -> Dict[str, Any]:
+        """Budget, chunking and the peak memory observed, reported with the result"""
+        return {
+            **self.memory_budget.describe(),
+            "chunk_iterations": self.block_size,
+            "working_set_estimate_bytes": self._working_estimate * (self.block_size or 0),
+            # Chunk buffers, statistics and attribution rows held by the engine
+            "peak_tracked_bytes": self._peak_bytes,
+            # High-water mark of the simulating process(es)
+            "peak_rss_bytes": self._peak_rss if self._peak_rss is not None else process_peak_rss(),
+            "attribution": attribution.describe() if attribution is not None else None,
+        }
+
+    def shard_report(self, attribution: Optional[LossAttribution] = None) -> Dict[str, Any]:
+        """What a shard's process reports back besides its accumulators"""
+        return {
+            "memory": self.memory_report(attribution),
+            "precision_check": self.precision_check,
+            "dtype": self.dtype.name,
+        }
+
+    def merge_shard_report(self, report: Dict[str, Any]):
+        """Fold in the peaks and precision verdict of a shard's process"""
+        memory = report["memory"]
+        self._peak_bytes = max(self._peak_bytes, memory["peak_tracked_bytes"])
+        if memory["peak_rss_bytes"] is not None:
+            self._peak_rss = max(self._peak_rss or 0, memory["peak_rss_bytes"])
+        self.precision_check = report["precision_check"]
+        self.dtype = self._sample_dtype = np.dtype(report["dtype"])
+
+    def compile_plan(
+        self,
+        risk_events: List[Dict],
+        business_assets: List[Dict],
+        defense_systems: List[Dict],
+        plan_key: Optional[Tuple[str, int, str]] = None,
+        **period_scales: float
+    ) -> SimulationPlan:
+        """
+        Compiled plan for the scenario under this engine's options, served
+        from the per-process plan cache when the scenario version is known.
+        period_scales (frequency_scale, impact_scale) compile one year of a
+        multi-year run.
+        """
+        options = {
+            "correlation": self.correlation,
+            "importance_sampling": self.importance_sampling,
+            "cascade_factor": self.cascade_factor,
+            # Unscaled periods share the one-year plan
+            **{name: scale for name, scale in period_scales.items() if scale != 1.0},
+        }
+        compile_plan = lambda: SimulationPlan(risk_events, business_assets, defense_systems, **options)
+        if plan_key is None:
+            plan = compile_plan()
+        else:
+            scenario_id, version, source = plan_key
+            plan = plan_cache.get_or_compile((scenario_id, version, options_key(**options)), compile_plan, source)
+        if plan.cascade is not None and self.mode == "reference":
+            raise ValueError("The reference engine does not model dependency cascades; set cascade_factor to 0")
+        return plan
+
+    def new_attribution(self, plan: SimulationPlan) -> Optional[LossAttribution]:
+        """
+        Accumulator for per-event loss attribution; the reference engine only
+        tracks totals, so it has none. Cascade losses get their own column.
+        """
+        if self.mode == "reference":
+            return None
+        sources = list(plan.risk_events)
+        if plan.cascade is not None:
+            sources.append({"name": "Dependency cascade"})
+        capacity = min(
+            tail_capacity(self.iterations, self.importance_sampling),
+            self.memory_budget.attribution_capacity(len(sources))
+        )
+        return LossAttribution(sources, capacity)
+
+    def new_defense_value(
+        self,
+        plan: SimulationPlan,
+        business_assets: List[Dict],
         defense_systems: List[Dict]
+    ) -> Optional[DefenseValue]:
+        """
+        Accumulator for the simulated loss reduction of the defenses, as a
+        whole and one by one; none without defenses or in the reference engine
+        """
+        if self.mode == "reference" or plan.defense_count == 0:
+            return None
+        return DefenseValue(plan, business_assets, defense_systems, self.cascade_factor)
+
+    def simulate_blocks(
+        self,
+        plan: SimulationPlan,
+        blocks,
+        attribution: Optional[LossAttribution] = None,
+        statistics=None,
+        samples: Optional[SampleMatrix] = None,
+        defense_value: Optional[DefenseValue] = None
+    ):
+        """
+        Fold the given random stream blocks, in block order, into a statistics
+        accumulator (a new one unless given) and return it. Any subset of
+        blocks can be simulated in any process and the accumulators merged.
+        Blocks are simulated one chunk at a time in reused buffers, so memory
+        does not grow with the number of blocks. Per-event losses are folded
+        into attribution when one is given, the unmitigated per-event
+        losses recorded into samples, and the losses without the defenses
+        into defense_value.
+        """
+        if statistics is None:
+            statistics = self.new_statistics()
+        for block in blocks:
+            statistics.update(np.asarray(self._draw_losses(
+                block_iterations(block, self.iterations, self.block_size),
+                plan,
+                block_generator(self.seed, block),
+                attribution,
+                samples,
+                defense_value
+            ), dtype=float), block)
+            held = self._buffers.nbytes + statistics.nbytes + sum(
+                accumulator.nbytes for accumulator in (attribution, samples, defense_value) if accumulator is not None
+            )
+            self._peak_bytes = max(self._peak_bytes, held)
+        return statistics
+
+    def record_samples(
+        self,
+        risk_events: List[Dict],
+        business_assets: List[Dict],
+        defense_systems: List[Dict],
+        plan_key: Optional[Tuple[str, int, str]] = None
+    ) -> SampleMatrix:
+        """
+        Simulate the run and keep its unmitigated per-event losses, so other
+        defense configurations can be evaluated on the same draws
+        """
+        if self.mode == "reference":
+            raise ValueError("The reference engine does not record sample matrices")
+        plan = self.compile_plan(risk_events, business_assets, defense_systems, plan_key)
+        self.resolve_block_size(plan.risk_events)
+        self.check_precision(plan)
+        if not self.memory_budget.sample_matrix_fits(self.iterations, plan.event_count, self.dtype.itemsize):
+            raise ValueError(
+                f"The sample matrix of {self.iterations} iterations x {plan.event_count} events does not fit "
+                f"a {self.memory_budget.megabytes:g} MB memory budget; reduce the iterations"
+            )
+        samples = SampleMatrix(self.iterations, plan.event_count, self.dtype, self.importance_sampling)
+        samples.seed, samples.block_size = self.seed, self.block_size
+        self.simulate_blocks(plan, range(block_count(self.iterations, self.block_size)), samples=samples)
+        return samples
+
+    def run_horizon(
+        self,
+        risk_events: List[Dict],
+        business_assets: List[Dict],
+        defense_systems: List[Dict],
+        schedule: HorizonSchedule,
+        plan_key: Optional[Tuple[str, int, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Simulate every iteration over schedule.years years with the per-year
+        frequency and impact multipliers, streaming the annual and cumulative
+        losses of each block into accumulators (see app.services.horizon)
+        """
+        if self.importance_sampling:
+            raise ValueError("Importance sampling tilts a single year; disable it for a multi-year horizon")
+        plans = [
+            self.compile_plan(
+                risk_events, business_assets, defense_systems, plan_key,
+                frequency_scale=float(frequency_scale), impact_scale=float(impact_scale)
+            )
+            for frequency_scale, impact_scale in zip(schedule.frequency_scales, schedule.impact_scales)
+        ]
+        # The busiest year sizes the chunks
+        self.resolve_block_size(plans[int(np.argmax(schedule.frequency_scales))].risk_events)
+        self.check_precision(plans[0])
+
+        limit = self.memory_budget.statistics_limit(2 * schedule.years + 1)
+        new_statistics = lambda: StreamingStatistics(exact_limit=limit, compensated=self.dtype != np.float64)
+        annual = [new_statistics() for _ in plans]
+        cumulative = [new_statistics() for _ in plans]
+        present_value = new_statistics()
+        defense_costs = schedule.defense_costs(defense_systems)
+        # Ruin thresholds on the losses alone, net of the spending so far
+        capital = schedule.capital(business_assets)
+        thresholds = capital - np.cumsum(defense_costs) if capital is not None else None
+        ruin_counts = np.zeros(schedule.years, dtype=np.int64)
+
+        for block in range(block_count(self.iterations, self.block_size)):
+            iterations = block_iterations(block, self.iterations, self.block_size)
+            running = np.zeros(iterations)
+            discounted = np.zeros(iterations)
+            for year, plan in enumerate(plans):
+                losses = np.asarray(
+                    self._draw_losses(iterations, plan, block_generator(self.seed, block, year)), dtype=float
+                )
+                running += losses
+                discounted += losses * schedule.discount_factors[year]
+                annual[year].update(losses, block)
+                cumulative[year].update(running, block)
+                if thresholds is not None:
+                    ruin_counts[year] += int(np.count_nonzero(running >= thresholds[year]))
+            present_value.update(discounted, block)
+            held = self._buffers.nbytes + sum(statistics.nbytes for statistics in (*annual, *cumulative, present_value))
+            self._peak_bytes = max(self._peak_bytes, held)
+
+        results = horizon_report(
+            schedule,
+            [self._calculate_statistics(statistics) for statistics in annual],
+            [self._calculate_statistics(statistics) for statistics in cumulative],
+            self._calculate_statistics(present_value),
+            ruin_counts, self.iterations, defense_costs, capital
+        )
+        results["iterations"] = self.iterations
+        results["random_stream"] = {
+            **stream_layout(self.seed, self.iterations, self.block_size),
+            "periods": "SeedSequence(seed, spawn_key=(block, year)) from the second year on",
+        }
+        results["sampling"] = self.sampling
+        results["correlation"] = describe_correlation(self.correlation)
+        results["memory"] = self.memory_report()
+        results["precision"] = self.precision_report()
+        return results
+
+    def run_adaptive_simulation(
+        self,
+        risk_events: List[Dict],
+        business_assets: List[Dict],
+        defense_systems: List[Dict],
+        target_precision: float = 0.01,
+        time_budget: Optional[float] = None,
+        batch_size: int = 5000,
+        min_iterations: int = 10000,
+        plan_key: Optional[Tuple[str, int, str]] = None
     ) -> Dict[str, Any]:
         """
-        Run Monte Carlo simulation for risk analysis
+        Simulate random stream blocks, checking convergence every batch_size
+        iterations, until every tracked metric's relative standard error is at
+        most target_precision, self.iterations is reached or time_budget
+        (seconds) runs out. Convergence is first checked after min_iterations.
+        """
+        if self.importance_sampling:
+            raise ValueError("Importance sampling runs a fixed number of iterations; disable adaptive mode")
+        if min_iterations < 2:
+            raise ValueError("min_iterations must be at least 2")
+        started = time.perf_counter()
+        plan = self.compile_plan(risk_events, business_assets, defense_systems, plan_key)
+        self.resolve_block_size(plan.risk_events)
+        self.check_precision(plan)
+        attribution = self.new_attribution(plan)
+        defense_value = self.new_defense_value(plan, business_assets, defense_systems)
+        # Constant-memory accumulator: batches are folded in and discarded
+        statistics = self.new_statistics()
+        stop_reason = "max_iterations"
+        block = 0
+        next_check = min(min_iterations, self.iterations)
+
+        while statistics.count < self.iterations:
+            self.simulate_blocks(plan, [block], attribution, statistics, defense_value=defense_value)
+            block += 1
+
+            if statistics.count < next_check:
+                continue
+            next_check = statistics.count + batch_size
+
+            estimates, standard_errors = self._convergence_errors(statistics)
+            relative_errors, _ = self._relative_errors(estimates, standard_errors)
+
+            if max(relative_errors.values(), default=0.0) <= target_precision:
+                stop_reason = "precision_reached"
+                break
+            if time_budget is not None and time.perf_counter() - started >= time_budget:
+                stop_reason = "time_budget"
+                break
+
+        estimates, standard_errors = self._convergence_errors(statistics)
+        relative_errors, excluded = self._relative_errors(estimates, standard_errors)
+
+        results = self._calculate_statistics(statistics)
+        if attribution is not None:
+            results["event_attribution"] = attribution.to_result(
+                results["value_at_risk_95"], results["conditional_var_95"]
+            )
+        if defense_value is not None:
+            results["defense_value"] = defense_value.to_result(results["expected_annual_loss"])
+        results["convergence"] = {
+            "converged": max(relative_errors.values(), default=0.0) <= target_precision,
+            "stop_reason": stop_reason,
+            "iterations_used": statistics.count,
+            "max_iterations": self.iterations,
+            "target_relative_error": target_precision,
+            "standard_errors": standard_errors,
+            "relative_errors": relative_errors,
+            # Estimated at zero with a non-zero error, so not part of the stopping rule
+            "excluded_metrics": excluded,
+            "elapsed_seconds": time.perf_counter() - started
+        }
+        results["statistics_method"] = statistics.describe()
+        results["random_stream"] = stream_layout(self.seed, statistics.count, self.block_size)
+        results["sampling"] = self.sampling
+        results["correlation"] = describe_correlation(self.correlation)
+        results["memory"] = self.memory_report(attribution)
+        results["precision"] = self.precision_report()
+        return results
+
+    def _draw_losses(
+        self,
+        iterations: int,
+        plan: SimulationPlan,
+        rng: np.random.Generator,
+        attribution: Optional[LossAttribution] = None,
+        samples: Optional[SampleMatrix] = None,
+        defense_value: Optional[DefenseValue] = None
+    ):
+        """
+        Per-iteration losses from the configured engine
+        """
+        if self.mode == "reference":
+            return self._run_reference(iterations, plan, rng)
+        return self._run_vectorized(iterations, plan, rng, attribution, samples, defense_value)
+
+    def _run_reference(self, iterations: int, plan: SimulationPlan, rng: np.random.Generator) -> List[float]:
+        """
+        Reference engine: one Python iteration per simulated year and one
+        impact draw per occurrence
         """
+        events = list(zip(
+            plan.frequency_distributions, plan.probability.tolist(), plan.frequency.tolist(),
+            plan.dispersion.tolist(), plan.severity, plan.mitigation.tolist()
+        ))
         results = []
-        
-        for _ in range(self.iterations):
+
+        for _ in range(iterations):
             iteration_loss = 0
-            
-            for event in risk_events:
-                # Determine if event occurs
-                if np.random.random() * 100 <= event.get('probability', 0):
+
+            for distribution, probability, rate, dispersion, severity, mitigation in events:
+                # Determine how many times the event occurs this year
+                for _ in range(sample_count(rng, distribution, probability, rate, dispersion)):
                     # Calculate impact with defense mitigation
-                    base_impact = np.random.uniform(
-                        event.get('impact_min', 0), 
-                        event.get('impact_max', 0)
-                    )
-                    mitigated_impact = self._apply_defenses(base_impact, event, defense_systems)
-                    iteration_loss += mitigated_impact
-            
+                    base_impact = float(severity.sample(rng.random(1))[0])
+                    iteration_loss += base_impact * mitigation
+
             results.append(iteration_loss)
-        
-        return self._calculate_statistics(results)
-    
-    def _apply_defenses(
-        self, 
-        base_impact: float, 
-        risk_event: Dict, 
-        defense_systems: List[Dict]
-    ) -> float:
-        """
-        Apply defense system effectiveness to reduce impact
-        """
-        mitigated_impact = base_impact
-        
-        for defense in defense_systems:
-            # Simple mitigation: reduce impact by defense effectiveness
-            effectiveness = defense.get('effectiveness', 0) / 100
-            coverage = defense.get('coverage_percentage', 100) / 100
-            reduction = effectiveness * coverage
-            mitigated_impact *= (1 - reduction)
-        
-        return max(0, mitigated_impact)
-    
-    def _calculate_statistics(self, results: List[float]) -> Dict[str, Any]:
-        """
-        Calculate statistical measures from simulation results
-        """
-        results_array = np.array(results)
-        
-        return {
-            "p50_median_impact": float(np.percentile(results_array, 50)),
-            "p90_severe_impact": float(np.percentile(results_array, 90)),
-            "p95_impact": float(np.percentile(results_array, 95)),
-            "p99_worst_case": float(np.percentile(results_array, 99)),
-            "expected_annual_loss": float(np.mean(results_array)),
-            "value_at_risk_95": float(np.percentile(results_array, 95)),
-            "conditional_var_95": float(np.mean(results_array[results_array >= np.percentile(results_array, 95)])),
-            "standard_deviation": float(np.std(results_array)),
-            "maximum_loss": float(np.max(results_array)),
-            "minimum_loss": float(np.min(results_array)),
-            "iterations": self.iterations,
-            "confidence_intervals": {
-                "p10": float(np.percentile(results_array, 10)),
-                "p25": float(np.percentile(results_array, 25)),
-                "p75": float(np.percentile(results_array, 75)),
-                "p90": float(np.percentile(results_array, 90))
-            }
-        }
\ No newline at end of file
+
+        return results
+
+    def _run_vectorized(
+        self,
+        iterations: int,
+        plan: SimulationPlan,
+        rng: np.random.Generator,
+        attribution: Optional[LossAttribution] = None,
+        samples: Optional[SampleMatrix] = None,
+        defense_value: Optional[DefenseValue] = None
+    ) -> np.ndarray:
+        """
+        Vectorized compound frequency-severity engine: draw an (iterations x
+        events) count matrix, draw every occurrence's impact in one bulk call
+        and sum them back per iteration with a segmented reduction
+        """
+        event_count = plan.event_count
+        if event_count == 0:
+            return self._with_weights(np.zeros(iterations), np.ones(iterations))
+
+        importance = plan.importance
+        # Sampler dimensions: each event's count, then the impact of its first occurrence
+        sampler = build_sampler(self.sampling, rng)
+        uniforms = sampler.uniforms(
+            iterations, 2 * event_count,
+            out=self._buffers.take("uniforms", (iterations, 2 * event_count), self._sample_dtype)
+        )
+        if importance is not None:
+            occurrence_ratios, severity_ratios = importance.apply(uniforms)
+        counts = self._sample_counts(uniforms[:, :event_count], plan)
+        if plan.copula is not None:
+            # Correlated events' counts and first impacts come from the copula
+            plan.copula.apply(uniforms, counts, sampler)
+        if self._sample_dtype != np.float64 and (importance is not None or plan.copula is not None):
+            # Transformed float64 values can round up to 1 when stored as float32
+            np.minimum(uniforms, below_one(self._sample_dtype), out=uniforms)
+        event_losses = self._event_losses(counts, uniforms[:, event_count:], rng, plan)
+
+        # Mitigation is linear in the impact, so it folds into a single
+        # matrix-vector product over the per-event losses
+        mitigation = plan.mitigation.astype(self.dtype, copy=False)
+        losses = event_losses @ mitigation
+        attributed = np.multiply(
+            event_losses, mitigation, out=self._buffers.take("attributed", event_losses.shape, self.dtype)
+        ) if attribution is not None else None
+        occurred = counts > 0
+        if plan.cascade is not None:
+            # Damage to assets spreads to the assets that depend on them
+            cascade_losses = plan.cascade.losses(event_losses)
+            losses += cascade_losses
+            if attribution is not None:
+                attributed = np.column_stack((attributed, cascade_losses))
+                occurred = np.column_stack((occurred, cascade_losses > 0))
+
+        # Nothing rare enough to tilt: every likelihood ratio is 1
+        weights = np.ones(iterations) if importance is None \
+            else importance.weights(counts, occurrence_ratios, severity_ratios)
+        if attribution is not None:
+            # Per-event columns of the same sample matrix, at no extra simulation cost
+            attribution.update(losses, attributed, occurred, weights if importance is not None else None)
+        if samples is not None:
+            samples.update(event_losses, weights if importance is not None else None)
+        if defense_value is not None:
+            # The same draws without all, or without each one, of the defenses
+            defense_value.update(event_losses, losses, weights if importance is not None else None)
+        return self._with_weights(losses, weights)
+
+    def _with_weights(self, losses: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """(loss, likelihood ratio) rows in importance sampling mode, plain losses otherwise"""
+        if self.importance_sampling:
+            return np.column_stack((losses, weights))
+        return losses
+
+    def _sample_counts(self, uniforms: np.ndarray, plan: SimulationPlan) -> np.ndarray:
+        """
+        Turn an (iterations x events) uniform matrix into occurrence counts
+        """
+        counts = self._buffers.take("counts", uniforms.shape, np.int64)
+        for index, table in enumerate(plan.count_tables):
+            counts[:, index] = sample_counts(uniforms[:, index], plan.probability[index], table)
+        return counts
+
+    def _event_losses(
+        self,
+        counts: np.ndarray,
+        first_uniforms: np.ndarray,
+        rng: np.random.Generator,
+        plan: SimulationPlan
+    ) -> np.ndarray:
+        """
+        Unmitigated (iterations x events) losses: one impact per occurrence,
+        summed per cell. Occurrences are laid out event-major, so each event's
+        impacts form one contiguous slice of the uniforms. A cell's first
+        occurrence uses the sampler's uniform; repeat occurrences draw plain
+        random ones.
+        """
+        iterations, event_count = counts.shape
+        per_cell = counts.T.ravel()
+        offsets = np.concatenate(([0], np.cumsum(counts.sum(axis=0))))
+        occupied = per_cell > 0
+        starts = np.concatenate(([0], np.cumsum(per_cell)[:-1]))[occupied]
+
+        occurrences = int(offsets[-1])
+        uniforms = self._buffers.take("occurrence_uniforms", occurrences, self._sample_dtype)
+        repeats = self._buffers.take("repeats", occurrences, bool)
+        repeats.fill(True)
+        repeats[starts] = False
+        uniforms[starts] = first_uniforms.T.ravel()[occupied]
+        uniforms[repeats] = rng.random(int(repeats.sum()), dtype=self._sample_dtype)
+
+        impacts = self._buffers.take("impacts", occurrences, self.dtype)
+        for index, severity in enumerate(plan.severity):
+            draws = slice(offsets[index], offsets[index + 1])
+            impacts[draws] = severity.sample(uniforms[draws])
+
+        # Segmented sum of the impacts back onto their (event, iteration) cells
+        losses = self._buffers.take("event_losses", iterations * event_count, self.dtype)
+        losses.fill(0.0)
+        if occupied.any():
+            losses[occupied] = np.add.reduceat(impacts, starts)
+        return losses.reshape(event_count, iterations).T
+
+    def _calculate_statistics(self, results) -> Dict[str, Any]:
+        """
+        Calculate statistical measures from simulation results, given either the
+        per-iteration losses or a statistics accumulator
+        """
+        if isinstance(results, (StreamingStatistics, WeightedSample)):
+            return results.to_result()
+        results = np.asarray(results, dtype=float)
+        if results.ndim == 2:
+            # Importance sampling: losses with their likelihood ratios
+            return weighted_loss_statistics(results[:, 0], results[:, 1])
+        return loss_statistics(results)
+
+    def _convergence_errors(self, statistics: StreamingStatistics) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        Point estimates and standard errors for the convergence metrics.
+        Quantile errors come from distribution-free order-statistic bounds;
+        the CVaR error uses its asymptotic variance.
+        """
+        n = statistics.count
+        z = 1.96
+
+        estimates = {"expected_annual_loss": statistics.moments.mean}
+        standard_errors = {
+            "expected_annual_loss": float(statistics.moments.std(ddof=1) / np.sqrt(n)) if n > 1 else float("inf")
+        }
+
+        for metric, p in (("p50_median_impact", 0.50), ("p90_severe_impact", 0.90),
+                          ("p95_impact", 0.95), ("p99_worst_case", 0.99)):
+            half_width = z * np.sqrt(n * p * (1 - p))
+            lower_rank = max(0, int(np.floor(n * p - half_width)))
+            upper_rank = min(n - 1, int(np.ceil(n * p + half_width)))
+            estimate, lower, upper = statistics.percentile([
+                p * 100, 100 * lower_rank / max(n - 1, 1), 100 * upper_rank / max(n - 1, 1)
+            ])
+            estimates[metric] = float(estimate)
+            standard_errors[metric] = float((upper - lower) / (2 * z))
+
+        alpha = 0.95
+        var_95 = estimates["p95_impact"]
+        _, cvar_95, tail_variance = statistics.tail_moments(var_95)
+        tail_variance += alpha * (cvar_95 - var_95) ** 2
+        estimates["conditional_var_95"] = cvar_95
+        standard_errors["conditional_var_95"] = float(np.sqrt(tail_variance / (n * (1 - alpha))))
+
+        return estimates, standard_errors
+
+    def _relative_errors(
+        self,
+        estimates: Dict[str, float],
+        standard_errors: Dict[str, float]
+    ) -> Tuple[Dict[str, float], List[str]]:
+        """
+        Standard error as a fraction of the estimate, for the metrics it is
+        defined for. A metric estimated at zero with a non-zero error (a
+        quantile whose interval straddles the loss-free iterations) has no
+        meaningful relative error; it is returned in the second list and left
+        out of the stopping rule, so every reported value stays finite.
+        """
+        relative_errors, excluded = {}, []
+        for metric in CONVERGENCE_METRICS:
+            estimate, error = abs(estimates[metric]), standard_errors[metric]
+            if error == 0:
+                relative_errors[metric] = 0.0
+            elif estimate > 0 and np.isfinite(error):
+                relative_errors[metric] = error / estimate
+            else:
+                excluded.append(metric)
+        return relative_errors, excluded
\ No newline at end of file
@@ -0,0 +1,392 @@
+# backend/app/services/portfolio_optimizer.py
+# Chooses the defense portfolio with the lowest expected loss or CVaR within a budget, scoring every
+# candidate subset on the scenario's recorded draws (see app.services.sample_matrix): greedy, then
+# branch and bound, or every affordable subset when there are few candidates.
+import heapq
+import math
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from app.services.mitigation import MitigationModel
+from app.services.cascade import DEFAULT_CASCADE_FACTOR, build_cascade
+from app.services.sample_matrix import SampleMatrix
+from app.services.what_if import defense_reference, loss_summary
+from app.services.defense_value import defense_cost
+
+OBJECTIVES = ("expected_annual_loss", "conditional_var_95")
+TAIL_LEVEL = 0.95
+# Portfolios a search may score before it settles for the best found
+DEFAULT_MAX_EVALUATIONS = 20000
+# Up to this many candidates every affordable subset is scored instead of searched
+EXHAUSTIVE_CANDIDATES = 12
+# Bytes of (portfolios x iterations) losses scored at once
+EVALUATION_BYTES = 64 * 2 ** 20
+REPORTED_METRICS = ("expected_annual_loss", "p90_severe_impact", "p95_impact", "conditional_var_95")
+
+def _efficiency(gains: np.ndarray, costs: np.ndarray) -> np.ndarray:
+    """Reduction per unit of cost; free candidates that help come first"""
+    return np.where(costs > 0, gains / np.maximum(costs, 1e-12), np.where(gains > 0, np.inf, 0))
+
+def objective_measure(losses: np.ndarray, objective: str, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Measure over the iterations under which each row's objective is its
+    expectation: (portfolios x iterations) losses in, rows summing to 1 out
+    """
+    count = losses.shape[1]
+    if objective == "expected_annual_loss":
+        measure = np.full(count, 1 / count) if weights is None else weights / weights.sum()
+        return np.broadcast_to(measure, losses.shape)
+    measure = np.zeros(losses.shape)
+    rows = np.arange(len(losses))[:, None]
+    if weights is None:
+        # The tail holds count x 5% iterations, the last one fractionally
+        mass = count * (1 - TAIL_LEVEL)
+        tail = min(math.ceil(mass), count)
+        largest = np.argpartition(-losses, tail - 1, axis=1)[:, :tail]
+        measure[rows, largest[:, :-1]] = 1 / mass
+        measure[rows[:, 0], largest[:, -1]] = (mass - (tail - 1)) / mass
+        return measure
+    order = np.argsort(-losses, axis=1, kind="stable")
+    ordered_weights = weights[order]
+    mass = weights.sum() * (1 - TAIL_LEVEL)
+    before = np.cumsum(ordered_weights, axis=1) - ordered_weights
+    np.put_along_axis(measure, order, np.clip(mass - before, 0, ordered_weights) / mass, axis=1)
+    return measure
+
+def portfolio_objective(losses: np.ndarray, objective: str, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Objective of each row of a (portfolios x iterations) loss matrix"""
+    return np.einsum("ij,ij->i", objective_measure(losses, objective, weights), losses)
+
+def fractional_knapsack(gains: np.ndarray, costs: np.ndarray, budget: float) -> float:
+    """Largest total gain when fractions of items may be bought"""
+    total, remaining = 0.0, budget
+    for item in np.argsort(-_efficiency(gains, costs), kind="stable"):
+        if gains[item] <= 0:
+            break
+        share = 1.0 if costs[item] <= remaining else remaining / costs[item]
+        total += share * gains[item]
+        remaining -= share * costs[item]
+        if remaining <= 0:
+            break
+    return total
+
+class PortfolioEvaluator:
+    """Objective of defense subsets on one recorded sample matrix"""
+
+    def __init__(
+        self,
+        samples: SampleMatrix,
+        risk_events: List[Dict],
+        business_assets: List[Dict],
+        candidates: List[Dict],
+        fixed_defenses: List[Dict],
+        objective: str = "expected_annual_loss",
+        cascade_factor: float = DEFAULT_CASCADE_FACTOR
+    ):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective '{objective}'. Available: {', '.join(OBJECTIVES)}")
+        self.samples = samples
+        self.business_assets = business_assets
+        self.objective = objective
+        self.cascade_factor = cascade_factor
+        # Fixed defenses stay in place in every portfolio and cost nothing
+        self.defenses = list(fixed_defenses) + list(candidates)
+        self.fixed_count = len(fixed_defenses)
+        self.model = MitigationModel(risk_events, business_assets, self.defenses)
+        # Whether a cascade exists depends on the asset graph, not on the defenses
+        self.cascades = build_cascade(business_assets, self.model, cascade_factor) is not None
+        self.rows_per_chunk = max(1, EVALUATION_BYTES // (8 * samples.iterations))
+        # Without a cascade the expected loss is linear in the mitigation
+        # factors, so the per-event means replace the whole sample matrix
+        self.event_means = None
+        if objective == "expected_annual_loss" and not self.cascades:
+            weights = samples.weights
+            event_losses = samples.event_losses.astype(float)
+            self.event_means = event_losses.mean(axis=0) if weights is None else weights @ event_losses / weights.sum()
+        self.evaluations = 0
+        self._scores: Dict[bytes, float] = {}
+
+    def _columns(self, portfolios: np.ndarray) -> np.ndarray:
+        """(portfolios x candidates) masks as (portfolios x defenses) 0/1 rows"""
+        matrix = np.ones((len(portfolios), len(self.defenses)))
+        matrix[:, self.fixed_count:] = portfolios
+        return matrix
+
+    def losses(self, portfolios: np.ndarray) -> np.ndarray:
+        """Per-iteration losses of each portfolio: (portfolios x candidates) masks in, (portfolios x iterations) out"""
+        portfolios = np.atleast_2d(np.asarray(portfolios, dtype=bool))
+        self.evaluations += len(portfolios)
+        event_losses = self.samples.event_losses
+        factors = self.model.portfolio_factors(self._columns(portfolios)).astype(event_losses.dtype)
+        losses = (factors @ event_losses.T).astype(float)
+        if self.cascades:
+            # The cascade depends on which assets end up protected, so each portfolio compiles its own
+            for row, active in enumerate(self._columns(portfolios)):
+                cascade = build_cascade(self.business_assets, self.model, self.cascade_factor, active)
+                losses[row] += cascade.losses(event_losses)
+        return losses
+
+    def _remember(self, portfolios: np.ndarray, values: np.ndarray):
+        self._scores.update(zip((np.packbits(portfolio).tobytes() for portfolio in portfolios), values.tolist()))
+
+    def score(self, portfolios: np.ndarray) -> np.ndarray:
+        """Objective per portfolio; portfolios already scored are not recomputed"""
+        portfolios = np.atleast_2d(np.asarray(portfolios, dtype=bool))
+        keys = [np.packbits(portfolio).tobytes() for portfolio in portfolios]
+        pending = np.array(list({key: row for row, key in enumerate(keys) if key not in self._scores}.values()), dtype=int)
+        if self.event_means is not None and len(pending):
+            self.evaluations += len(pending)
+            self._remember(portfolios[pending], self.model.portfolio_factors(self._columns(portfolios[pending])) @ self.event_means)
+            return np.array([self._scores[key] for key in keys])
+        for start in range(0, len(pending), self.rows_per_chunk):
+            chunk = portfolios[pending[start:start + self.rows_per_chunk]]
+            self._remember(chunk, portfolio_objective(self.losses(chunk), self.objective, self.samples.weights))
+        return np.array([self._scores[key] for key in keys])
+
+    def marginals(self, portfolio: np.ndarray, additions: np.ndarray) -> Tuple[float, np.ndarray, np.ndarray]:
+        """
+        The portfolio's objective, the objective with each addition, and each
+        addition's loss reduction under the portfolio's own measure (an
+        upper bound on its objective reduction)
+        """
+        if self.event_means is not None:
+            trials = np.repeat(portfolio[None, :], len(additions), axis=0)
+            trials[np.arange(len(trials)), additions] = True
+            value = float(self.score(portfolio)[0])
+            values = self.score(trials)
+            return value, values, value - values
+        losses = self.losses(portfolio)
+        measure = objective_measure(losses, self.objective, self.samples.weights)[0]
+        value = float(measure @ losses[0])
+        self._remember(portfolio[None, :], np.array([value]))
+        values, gains = np.empty(len(additions)), np.empty(len(additions))
+        for start in range(0, len(additions), self.rows_per_chunk):
+            rows = slice(start, start + self.rows_per_chunk)
+            trials = np.repeat(portfolio[None, :], len(additions[rows]), axis=0)
+            trials[np.arange(len(trials)), additions[rows]] = True
+            trial_losses = self.losses(trials)
+            values[rows] = portfolio_objective(trial_losses, self.objective, self.samples.weights)
+            gains[rows] = (losses[0] - trial_losses) @ measure
+            self._remember(trials, values[rows])
+        return value, values, gains
+
+class PortfolioOptimizer:
+    """Lowest-loss subset of candidate defenses within a budget"""
+
+    def __init__(self, evaluator: PortfolioEvaluator, costs: np.ndarray, budget: float,
+                 max_evaluations: int = DEFAULT_MAX_EVALUATIONS):
+        self.evaluator = evaluator
+        self.costs = np.asarray(costs, dtype=float)
+        self.budget = float(budget)
+        self.max_evaluations = max_evaluations
+        self.count = len(self.costs)
+
+    def _affordable(self, candidates: np.ndarray, spent: float) -> np.ndarray:
+        return candidates[self.costs[candidates] <= self.budget - spent + 1e-9]
+
+    def greedy(self) -> Tuple[np.ndarray, float, np.ndarray]:
+        """Greedy portfolio, its objective, and each candidate's standalone reduction"""
+        chosen = np.zeros(self.count, dtype=bool)
+        spent, standalone = 0.0, np.zeros(self.count)
+        value = float(self.evaluator.score(chosen)[0])
+        while True:
+            options = self._affordable(np.flatnonzero(~chosen), spent)
+            if len(options) == 0:
+                break
+            trials = np.repeat(chosen[None, :], len(options), axis=0)
+            trials[np.arange(len(options)), options] = True
+            gains = value - self.evaluator.score(trials)
+            if not chosen.any():
+                standalone[options] = gains
+            best = int(np.argmax(_efficiency(gains, self.costs[options])))
+            if gains[best] <= 0:
+                break
+            chosen[options[best]] = True
+            spent += self.costs[options[best]]
+            value -= gains[best]
+        return chosen, value, standalone
+
+    def _bound(self, chosen: np.ndarray, options: np.ndarray, spent: float) -> Tuple[float, np.ndarray, np.ndarray]:
+        """Lower bound on the node's subtree, and the objective with each affordable addition"""
+        value, values, gains = self.evaluator.marginals(chosen, options)
+        if self.evaluator.cascades:
+            # Cascades break the diminishing returns; adding a defense still never raises a loss
+            complete = chosen.copy()
+            complete[options] = True
+            bound = float(self.evaluator.score(complete)[0]) if len(options) else value
+        else:
+            # Defenses compound, so a set reduces the objective by at most the sum of its marginals
+            bound = value - fractional_knapsack(gains, self.costs[options], self.budget - spent)
+        return bound, values, value
+
+    def branch_and_bound(self, incumbent: np.ndarray, incumbent_value: float, order: np.ndarray) -> Dict[str, Any]:
+        """
+        Best-first search over include/exclude decisions in the given
+        candidate order; exact unless the evaluation limit is hit
+        """
+        best, best_value = incumbent.copy(), incumbent_value
+        tolerance = 1e-9 * max(abs(incumbent_value), 1.0)
+        # (bound inherited from the parent, tie-break, portfolio, decided candidates, spent)
+        nodes = [(-math.inf, 0, np.zeros(self.count, dtype=bool), 0, 0.0)]
+        expanded, sequence = 0, 0
+        while nodes and self.evaluator.evaluations < self.max_evaluations:
+            inherited, _, chosen, depth, spent = heapq.heappop(nodes)
+            if inherited >= best_value - tolerance:
+                continue
+            options = self._affordable(order[depth:], spent)
+            bound, values, value = self._bound(chosen, options, spent)
+            expanded += 1
+            # The node's portfolio and each single addition are feasible
+            for candidate, candidate_value in zip(options, values):
+                if candidate_value < best_value - tolerance:
+                    best = chosen.copy()
+                    best[candidate] = True
+                    best_value = float(candidate_value)
+            if value < best_value - tolerance:
+                best, best_value = chosen.copy(), value
+            if bound >= best_value - tolerance or len(options) == 0:
+                continue
+            # Branch on the first affordable undecided candidate; skipped ones are out
+            candidate = options[0]
+            branch = int(np.flatnonzero(order == candidate)[0]) + 1
+            included = chosen.copy()
+            included[candidate] = True
+            for child, child_spent in ((included, spent + self.costs[candidate]), (chosen, spent)):
+                sequence += 1
+                heapq.heappush(nodes, (bound, sequence, child, branch, child_spent))
+
+        open_bounds = [node[0] for node in nodes if node[0] < best_value - tolerance]
+        return {
+            "portfolio": best,
+            "value": best_value,
+            "optimal": not open_bounds,
+            "lower_bound": max(min(open_bounds + [best_value]), 0.0),
+            "nodes_expanded": expanded,
+        }
+
+    def exhaustive(self) -> Dict[str, Any]:
+        """Score every affordable subset at once; cheaper than searching when there are few candidates"""
+        subsets = (np.arange(2 ** self.count)[:, None] >> np.arange(self.count) & 1).astype(bool)
+        subsets = subsets[subsets @ self.costs <= self.budget + 1e-9]
+        values = self.evaluator.score(subsets)
+        best = int(np.argmin(values))
+        return {
+            "method": "exhaustive",
+            "portfolio": subsets[best],
+            "value": float(values[best]),
+            "optimal": True,
+            "lower_bound": float(values[best]),
+            "nodes_expanded": 0,
+        }
+
+    def run(self) -> Dict[str, Any]:
+        greedy, greedy_value, standalone = self.greedy()
+        if self.count <= EXHAUSTIVE_CANDIDATES:
+            search = self.exhaustive()
+        else:
+            # Most efficient first, so good portfolios are reached early and prune the rest
+            order = np.argsort(-_efficiency(standalone, self.costs), kind="stable")
+            search = {"method": "branch_and_bound", **self.branch_and_bound(greedy, greedy_value, order)}
+        return {"greedy": greedy, "greedy_value": greedy_value, "standalone": standalone, **search}
+
+def resolve_candidates(
+    defense_systems: List[Dict],
+    candidate_ids: Optional[List[str]] = None,
+    proposed: Optional[List[Dict]] = None
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    (candidates, fixed defenses). Without candidate_ids every defense
+    system of the scenario is a candidate; otherwise the others stay in
+    place as already paid for. Proposed defenses are always candidates.
+    """
+    if candidate_ids is None:
+        candidates, fixed = list(defense_systems), []
+    else:
+        index = {defense_reference(defense): defense for defense in defense_systems}
+        missing = [reference for reference in candidate_ids if str(reference) not in index]
+        if missing:
+            raise ValueError(f"Defense systems {', '.join(missing)} are not part of this scenario")
+        selected = {str(reference) for reference in candidate_ids}
+        candidates = [index[reference] for reference in dict.fromkeys(str(reference) for reference in candidate_ids)]
+        fixed = [defense for defense in defense_systems if defense_reference(defense) not in selected]
+    for position, defense in enumerate(proposed or []):
+        candidates.append({**defense, "id": f"proposed-{position + 1}", "proposed": True})
+    if not candidates:
+        raise ValueError("There are no candidate defense systems to choose from")
+    return candidates, fixed
+
+def optimize_defenses(
+    samples: SampleMatrix,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    budget: float,
+    objective: str = "expected_annual_loss",
+    candidate_ids: Optional[List[str]] = None,
+    proposed: Optional[List[Dict]] = None,
+    max_evaluations: int = DEFAULT_MAX_EVALUATIONS,
+    cascade_factor: float = DEFAULT_CASCADE_FACTOR
+) -> Dict[str, Any]:
+    """Best defense portfolio within the budget, scored on the recorded draws"""
+    started = time.perf_counter()
+    candidates, fixed = resolve_candidates(defense_systems, candidate_ids, proposed)
+    evaluator = PortfolioEvaluator(samples, risk_events, business_assets, candidates, fixed, objective, cascade_factor)
+    costs = np.array([defense_cost(defense) for defense in candidates])
+    result = PortfolioOptimizer(evaluator, costs, budget, max_evaluations).run()
+
+    def report(portfolio: np.ndarray) -> Dict[str, Any]:
+        summary = loss_summary(evaluator.losses(portfolio)[0], samples.weights)
+        return {
+            "defenses": [
+                {"defense_id": defense_reference(defense), "name": defense.get('name')}
+                for defense, active in zip(candidates, portfolio) if active
+            ],
+            "cost": float(costs[portfolio].sum()),
+            "objective_value": float(evaluator.score(portfolio)[0]),
+            **{metric: summary[metric] for metric in REPORTED_METRICS},
+        }
+
+    nothing = report(np.zeros(len(candidates), dtype=bool))
+    recommended = report(result["portfolio"])
+    everything = report(np.ones(len(candidates), dtype=bool))
+    for portfolio in (recommended, everything):
+        reduction = nothing["objective_value"] - portfolio["objective_value"]
+        portfolio["objective_reduction"] = reduction
+        portfolio["return_on_investment"] = (
+            (reduction - portfolio["cost"]) / portfolio["cost"] * 100 if portfolio["cost"] > 0 else None
+        )
+    everything["within_budget"] = everything["cost"] <= budget + 1e-9
+
+    return {
+        "objective": objective,
+        "budget": budget,
+        "recommended": recommended,
+        "greedy": {
+            "defenses": [defense_reference(defense) for defense, active in zip(candidates, result["greedy"]) if active],
+            "cost": float(costs[result["greedy"]].sum()),
+            "objective_value": result["greedy_value"],
+        },
+        # Fixed defenses only, and every candidate regardless of the budget
+        "without_candidates": nothing,
+        "all_candidates": everything,
+        "candidates": [
+            {
+                "defense_id": defense_reference(defense),
+                "name": defense.get('name'),
+                "proposed": bool(defense.get('proposed')),
+                "cost": float(cost),
+                "standalone_reduction": float(reduction),
+            }
+            for defense, cost, reduction in zip(candidates, costs, result["standalone"])
+        ],
+        "fixed_defenses": [defense_reference(defense) for defense in fixed],
+        "search": {
+            "method": result["method"],
+            "optimal": result["optimal"],
+            "lower_bound": result["lower_bound"],
+            "nodes_expanded": result["nodes_expanded"],
+            "portfolios_evaluated": evaluator.evaluations,
+            "max_evaluations": max_evaluations,
+            "elapsed_seconds": time.perf_counter() - started,
+        },
+    }
@@ -0,0 +1,106 @@
+# backend/app/services/sample_matrix.py
+# A run's unmitigated (iterations x events) losses, so any other defense configuration is evaluated
+# on the same occurrences and impacts with one matrix product. Recorded matrices are cached in the
+# API process, keyed like compiled plans and bounded by bytes.
+import os
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Hashable
+import numpy as np
+from app.services.simulation_plan import options_key
+
+SAMPLE_CACHE_MB = float(os.getenv("SAMPLE_CACHE_MB", "256"))
+
+class SampleMatrix:
+    """Unmitigated per-event losses of every iteration of one run, in block order"""
+
+    def __init__(self, iterations: int, event_count: int, dtype=np.float64, weighted: bool = False):
+        # Stored event-major like the engine's buffers, so each event's column
+        # and the transposed products in the cascade are contiguous
+        self.event_losses = np.empty((event_count, iterations), dtype=dtype).T
+        # Importance sampling likelihood ratios; they do not depend on the defenses
+        self.weights = np.empty(iterations) if weighted else None
+        self.filled = 0
+        self.seed: Optional[int] = None
+        self.block_size: Optional[int] = None
+
+    @property
+    def iterations(self) -> int:
+        return len(self.event_losses)
+
+    @property
+    def nbytes(self) -> int:
+        return self.event_losses.nbytes + (self.weights.nbytes if self.weights is not None else 0)
+
+    def update(self, event_losses: np.ndarray, weights: Optional[np.ndarray] = None):
+        """Append the next block's (iterations x events) losses"""
+        rows = slice(self.filled, self.filled + len(event_losses))
+        self.event_losses[rows] = event_losses
+        if self.weights is not None:
+            self.weights[rows] = weights
+        self.filled = rows.stop
+
+    def losses(self, mitigation: np.ndarray, cascade=None) -> np.ndarray:
+        """Per-iteration losses on these draws under the given mitigation factors and cascade"""
+        losses = (np.asarray(mitigation, dtype=self.event_losses.dtype) @ self.event_losses.T).astype(float)
+        if cascade is not None:
+            losses += cascade.losses(self.event_losses)
+        return losses
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "iterations": self.iterations,
+            "events": self.event_losses.shape[1],
+            # Seeds can exceed MongoDB's 64-bit integers
+            "seed": str(self.seed),
+            "block_size": self.block_size,
+            "dtype": self.event_losses.dtype.name,
+            "bytes": self.nbytes,
+        }
+
+def sample_key(plan_key: Tuple[str, int, str], iterations: int, **engine_options: Any) -> Tuple[str, int, str, str]:
+    """
+    Cache identity of a recorded run. Without a seed the key holds
+    seed=None, so every seedless request for the scenario version shares one
+    entry and is served by whichever baseline was recorded for it.
+    """
+    return (*plan_key, options_key(iterations=iterations, **engine_options))
+
+class SampleCache:
+    """Per-process LRU of recorded sample matrices, bounded by their total size"""
+
+    def __init__(self, max_megabytes: float = SAMPLE_CACHE_MB):
+        self.max_bytes = int(max_megabytes * 2 ** 20)
+        self._entries: "OrderedDict[Hashable, SampleMatrix]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable) -> Optional[SampleMatrix]:
+        samples = self._entries.get(key)
+        if samples is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return samples
+
+    def put(self, key: Hashable, samples: SampleMatrix):
+        if samples.nbytes > self.max_bytes:
+            return
+        # Older plan versions of the scenario can never be looked up again
+        for stale in [entry for entry in self._entries if entry[0] == key[0] and entry[1] < key[1]]:
+            self._remove(stale)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = samples
+        self._bytes += samples.nbytes
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: Hashable):
+        self._bytes -= self._entries.pop(key).nbytes
+
+    def status(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, **self.stats}
+
+sample_cache = SampleCache()
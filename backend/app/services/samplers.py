@@ -0,0 +1,114 @@
+# backend/app/services/samplers.py
+# Uniform samplers for the vectorized engine. Every mode fills the same
+# (iterations x dimensions) matrix of uniforms in [0, 1), which the engine maps
+# to occurrence counts and impacts by inverse CDF, so variance reduction is a
+# drop-in choice:
+#   - random: plain pseudo-random draws (default)
+#   - latin_hypercube: each column is stratified into `iterations` equal bins
+#   - sobol: scrambled Sobol low-discrepancy points
+#   - antithetic: the second half of the rows mirrors the first (u, 1 - u)
+# Each random stream block is an independent randomization of its sampler.
+# uniforms() can fill a caller-owned buffer, so chunked runs reuse one matrix;
+# a float32 buffer gets float32 draws (kept strictly below 1 after rounding).
+import warnings
+import numpy as np
+from scipy import special
+from typing import List, Dict, Type, Optional
+
+# Largest double below 1, so mirrored draws stay inside [0, 1)
+_BELOW_ONE = 1.0 - 2.0 ** -53
+_ABOVE_ZERO = 2.0 ** -53
+
+def below_one(dtype) -> float:
+    """Largest value below 1 in the given float type"""
+    return float(np.nextafter(np.ones(1, dtype=dtype), 0)[0])
+
+class UniformSampler:
+    """Plain pseudo-random uniforms"""
+    name = "random"
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+
+    def uniforms(self, rows: int, dimensions: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        dtype = out.dtype if out is not None else np.float64
+        return self.rng.random((rows, dimensions), dtype=dtype, out=out)
+
+    def normals(self, uniforms: np.ndarray) -> np.ndarray:
+        """
+        Standard normals for some of this sampler's uniform columns (used by
+        the copula). Plain random columns carry no structure, so fresh normals
+        are drawn instead of paying for the inverse CDF.
+        """
+        return self.rng.standard_normal(uniforms.shape)
+
+class _StructuredSampler(UniformSampler):
+    """Samplers whose uniforms are stratified, so normals must come from them"""
+
+    def uniforms(self, rows: int, dimensions: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        if out is not None and out.dtype != np.float64:
+            # Stratify in float64, then narrow without rounding up to 1
+            return np.minimum(self._uniforms(rows, dimensions), below_one(out.dtype), out=out)
+        return self._uniforms(rows, dimensions, out)
+
+    def _uniforms(self, rows: int, dimensions: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        raise NotImplementedError
+
+    def normals(self, uniforms: np.ndarray) -> np.ndarray:
+        return special.ndtri(np.clip(uniforms, _ABOVE_ZERO, _BELOW_ONE))
+
+class LatinHypercubeSampler(_StructuredSampler):
+    """One point in every 1/rows stratum of each dimension, randomly paired across dimensions"""
+    name = "latin_hypercube"
+
+    def _uniforms(self, rows: int, dimensions: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        strata = self.rng.permuted(np.tile(np.arange(rows), (dimensions, 1)), axis=1).T
+        out = self.rng.random((rows, dimensions), out=out)
+        out += strata
+        out /= rows
+        return out
+
+class SobolSampler(_StructuredSampler):
+    """Owen-scrambled Sobol sequence; best with power-of-two block sizes"""
+    name = "sobol"
+
+    def _uniforms(self, rows: int, dimensions: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        from scipy.stats import qmc
+
+        engine = qmc.Sobol(d=dimensions, scramble=True, seed=self.rng)
+        with warnings.catch_warnings():
+            # A short final block only loses some balance, which is acceptable
+            warnings.simplefilter("ignore", UserWarning)
+            points = engine.random(rows)
+        if out is None:
+            return points
+        out[...] = points
+        return out
+
+class AntitheticSampler(_StructuredSampler):
+    """Pairs every draw u with 1 - u"""
+    name = "antithetic"
+
+    def _uniforms(self, rows: int, dimensions: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        half = (rows + 1) // 2
+        if out is None:
+            out = np.empty((rows, dimensions))
+        base = self.rng.random((half, dimensions), out=out[:half])
+        mirrored = out[half:]
+        np.subtract(1.0, base[:len(mirrored)], out=mirrored)
+        np.minimum(mirrored, _BELOW_ONE, out=mirrored)
+        return out
+
+SAMPLERS: Dict[str, Type[UniformSampler]] = {
+    sampler.name: sampler
+    for sampler in (UniformSampler, LatinHypercubeSampler, SobolSampler, AntitheticSampler)
+}
+
+def build_sampler(name: str, rng: np.random.Generator) -> UniformSampler:
+    sampler = SAMPLERS.get(name)
+    if sampler is None:
+        raise ValueError(f"Unknown sampling mode '{name}'. Available: {', '.join(sorted(SAMPLERS))}")
+    return sampler(rng)
+
+def list_samplers() -> List[str]:
+    return sorted(SAMPLERS)
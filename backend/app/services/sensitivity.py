@@ -0,0 +1,410 @@
+# backend/app/services/sensitivity.py
+# Sensitivity of a scenario's losses to its inputs: every risk event's
+# occurrence probability and impact range and every defense's effectiveness,
+# each varied by +/- swing around its current value. All parameter sets are
+# evaluated on one set of shared random numbers:
+#   - the run's blocks are simulated once. For each event the occurrence
+#     uniforms are mapped to counts at PROBABILITY_LEVELS probability
+#     multipliers. Counts only grow with the probability, so impacts are
+#     drawn for the largest count and the loss at each level is a prefix sum
+#     of the same impacts. This gives an (events x levels x iterations)
+#     tensor of unmitigated losses
+#   - scaling impact_min and impact_max together scales the event's severity,
+#     i.e. its loss column; defenses only change the per-event mitigation
+#     factors (MitigationModel.reduction_factors)
+# so any parameter set's losses are a gather and a matrix-vector product.
+# Dependency cascades are not linear in the losses: each parameter set's
+# unmitigated losses reaching the graph assets (which are linear) are
+# propagated with that set's defenses, many sets per pass
+# (DependencyCascade.set_losses).
+# One-at-a-time tornado swings come from 3 sets per factor. First-order and
+# total Sobol indices use the Saltelli design (matrices A, B and A with one
+# column from B, with the Saltelli 2010 and Jansen estimators); the A-with-
+# B-column sets differ from A in a single factor, so each is an update of
+# A's losses rather than a new evaluation. Samples are evaluated in chunks,
+# every set of a chunk at once.
+import numpy as np
+from scipy.stats import qmc
+from typing import List, Dict, Any, Optional, Tuple
+from app.services.distributions import frequency_cdf_table, sample_counts
+from app.services.samplers import build_sampler
+from app.services.simulation_plan import SimulationPlan
+from app.services.random_streams import block_count, block_iterations, block_generator
+
+SENSITIVITY_METRICS = ("expected_annual_loss", "p90_severe_impact")
+DEFAULT_SWING = 0.2
+# Odd, so the current probability is one of the levels
+PROBABILITY_LEVELS = 9
+DEFAULT_SOBOL_SAMPLES = 64
+BOOTSTRAP_RESAMPLES = 200
+# Elements of the loss tensors evaluated at once in the Sobol design; small
+# enough for a chunk's temporaries to stay in cache
+_ELEMENTS_PER_CHUNK = 250_000
+CONFIDENCE_LEVEL = 0.95
+
+def metric_values(losses: np.ndarray) -> np.ndarray:
+    """SENSITIVITY_METRICS of each row of a (sets x iterations) loss matrix"""
+    return np.stack((losses.mean(axis=1), np.percentile(losses, 90, axis=1)), axis=1)
+
+class SensitivityAnalysis:
+    """Tornado swings and Sobol indices of one scenario on shared random numbers"""
+
+    def __init__(self, monte_carlo, swing: float = DEFAULT_SWING, sobol_samples: int = DEFAULT_SOBOL_SAMPLES):
+        if not 0 < swing < 1:
+            raise ValueError("swing must be between 0 and 1")
+        if monte_carlo.mode == "reference":
+            raise ValueError("The reference engine does not support sensitivity analysis")
+        if monte_carlo.importance_sampling:
+            raise ValueError("Importance sampling weights depend on the parameters; disable it for sensitivity analysis")
+        self.monte_carlo = monte_carlo
+        self.swing = swing
+        # The Saltelli design takes a power of two of Sobol points
+        self.sobol_samples = 2 ** int(np.ceil(np.log2(sobol_samples))) if sobol_samples > 0 else 0
+        # Multipliers of the current values; the middle one is exactly 1
+        self.multipliers = 1 + swing * np.linspace(-1, 1, PROBABILITY_LEVELS)
+        self.baseline_level = PROBABILITY_LEVELS // 2
+
+    def run(
+        self,
+        risk_events: List[Dict],
+        business_assets: List[Dict],
+        defense_systems: List[Dict],
+        plan_key: Optional[Tuple[str, int, str]] = None
+    ) -> Dict[str, Any]:
+        monte_carlo = self.monte_carlo
+        plan = monte_carlo.compile_plan(risk_events, business_assets, defense_systems, plan_key)
+        monte_carlo.resolve_block_size(plan.risk_events)
+        # float32 stores the level losses at half the size; the parameter sets are evaluated in float64
+        monte_carlo.check_precision(plan)
+        if not monte_carlo.memory_budget.sample_matrix_fits(
+            monte_carlo.iterations, plan.event_count * PROBABILITY_LEVELS, monte_carlo.dtype.itemsize
+        ):
+            raise ValueError(
+                f"{monte_carlo.iterations} iterations x {plan.event_count} events x {PROBABILITY_LEVELS} levels "
+                f"do not fit a {monte_carlo.memory_budget.megabytes:g} MB memory budget; reduce the iterations"
+            )
+
+        factors = self._factors(plan, defense_systems)
+        level_losses = self._level_losses(plan)
+        reductions = plan.mitigation_model.reductions
+
+        baseline_losses = plan.mitigation @ level_losses[:, self.baseline_level]
+        if plan.cascade is not None:
+            baseline_losses += plan.cascade.losses(level_losses[:, self.baseline_level].T)
+        baseline = metric_values(baseline_losses[None, :])[0]
+        tornado = self._tornado(plan, factors, level_losses, baseline_losses, reductions)
+        sobol = self._sobol(plan, factors, level_losses, reductions) if self.sobol_samples else None
+
+        results = {
+            "metrics": list(SENSITIVITY_METRICS),
+            "swing": self.swing,
+            "baseline": dict(zip(SENSITIVITY_METRICS, baseline.tolist())),
+            "tornado": {},
+            "sobol": {} if sobol is not None else None,
+            "design": {
+                "iterations": monte_carlo.iterations,
+                "seed": str(monte_carlo.seed),
+                "sampling": monte_carlo.sampling,
+                "factors": len(factors),
+                "probability_levels": PROBABILITY_LEVELS,
+                "sobol_samples": self.sobol_samples,
+                "cascade": plan.cascade is not None,
+                "precision": monte_carlo.precision_report(),
+                # Loss vectors evaluated, all on the same draws
+                "parameter_sets": 1 + 2 * len(factors) + (self.sobol_samples * (len(factors) + 2) if sobol else 0),
+            },
+        }
+        for column, metric in enumerate(SENSITIVITY_METRICS):
+            swings = []
+            for factor, (low, high) in zip(factors, tornado):
+                swings.append({
+                    **factor,
+                    "low_value": float(low[column]),
+                    "high_value": float(high[column]),
+                    "swing": float(abs(high[column] - low[column])),
+                })
+            results["tornado"][metric] = sorted(swings, key=lambda entry: entry["swing"], reverse=True)
+            if sobol is not None:
+                indices = [{**factor, **sobol[index][column]} for index, factor in enumerate(factors)]
+                results["sobol"][metric] = sorted(indices, key=lambda entry: entry["total"], reverse=True)
+        return results
+
+    def _factors(self, plan: SimulationPlan, defense_systems: List[Dict]) -> List[Dict[str, Any]]:
+        """Factor descriptions with the parameter values at either end of the swing"""
+        low, high = self.multipliers[0], self.multipliers[-1]
+        factors = []
+        for index, event in enumerate(plan.risk_events):
+            probability = float(plan.probability[index])
+            reference = {"target": "risk_event", "id": plan.event_ids[index], "name": plan.event_names[index]}
+            factors.append({
+                **reference, "parameter": "probability", "index": index,
+                "current": probability, "low": probability * low, "high": min(probability * high, 100.0),
+            })
+            factors.append({
+                **reference, "parameter": "impact", "index": index,
+                "current": [float(plan.impact_min[index]), float(plan.impact_max[index])],
+                "low": [float(plan.impact_min[index] * low), float(plan.impact_max[index] * low)],
+                "high": [float(plan.impact_min[index] * high), float(plan.impact_max[index] * high)],
+            })
+        for index, defense in enumerate(defense_systems):
+            effectiveness = float(defense.get('effectiveness', 0))
+            factors.append({
+                "target": "defense_system", "id": str(defense.get('_id', defense.get('id', ''))),
+                "name": str(defense.get('name', '')), "parameter": "effectiveness", "index": index,
+                "current": effectiveness, "low": effectiveness * low, "high": min(effectiveness * high, 100.0),
+            })
+        return factors
+
+    def _level_losses(self, plan: SimulationPlan) -> np.ndarray:
+        """Unmitigated (events x levels x iterations) losses at every probability level"""
+        monte_carlo = self.monte_carlo
+        event_count = plan.event_count
+        probabilities, tables = [], []
+        for event in plan.risk_events:
+            scaled = [min(event.get('probability', 0) * multiplier, 100.0) for multiplier in self.multipliers]
+            probabilities.append(scaled)
+            tables.append([frequency_cdf_table({**event, "probability": probability}) for probability in scaled])
+
+        losses = np.empty((event_count, PROBABILITY_LEVELS, monte_carlo.iterations), dtype=monte_carlo.dtype)
+        start = 0
+        for block in range(block_count(monte_carlo.iterations, monte_carlo.block_size)):
+            iterations = block_iterations(block, monte_carlo.iterations, monte_carlo.block_size)
+            rng = block_generator(monte_carlo.seed, block)
+            sampler = build_sampler(monte_carlo.sampling, rng)
+            uniforms = sampler.uniforms(iterations, 2 * event_count)
+            if plan.copula is not None:
+                plan.copula.count_uniforms(uniforms, sampler)
+            rows = slice(start, start + iterations)
+            for index, severity in enumerate(plan.severity):
+                counts = np.stack([
+                    sample_counts(uniforms[:, index], probability, table)
+                    for probability, table in zip(probabilities[index], tables[index])
+                ])
+                # Counts grow with the probability; the clamp guards the tables' truncated tails
+                most = counts[-1]
+                np.minimum(counts, most, out=counts)
+                starts = np.concatenate(([0], np.cumsum(most)[:-1]))
+                occurrence_uniforms = rng.random(int(most.sum()))
+                occurred = most > 0
+                occurrence_uniforms[starts[occurred]] = uniforms[occurred, event_count + index]
+                # A cell's loss at a level is the sum of its first `count` impacts
+                prefix = np.concatenate(([0.0], np.cumsum(severity.sample(occurrence_uniforms))))
+                losses[index, :, rows] = prefix[starts + counts] - prefix[starts]
+            start = rows.stop
+        return losses
+
+    def _tornado(
+        self,
+        plan: SimulationPlan,
+        factors: List[Dict[str, Any]],
+        level_losses: np.ndarray,
+        baseline_losses: np.ndarray,
+        reductions: np.ndarray
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(low, high) metric values of each factor moved alone"""
+        mitigation = plan.mitigation
+        cascade = plan.cascade
+        current = level_losses[:, self.baseline_level]
+        if cascade is not None:
+            base_nodes = cascade.node_losses(current)
+            base_residuals = plan.mitigation_model.reduction_residuals(reductions[None, :])
+            # The linear part of the baseline, which the ends update
+            linear = mitigation @ current
+        else:
+            linear = baseline_losses
+        swings = []
+        for factor in factors:
+            index = factor["index"]
+            if factor["parameter"] == "effectiveness":
+                sets = np.tile(reductions, (2, 1))
+                sets[:, index] = self._scaled_reductions(plan, index, np.array([self.multipliers[0], self.multipliers[-1]]))
+                ends = plan.mitigation_model.reduction_factors(sets) @ current
+                if cascade is not None:
+                    residuals = plan.mitigation_model.reduction_residuals(sets)
+                    ends += cascade.set_losses(np.stack((base_nodes, base_nodes)), residuals)
+            else:
+                if factor["parameter"] == "probability":
+                    deltas = level_losses[index, [0, -1]] - current[index]
+                else:
+                    deltas = np.array([self.multipliers[0] - 1, self.multipliers[-1] - 1])[:, None] * current[index]
+                ends = linear + mitigation[index] * deltas
+                if cascade is not None:
+                    exposure = cascade.node_exposure[index].toarray()[0]
+                    nodes = base_nodes + exposure[None, :, None] * deltas[:, None, :]
+                    ends += cascade.set_losses(nodes, np.repeat(base_residuals, 2, axis=0))
+            low, high = metric_values(ends)
+            swings.append((low, high))
+        return swings
+
+    def _scaled_reductions(self, plan: SimulationPlan, defense: int, multipliers: np.ndarray) -> np.ndarray:
+        """A defense's reduction with its effectiveness scaled (coverage unchanged), capped at 100%"""
+        reduction = plan.mitigation_model.reductions[defense]
+        effectiveness = plan.mitigation_model.effectiveness[defense]
+        if effectiveness <= 0:
+            return np.full(len(multipliers), reduction)
+        return reduction * np.minimum(effectiveness * multipliers, 1.0) / effectiveness
+
+    def _sobol(
+        self,
+        plan: SimulationPlan,
+        factors: List[Dict[str, Any]],
+        level_losses: np.ndarray,
+        reductions: np.ndarray
+    ) -> List[List[Dict[str, Any]]]:
+        """First-order and total indices per factor and metric, with bootstrap intervals"""
+        factor_count = len(factors)
+        samples = self.sobol_samples
+        event_count = plan.event_count
+        events = np.arange(event_count)
+        kinds = np.array([factor["parameter"] for factor in factors])
+        targets = np.array([factor["index"] for factor in factors])
+
+        # Sobol points for both matrices; probability factors take one of the levels
+        sequence = qmc.Sobol(2 * factor_count, scramble=True, seed=self.monte_carlo.seed % 2 ** 32)
+        design = sequence.random_base2(int(np.log2(samples)))
+        matrices = []
+        for points in (design[:, :factor_count], design[:, factor_count:]):
+            levels = np.full((samples, event_count), self.baseline_level)
+            impacts = np.ones((samples, event_count))
+            sets = np.tile(reductions, (samples, 1))
+            for column in range(factor_count):
+                index = targets[column]
+                if kinds[column] == "probability":
+                    levels[:, index] = np.minimum((points[:, column] * PROBABILITY_LEVELS).astype(int), PROBABILITY_LEVELS - 1)
+                elif kinds[column] == "impact":
+                    impacts[:, index] = 1 + self.swing * (2 * points[:, column] - 1)
+                else:
+                    sets[:, index] = self._scaled_reductions(plan, index, 1 + self.swing * (2 * points[:, column] - 1))
+            matrices.append((levels, impacts, sets))
+        (levels_a, impacts_a, sets_a), (levels_b, impacts_b, sets_b) = matrices
+        mitigation_a = plan.mitigation_model.reduction_factors(sets_a)
+        mitigation_b = plan.mitigation_model.reduction_factors(sets_b)
+
+        # Metric values per sample for A, B and each A-with-B-column set,
+        # evaluated a chunk of samples at a time over the shared draws
+        outputs = np.empty((samples, factor_count + 2, len(SENSITIVITY_METRICS)))
+        iterations = level_losses.shape[2]
+        cascade = plan.cascade
+        node_count = len(cascade.nodes) if cascade is not None else 0
+        row_elements = iterations * (2 * event_count + (factor_count + 2) * (1 + node_count))
+        chunk = max(1, _ELEMENTS_PER_CHUNK // row_elements)
+        swaps = {
+            kind: (np.flatnonzero(kinds == kind) + 2, targets[kinds == kind])
+            for kind in ("probability", "impact", "effectiveness")
+        }
+        for start in range(0, samples, chunk):
+            rows = slice(start, start + chunk)
+            count = len(range(samples)[rows])
+            terms_a = impacts_a[rows, :, None] * level_losses[events, levels_a[rows]]
+            terms_b = impacts_b[rows, :, None] * level_losses[events, levels_b[rows]]
+            losses = np.empty((count, factor_count + 2, iterations))
+            losses[:, :1] = mitigation_a[rows, None, :] @ terms_a
+            losses[:, 1:2] = mitigation_b[rows, None, :] @ terms_b
+
+            # Probability from B, impact scale from A, or the other way round
+            deltas = {}
+            for kind, (columns, indices) in swaps.items():
+                if kind == "effectiveness" or not len(columns):
+                    continue
+                if kind == "probability":
+                    delta = level_losses[indices, levels_b[rows][:, indices]]
+                    delta -= level_losses[indices, levels_a[rows][:, indices]]
+                    delta *= impacts_a[rows][:, indices, None]
+                else:
+                    delta = level_losses[indices, levels_a[rows][:, indices]]
+                    delta *= (impacts_b[rows][:, indices] - impacts_a[rows][:, indices])[:, :, None]
+                deltas[kind] = delta
+                swapped_losses = mitigation_a[rows][:, indices, None] * delta
+                swapped_losses += losses[:, :1]
+                losses[:, columns] = swapped_losses
+
+            # Effectiveness from B: other mitigation factors on A's losses
+            columns, indices = swaps["effectiveness"]
+            swapped = np.repeat(sets_a[rows, None, :], len(columns), axis=1)
+            swapped[:, np.arange(len(columns)), indices] = sets_b[rows][:, indices]
+            if len(columns):
+                factors_swapped = plan.mitigation_model.reduction_factors(swapped.reshape(-1, len(reductions)))
+                losses[:, columns] = factors_swapped.reshape(count, len(columns), event_count) @ terms_a
+
+            if cascade is not None:
+                losses += self._sobol_cascade(
+                    plan, swaps, deltas, terms_a, terms_b, sets_a[rows], sets_b[rows], swapped
+                )
+            outputs[rows] = metric_values(losses.reshape(-1, iterations)).reshape(count, factor_count + 2, -1)
+
+        estimates = self._sobol_indices(outputs)
+        rng = np.random.default_rng(self.monte_carlo.seed % 2 ** 32)
+        resamples = np.stack([
+            self._sobol_indices(outputs[rng.integers(0, samples, samples)]) for _ in range(BOOTSTRAP_RESAMPLES)
+        ])
+        tails = (100 * (1 - CONFIDENCE_LEVEL) / 2, 100 * (1 + CONFIDENCE_LEVEL) / 2)
+        lower, upper = np.percentile(resamples, tails, axis=0)
+
+        return [
+            [
+                {
+                    "first_order": float(estimates[0, column, metric]),
+                    "total": float(estimates[1, column, metric]),
+                    "first_order_interval": [float(lower[0, column, metric]), float(upper[0, column, metric])],
+                    "total_interval": [float(lower[1, column, metric]), float(upper[1, column, metric])],
+                }
+                for metric in range(len(SENSITIVITY_METRICS))
+            ]
+            for column in range(factor_count)
+        ]
+
+    def _sobol_cascade(
+        self,
+        plan: SimulationPlan,
+        swaps: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        deltas: Dict[str, np.ndarray],
+        terms_a: np.ndarray,
+        terms_b: np.ndarray,
+        sets_a: np.ndarray,
+        sets_b: np.ndarray,
+        swapped: np.ndarray
+    ) -> np.ndarray:
+        """Cascade losses of a chunk's (samples x (2 + factors)) parameter sets"""
+        cascade = plan.cascade
+        model = plan.mitigation_model
+        count, event_count, iterations = terms_a.shape
+
+        def node_losses(terms: np.ndarray) -> np.ndarray:
+            flat = np.moveaxis(terms, 1, 0).reshape(event_count, -1)
+            return np.moveaxis(cascade.node_losses(flat).reshape(-1, count, iterations), 1, 0)
+
+        factor_count = sum(len(columns) for columns, _ in swaps.values())
+        nodes_a = node_losses(terms_a)
+        nodes = np.empty((count, factor_count + 2, *nodes_a.shape[1:]))
+        nodes[:, 0] = nodes_a
+        nodes[:, 1] = node_losses(terms_b)
+        residuals_a = model.reduction_residuals(sets_a)
+        residuals = np.repeat(residuals_a[:, None, :], factor_count + 2, axis=1)
+        residuals[:, 1] = model.reduction_residuals(sets_b)
+        for kind, (columns, indices) in swaps.items():
+            if kind == "effectiveness":
+                nodes[:, columns] = nodes_a[:, None]
+                if len(columns):
+                    residuals[:, columns] = model.reduction_residuals(
+                        swapped.reshape(-1, swapped.shape[2])
+                    ).reshape(count, len(columns), -1)
+            elif len(columns):
+                # Only the swapped event's losses change, and the node losses are linear in them
+                exposure = cascade.node_exposure[indices].toarray()
+                nodes[:, columns] = nodes_a[:, None] + exposure[None, :, :, None] * deltas[kind][:, :, None, :]
+        losses = cascade.set_losses(
+            nodes.reshape(-1, *nodes_a.shape[1:]), residuals.reshape(-1, residuals.shape[2])
+        )
+        return losses.reshape(count, factor_count + 2, iterations)
+
+    @staticmethod
+    def _sobol_indices(outputs: np.ndarray) -> np.ndarray:
+        """(first order, total) x factors x metrics from (samples x (2 + factors) x metrics) outputs"""
+        # Centering leaves the estimators unbiased and removes the mean's contribution to their variance
+        outputs = outputs - outputs[:, :2].mean(axis=(0, 1))
+        a, b, swapped = outputs[:, 0], outputs[:, 1], outputs[:, 2:]
+        variance = np.var(np.concatenate((a, b)), axis=0, ddof=1)
+        variance = np.where(variance > 0, variance, np.inf)
+        first_order = np.mean(b[:, None] * (swapped - a[:, None]), axis=0) / variance
+        total = 0.5 * np.mean((a[:, None] - swapped) ** 2, axis=0) / variance
+        return np.stack((first_order, total))
@@ -0,0 +1,200 @@
+# backend/app/services/simulation_cache.py
+# Content-addressed cache for Monte Carlo results. The key is a SHA-256 of the
+# normalized risk events, business assets and defense systems plus everything
+# else that changes the output (iterations, mode, engine version, seed), so an
+# unchanged scenario is served from cache and any edit misses automatically.
+# Two tiers: an in-process LRU with TTL and size limits, backed by MongoDB.
+import os
+import copy
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from bson import ObjectId
+from app.services.monte_carlo import ENGINE_VERSION
+
+SIMULATION_CACHE_TTL_SECONDS = int(os.getenv("SIMULATION_CACHE_TTL_SECONDS", "86400"))
+SIMULATION_CACHE_MAX_ENTRIES = int(os.getenv("SIMULATION_CACHE_MAX_ENTRIES", "256"))
+SIMULATION_CACHE_MAX_BYTES = int(os.getenv("SIMULATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SIMULATION_CACHE_PERSISTENT = os.getenv("SIMULATION_CACHE_PERSISTENT", "true").lower() == "true"
+
+# Bookkeeping fields that never influence a simulation
+_IGNORED_FIELDS = {"created_at", "updated_at"}
+
+def _normalize_value(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {str(k): _normalize_value(v) for k, v in value.items() if k not in _IGNORED_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        # 5 and 5.0 describe the same input
+        return int(value)
+    return value
+
+def make_cache_key(
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    iterations: int,
+    mode: str = "vectorized",
+    seed: Optional[int] = None,
+    options: Optional[Dict[str, Any]] = None
+) -> str:
+    """Stable hash of every input that determines the simulation output"""
+    payload = {
+        "engine_version": ENGINE_VERSION,
+        "iterations": iterations,
+        "mode": mode,
+        "seed": seed,
+        "options": _normalize_value(options or {}),
+        "risk_events": _normalize_value(risk_events),
+        "business_assets": _normalize_value(business_assets),
+        "defense_systems": _normalize_value(defense_systems),
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class SimulationCache:
+    def __init__(
+        self,
+        ttl_seconds: int = SIMULATION_CACHE_TTL_SECONDS,
+        max_entries: int = SIMULATION_CACHE_MAX_ENTRIES,
+        max_bytes: int = SIMULATION_CACHE_MAX_BYTES,
+        persistent: bool = SIMULATION_CACHE_PERSISTENT
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.persistent = persistent
+        # key -> (expires_at monotonic, size in bytes, results)
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    async def get(self, key: str, db=None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Look a key up in memory, then MongoDB; returns (results, tier)"""
+        results = self._get_memory(key)
+        if results is not None:
+            self.stats["memory_hits"] += 1
+            return copy.deepcopy(results), "memory"
+
+        if self.persistent and db is not None:
+            results = await self._get_persistent(key, db)
+            if results is not None:
+                self.stats["persistent_hits"] += 1
+                self._put_memory(key, results)
+                return copy.deepcopy(results), "persistent"
+
+        self.stats["misses"] += 1
+        return None, None
+
+    async def put(self, key: str, results: Dict[str, Any], db=None):
+        """Store results in both tiers"""
+        results = copy.deepcopy(results)
+        self._put_memory(key, results)
+        self.stats["stores"] += 1
+
+        if self.persistent and db is not None:
+            try:
+                now = datetime.utcnow()
+                await db.simulation_cache.replace_one(
+                    {"_id": key},
+                    {
+                        "_id": key,
+                        "engine_version": ENGINE_VERSION,
+                        "results": results,
+                        "created_at": now,
+                        "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                    },
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"⚠ Failed to persist simulation cache entry: {e}")
+
+    async def clear(self, db=None) -> int:
+        """Drop every cached result; returns the number of persistent entries removed"""
+        self._entries.clear()
+        self._bytes = 0
+
+        if self.persistent and db is not None:
+            result = await db.simulation_cache.delete_many({})
+            return result.deleted_count
+        return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["persistent_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self.persistent,
+            "engine_version": ENGINE_VERSION,
+        }
+
+    def _get_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, size, results = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.stats["expirations"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return results
+
+    def _put_memory(self, key: str, results: Dict[str, Any]):
+        size = len(json.dumps(results, default=str))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, size, results)
+        self._bytes += size
+
+        # Evict least recently used entries until both limits hold
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    async def _get_persistent(self, key: str, db) -> Optional[Dict[str, Any]]:
+        try:
+            document = await db.simulation_cache.find_one({"_id": key})
+        except Exception as e:
+            print(f"⚠ Failed to read simulation cache entry: {e}")
+            return None
+
+        # The TTL monitor only runs once a minute, so check expiry here too
+        if not document or document.get("expires_at", datetime.min) < datetime.utcnow():
+            return None
+        return document.get("results")
+
+simulation_cache = SimulationCache()
@@ -0,0 +1,292 @@
+# backend/app/services/simulation_executor.py
+# Runs CPU-bound Monte Carlo simulations in a pool of worker processes so the
+# uvicorn event loop stays free to serve other requests while they run.
+import os
+import asyncio
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.sensitivity import SensitivityAnalysis
+from app.services.horizon import HorizonSchedule
+from app.services.random_streams import block_count
+
+# Number of worker processes; defaults to one per CPU core
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", str(os.cpu_count() or 1)))
+
+executor: Optional[ProcessPoolExecutor] = None
+worker_count = 0
+
+def _warm_up() -> int:
+    """Load the simulation engine in a worker process ahead of the first request"""
+    MonteCarloSimulation(iterations=10).run_simulation(
+        [{"probability": 50, "impact_min": 0, "impact_max": 1}], [], []
+    )
+    return os.getpid()
+
+def _run_simulation(
+    iterations: int,
+    engine_options: Dict[str, Any],
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    adaptive: Optional[Dict[str, Any]] = None,
+    plan_key: Optional[Tuple[str, int, str]] = None
+) -> Dict[str, Any]:
+    """Worker-side entry point; must stay a module-level function so it pickles"""
+    monte_carlo = MonteCarloSimulation(iterations=iterations, **engine_options)
+    if adaptive is not None:
+        return monte_carlo.run_adaptive_simulation(
+            risk_events, business_assets, defense_systems, plan_key=plan_key, **adaptive
+        )
+    return monte_carlo.run_simulation(risk_events, business_assets, defense_systems, plan_key)
+
+def _simulate_blocks(
+    iterations: int,
+    engine_options: Dict[str, Any],
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    blocks: List[int],
+    plan_key: Optional[Tuple[str, int, str]] = None
+):
+    """
+    Worker-side entry point for one shard of a run's random stream blocks.
+    Returns the shard's statistics, per-event attribution and defense value
+    accumulators, and its memory use and precision check.
+    """
+    monte_carlo = MonteCarloSimulation(iterations=iterations, **engine_options)
+    plan = monte_carlo.compile_plan(risk_events, business_assets, defense_systems, plan_key)
+    monte_carlo.resolve_block_size(plan.risk_events)
+    monte_carlo.check_precision(plan)
+    attribution = monte_carlo.new_attribution(plan)
+    defense_value = monte_carlo.new_defense_value(plan, business_assets, defense_systems)
+    statistics = monte_carlo.simulate_blocks(plan, blocks, attribution, defense_value=defense_value)
+    return statistics, attribution, defense_value, monte_carlo.shard_report(attribution)
+
+def _record_samples(
+    iterations: int,
+    engine_options: Dict[str, Any],
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    plan_key: Optional[Tuple[str, int, str]] = None
+):
+    """Worker-side entry point recording a run's sample matrix"""
+    monte_carlo = MonteCarloSimulation(iterations=iterations, **engine_options)
+    return monte_carlo.record_samples(risk_events, business_assets, defense_systems, plan_key)
+
+def _run_sensitivity(
+    iterations: int,
+    engine_options: Dict[str, Any],
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    sensitivity_options: Dict[str, Any],
+    plan_key: Optional[Tuple[str, int, str]] = None
+) -> Dict[str, Any]:
+    """Worker-side entry point for a sensitivity analysis"""
+    monte_carlo = MonteCarloSimulation(iterations=iterations, **engine_options)
+    analysis = SensitivityAnalysis(monte_carlo, **sensitivity_options)
+    return analysis.run(risk_events, business_assets, defense_systems, plan_key)
+
+def _run_horizon(
+    iterations: int,
+    engine_options: Dict[str, Any],
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    horizon_options: Dict[str, Any],
+    plan_key: Optional[Tuple[str, int, str]] = None
+) -> Dict[str, Any]:
+    """Worker-side entry point for a multi-year horizon run"""
+    monte_carlo = MonteCarloSimulation(iterations=iterations, **engine_options)
+    return monte_carlo.run_horizon(
+        risk_events, business_assets, defense_systems, HorizonSchedule(**horizon_options), plan_key
+    )
+
+async def init_executor(max_workers: Optional[int] = None):
+    """Start the process pool and warm up every worker"""
+    global executor, worker_count
+
+    if executor is not None:
+        return
+
+    worker_count = max(1, max_workers or SIMULATION_WORKERS)
+    # "spawn" avoids forking a process that already holds Mongo client threads
+    executor = ProcessPoolExecutor(
+        max_workers=worker_count,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+    loop = asyncio.get_running_loop()
+    pids = await asyncio.gather(*(
+        loop.run_in_executor(executor, _warm_up) for _ in range(worker_count)
+    ))
+    print(f"✓ Simulation executor started with {len(set(pids))}/{worker_count} warm worker processes")
+
+async def close_executor():
+    """Shut down the process pool"""
+    global executor
+
+    if executor:
+        executor.shutdown(wait=True, cancel_futures=True)
+        executor = None
+        print("✓ Simulation executor shut down")
+
+async def run_in_executor(func: Callable, *args) -> Any:
+    """Run a picklable callable in the simulation process pool"""
+    if executor is None:
+        await init_executor()
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+async def run_simulation(
+    iterations: int,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    adaptive: Optional[Dict[str, Any]] = None,
+    workers: int = 1,
+    plan_key: Optional[Tuple[str, int, str]] = None,
+    **engine_options
+) -> Dict[str, Any]:
+    """
+    Run a Monte Carlo simulation in the process pool and await its statistics.
+    engine_options are passed to MonteCarloSimulation (mode, seed, sampling).
+    Passing adaptive settings switches to the convergence-driven mode, where
+    iterations is the upper bound. With workers > 1 a fixed-size run is split
+    across that many pool processes. Each block's statistics are combined
+    along a fixed tree over the block indices (see StreamingStatistics), so
+    the result is bit-identical for any number of workers, past the exact
+    limit as well.
+    plan_key (scenario id, plan version, source hash) lets each worker reuse
+    its compiled plan of the scenario across runs.
+    """
+    if adaptive is None and workers > 1:
+        return await run_sharded_simulation(
+            iterations, risk_events, business_assets, defense_systems, workers, plan_key, **engine_options
+        )
+    return await run_in_executor(
+        _run_simulation, iterations, engine_options, risk_events, business_assets, defense_systems,
+        adaptive, plan_key
+    )
+
+async def run_sharded_simulation(
+    iterations: int,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    workers: int = 2,
+    plan_key: Optional[Tuple[str, int, str]] = None,
+    **engine_options
+) -> Dict[str, Any]:
+    """Split a run's random stream blocks into contiguous shards, one per worker"""
+    monte_carlo, engine_options, shards = split_blocks(iterations, risk_events, workers, **engine_options)
+
+    shard_results = await asyncio.gather(*(
+        run_in_executor(
+            _simulate_blocks, iterations, engine_options,
+            risk_events, business_assets, defense_systems, shard, plan_key
+        )
+        for shard in shards
+    ))
+
+    results = await asyncio.to_thread(merge_shards, monte_carlo, shard_results)
+    results["random_stream"]["workers"] = len(shards)
+    return results
+
+def split_blocks(
+    iterations: int,
+    risk_events: List[Dict],
+    shards: int,
+    **engine_options
+) -> Tuple[MonteCarloSimulation, Dict[str, Any], List[List[int]]]:
+    """
+    A sharded run's engine, the engine options every shard runs with, and its
+    random stream blocks split into at most `shards` contiguous ranges
+    """
+    monte_carlo = MonteCarloSimulation(iterations=iterations, **engine_options)
+    # Every shard must use the same seed and block layout, including a freshly drawn seed
+    monte_carlo.resolve_block_size(risk_events)
+    engine_options = {**engine_options, "seed": monte_carlo.seed, "block_size": monte_carlo.block_size}
+    blocks = block_count(iterations, monte_carlo.block_size)
+    # Contiguous ranges, merged in order, keep the losses in block order
+    ranges = np.array_split(np.arange(blocks), max(1, min(shards, blocks)))
+    return monte_carlo, engine_options, [shard.tolist() for shard in ranges]
+
+def merge_shards(monte_carlo: MonteCarloSimulation, shard_results: List[Tuple]) -> Dict[str, Any]:
+    """Merge _simulate_blocks results, given in block order, into the run's statistics"""
+    statistics, attribution, defense_value, report = shard_results[0]
+    monte_carlo.merge_shard_report(report)
+    for shard_statistics, shard_attribution, shard_defense_value, shard_report in shard_results[1:]:
+        statistics.merge(shard_statistics)
+        if attribution is not None:
+            attribution.merge(shard_attribution)
+        if defense_value is not None:
+            defense_value.merge(shard_defense_value)
+        monte_carlo.merge_shard_report(shard_report)
+    return monte_carlo.summarize(statistics, attribution, defense_value)
+
+async def record_samples(
+    iterations: int,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    plan_key: Optional[Tuple[str, int, str]] = None,
+    **engine_options
+):
+    """
+    Simulate a run in the process pool and return its unmitigated per-event
+    loss matrix (see app.services.sample_matrix). Blocks are recorded in
+    order, so the run is not sharded.
+    """
+    return await run_in_executor(
+        _record_samples, iterations, engine_options, risk_events, business_assets, defense_systems, plan_key
+    )
+
+async def run_sensitivity(
+    iterations: int,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    sensitivity_options: Dict[str, Any],
+    plan_key: Optional[Tuple[str, int, str]] = None,
+    **engine_options
+) -> Dict[str, Any]:
+    """
+    Tornado swings and Sobol indices in the process pool; every parameter
+    set is evaluated on one simulation's draws (see app.services.sensitivity)
+    """
+    return await run_in_executor(
+        _run_sensitivity, iterations, engine_options, risk_events, business_assets, defense_systems,
+        sensitivity_options, plan_key
+    )
+
+async def run_horizon(
+    iterations: int,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    horizon_options: Dict[str, Any],
+    plan_key: Optional[Tuple[str, int, str]] = None,
+    **engine_options
+) -> Dict[str, Any]:
+    """
+    Multi-year projection in the process pool: per-year and cumulative loss
+    statistics and ruin probabilities (see app.services.horizon)
+    """
+    return await run_in_executor(
+        _run_horizon, iterations, engine_options, risk_events, business_assets, defense_systems,
+        horizon_options, plan_key
+    )
+
+def get_executor_status() -> Dict[str, Any]:
+    """Report the process pool configuration"""
+    return {
+        "running": executor is not None,
+        "workers": worker_count if executor is not None else 0,
+        "configured_workers": SIMULATION_WORKERS
+    }
@@ -0,0 +1,192 @@
+# backend/app/services/simulation_plan.py
+# Compiles a scenario's documents once into an immutable, array-backed plan the engine reads.
+# Plans are cached per process by (scenario id, plan version, engine options) and a hit is
+# only served when the hash of the caller's documents matches the ones it was compiled from.
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Callable, Hashable
+import numpy as np
+from bson import ObjectId
+from app.services.distributions import (
+    resolve_frequency_distribution, expected_frequency, frequency_cdf_table, build_severity_sampler,
+    scale_frequency, ScaledSeverity
+)
+from app.services.copula import build_copula
+from app.services.importance import build_importance
+from app.services.mitigation import MitigationModel
+from app.services.cascade import DEFAULT_CASCADE_FACTOR, build_cascade
+
+SIMULATION_PLAN_CACHE_ENTRIES = int(os.getenv("SIMULATION_PLAN_CACHE_ENTRIES", "64"))
+
+def _frozen(values) -> np.ndarray:
+    array = np.ascontiguousarray(values, dtype=np.float64)
+    array.setflags(write=False)
+    return array
+
+class SimulationPlan:
+    """Everything the engine needs about one scenario, compiled once and never modified"""
+
+    __slots__ = (
+        "risk_events",
+        "event_names",
+        "event_ids",
+        "frequency_distributions",
+        "probability",
+        "impact_min",
+        "impact_max",
+        "frequency",
+        "dispersion",
+        "mitigation",
+        "count_tables",
+        "severity",
+        "mitigation_model",
+        "cascade",
+        "copula",
+        "importance",
+        "asset_count",
+        "defense_count",
+    )
+
+    def __init__(
+        self,
+        risk_events: List[Dict],
+        business_assets: List[Dict],
+        defense_systems: List[Dict],
+        correlation: Optional[Dict[str, Any]] = None,
+        importance_sampling: bool = False,
+        cascade_factor: float = DEFAULT_CASCADE_FACTOR,
+        frequency_scale: float = 1.0,
+        impact_scale: float = 1.0
+    ):
+        assign = lambda name, value: object.__setattr__(self, name, value)
+        if frequency_scale != 1.0:
+            # One period of a multi-year run with trending threats
+            risk_events = [scale_frequency(event, frequency_scale) for event in risk_events]
+        assign("risk_events", tuple(risk_events))
+        assign("event_names", tuple(str(event.get('name', '')) for event in risk_events))
+        assign("event_ids", tuple(str(event.get('_id', event.get('id', ''))) for event in risk_events))
+        assign("frequency_distributions", tuple(resolve_frequency_distribution(event) for event in risk_events))
+        assign("probability", _frozen([event.get('probability', 0) for event in risk_events]))
+        assign("impact_min", _frozen([event.get('impact_min', 0) * impact_scale for event in risk_events]))
+        assign("impact_max", _frozen([event.get('impact_max', 0) * impact_scale for event in risk_events]))
+        # Expected occurrences per year and the negative binomial variance-to-mean ratio
+        assign("frequency", _frozen([expected_frequency(event) for event in risk_events]))
+        assign("dispersion", _frozen([event.get('frequency_dispersion') or 2.0 for event in risk_events]))
+        assign("asset_count", len(business_assets))
+        assign("defense_count", len(defense_systems))
+
+        count_tables = tuple(frequency_cdf_table(event) for event in risk_events)
+        for table in count_tables:
+            if table is not None:
+                table.setflags(write=False)
+        severity = tuple(build_severity_sampler(event) for event in risk_events)
+        if impact_scale != 1.0:
+            severity = tuple(ScaledSeverity(sampler, impact_scale) for sampler in severity)
+        # Defense reductions routed through the assets each event hits and each defense protects
+        mitigation_model = MitigationModel(risk_events, business_assets, defense_systems)
+        mitigation = _frozen(mitigation_model.factors())
+        copula = build_copula(correlation, risk_events, count_tables)
+        importance = None
+        if importance_sampling:
+            # The copula owns its events' uniforms, so those are never tilted
+            importance = build_importance(
+                risk_events, count_tables, severity, mitigation,
+                excluded=copula.indices if copula is not None else None
+            )
+        assign("count_tables", count_tables)
+        assign("severity", severity)
+        assign("mitigation_model", mitigation_model)
+        assign("mitigation", mitigation)
+        assign("cascade", build_cascade(business_assets, mitigation_model, cascade_factor))
+        assign("copula", copula)
+        assign("importance", importance)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("SimulationPlan is immutable")
+
+    def __delattr__(self, name: str):
+        raise AttributeError("SimulationPlan is immutable")
+
+    @property
+    def event_count(self) -> int:
+        return len(self.risk_events)
+
+def source_hash(risk_events: List[Dict], business_assets: List[Dict], defense_systems: List[Dict]) -> str:
+    """SHA-256 of the component documents a plan is compiled from"""
+    canonical = json.dumps(
+        [risk_events, business_assets, defense_systems], sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def plan_key(
+    scenario: Dict,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict]
+) -> Tuple[str, int, str]:
+    """Cache identity of a scenario's components as loaded: id, plan version and source hash"""
+    return (
+        str(scenario["_id"]),
+        int(scenario.get("plan_version", 0) or 0),
+        source_hash(risk_events, business_assets, defense_systems)
+    )
+
+def options_key(**options: Any) -> str:
+    """Canonical form of the engine options a plan is compiled with"""
+    return json.dumps(options, sort_keys=True, separators=(",", ":"), default=str)
+
+class PlanCache:
+    """Per-process LRU of compiled plans"""
+
+    def __init__(self, max_entries: int = SIMULATION_PLAN_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        # key -> (source hash, plan)
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[str], SimulationPlan]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0}
+
+    def get_or_compile(
+        self,
+        key: Hashable,
+        compile_plan: Callable[[], SimulationPlan],
+        source: Optional[str] = None
+    ) -> SimulationPlan:
+        """The cached plan for key if it was compiled from the same documents (source hash), else a new one"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == source:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+        # A plan under the same version but other documents was compiled mid-write
+        self.stats["stale" if entry is not None else "misses"] += 1
+        plan = compile_plan()
+        self._entries[key] = (source, plan)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return plan
+
+    def invalidate(self, scenario_id: str) -> int:
+        """Drop every plan compiled for a scenario; keys start with its id"""
+        stale = [key for key in self._entries if key[0] == str(scenario_id)]
+        for key in stale:
+            del self._entries[key]
+        self.stats["invalidations"] += len(stale)
+        return len(stale)
+
+    def clear(self):
+        self._entries.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, **self.stats}
+
+plan_cache = PlanCache()
+
+async def invalidate_scenario_plan(scenario_id: str, db) -> None:
+    """
+    Called before any write to a scenario's components: bumping plan_version
+    retires the cached plans in every process, not just this one
+    """
+    await db.scenarios.update_one({"_id": ObjectId(scenario_id)}, {"$inc": {"plan_version": 1}})
+    plan_cache.invalidate(scenario_id)
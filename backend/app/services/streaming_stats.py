@@ -0,0 +1,560 @@
+# backend/app/services/streaming_stats.py
+# One-pass, mergeable statistics for Monte Carlo losses. Memory stays bounded
+# regardless of how many iterations are fed in:
+#   - MomentAccumulator: count/mean/variance, merged exactly (Chan et al.)
+#   - KLLSketch: mergeable quantile sketch with bounded rank error
+#   - TailTracker: the largest `capacity` values kept exactly, so the upper
+#     percentiles and CVaR stay exact for as long as the tail fits
+# StreamingStatistics keeps the raw values until exact_limit is reached, so
+# ordinary runs reproduce the exact array statistics bit for bit. Beyond it,
+# each random stream block gets its own moments and sketch, combined along a
+# fixed tree over the block indices (BlockTree), so the result does not
+# depend on how the blocks were split across processes.
+# WeightedSample is the importance-sampling counterpart: weighted quantiles
+# need every (loss, likelihood ratio) row, so it only concatenates.
+# With compensated=True the exact sums are taken in float64 chunks (numpy's
+# pairwise summation) whose partials are added with math.fsum, for losses
+# accumulated in float32. A plain fsum over every value cost more than
+# float32 saved.
+import copy
+import math
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+# Percentiles reported in every result
+REPORTED_PERCENTILES = (10, 25, 50, 75, 90, 95, 99)
+
+# Values per pairwise-summed chunk of a compensated sum
+SUM_CHUNK = 4096
+
+def _compensated_sum(values: np.ndarray) -> float:
+    """Pairwise float64 sums of fixed chunks, added exactly with math.fsum"""
+    values = np.asarray(values, dtype=float)
+    whole = len(values) - len(values) % SUM_CHUNK
+    partials = values[:whole].reshape(-1, SUM_CHUNK).sum(axis=1)
+    return math.fsum(np.append(partials, values[whole:].sum()))
+
+def _mean(values: np.ndarray, compensated: bool = False) -> float:
+    return _compensated_sum(values) / len(values) if compensated else np.mean(values)
+
+def loss_statistics(values: np.ndarray, compensated: bool = False) -> Dict[str, Any]:
+    """Exact statistics for an in-memory array of per-iteration losses"""
+    values = np.asarray(values, dtype=float)
+
+    # One sort-based pass for every reported percentile
+    p10, p25, p50, p75, p90, p95, p99 = np.percentile(values, REPORTED_PERCENTILES)
+    mean = _mean(values, compensated)
+
+    return _format_statistics(
+        percentiles=(p10, p25, p50, p75, p90, p95, p99),
+        mean=mean,
+        std=np.sqrt(_mean((values - mean) ** 2, compensated)) if compensated else np.std(values),
+        cvar_95=_mean(values[values >= p95], compensated),
+        maximum=np.max(values),
+        minimum=np.min(values),
+        count=len(values)
+    )
+
+def weighted_loss_statistics(values: np.ndarray, weights: np.ndarray, compensated: bool = False) -> Dict[str, Any]:
+    """
+    Statistics for importance-sampled losses with their likelihood ratios,
+    using self-normalized estimators. Adds standard errors: the mean and CVaR
+    use their influence functions, quantiles invert the standard error of the
+    estimated exceedance probability.
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    order = np.argsort(values, kind="stable")
+    values, weights = values[order], weights[order]
+    total = _compensated_sum(weights) if compensated else weights.sum()
+    cumulative = np.cumsum(weights) / total
+
+    def quantile(q):
+        index = np.searchsorted(cumulative, np.clip(q, 0, 1), side="left")
+        return values[np.minimum(index, len(values) - 1)]
+
+    percentiles = quantile(np.array(REPORTED_PERCENTILES) / 100)
+    mean = float((_compensated_sum(weights * values) if compensated else np.dot(weights, values)) / total)
+    squared = weights * weights
+    standard_errors = {
+        "expected_annual_loss": float(np.sqrt(np.dot(squared, (values - mean) ** 2)) / total)
+    }
+
+    for metric, p in (("p50_median_impact", 0.50), ("p90_severe_impact", 0.90),
+                      ("p95_impact", 0.95), ("p99_worst_case", 0.99)):
+        exceeds = values > quantile(p)
+        probability_error = np.sqrt(np.dot(squared, (exceeds - (1 - p)) ** 2)) / total
+        lower, upper = quantile(np.array([p - probability_error, p + probability_error]))
+        standard_errors[metric] = float((upper - lower) / 2)
+
+    # Rockafellar-Uryasev form of CVaR and its influence function
+    alpha = 0.95
+    var_95 = percentiles[REPORTED_PERCENTILES.index(95)]
+    excess = np.maximum(values - var_95, 0) / (1 - alpha)
+    cvar_95 = var_95 + float(np.dot(weights, excess) / total)
+    standard_errors["conditional_var_95"] = float(
+        np.sqrt(np.dot(squared, (var_95 + excess - cvar_95) ** 2)) / total
+    )
+
+    statistics = _format_statistics(
+        percentiles=tuple(percentiles),
+        mean=mean,
+        std=np.sqrt(np.dot(weights, (values - mean) ** 2) / total),
+        cvar_95=cvar_95,
+        maximum=values[-1],
+        minimum=values[0],
+        count=len(values)
+    )
+    statistics["standard_errors"] = standard_errors
+    statistics["importance_sampling"] = {
+        # Plain Monte Carlo iterations the weighted sample is worth
+        "effective_sample_size": float(total * total / squared.sum()),
+        "tail_iterations": int(np.sum(values >= var_95)),
+        "weight_range": [float(weights.min()), float(weights.max())],
+    }
+    return statistics
+
+def _format_statistics(percentiles, mean, std, cvar_95, maximum, minimum, count) -> Dict[str, Any]:
+    p10, p25, p50, p75, p90, p95, p99 = percentiles
+    return {
+        "p50_median_impact": float(p50),
+        "p90_severe_impact": float(p90),
+        "p95_impact": float(p95),
+        "p99_worst_case": float(p99),
+        "expected_annual_loss": float(mean),
+        "value_at_risk_95": float(p95),
+        "conditional_var_95": float(cvar_95),
+        "standard_deviation": float(std),
+        "maximum_loss": float(maximum),
+        "minimum_loss": float(minimum),
+        "iterations": int(count),
+        "confidence_intervals": {
+            "p10": float(p10),
+            "p25": float(p25),
+            "p75": float(p75),
+            "p90": float(p90)
+        }
+    }
+
+class MomentAccumulator:
+    """Running count, mean and sum of squared deviations (Chan et al.)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        mean = float(np.mean(values))
+        self._combine(len(values), mean, float(np.sum((values - mean) ** 2)))
+
+    def merge(self, other: "MomentAccumulator"):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+
+    def _combine(self, count: int, mean: float, m2: float):
+        if self.count == 0:
+            self.count, self.mean, self.m2 = count, mean, m2
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def variance(self, ddof: int = 0) -> float:
+        if self.count - ddof <= 0:
+            return 0.0
+        return max(self.m2, 0.0) / (self.count - ddof)
+
+    def std(self, ddof: int = 0) -> float:
+        return math.sqrt(self.variance(ddof))
+
+class KLLSketch:
+    """
+    KLL quantile sketch. Level h holds items of weight 2**h; a full level is
+    sorted and every other item is promoted, so memory is about 3k values and
+    the rank error is O(1/k) of the stream length (about 1/k in practice,
+    merged or not).
+    """
+
+    def __init__(self, k: int = 4096, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        # Seeded coin flips keep the sketch reproducible for a given input order
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self.count += len(values)
+        self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate((self.levels[level], items))
+        self.count += other.count
+        self._compress()
+
+    def weighted_items(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All retained items, sorted, with their weights"""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    def percentile(self, q) -> np.ndarray:
+        """Approximate percentiles (0-100) by interpolating the weighted CDF"""
+        values, weights = self.weighted_items()
+        if len(values) == 0:
+            return np.zeros_like(np.asarray(q, dtype=float))
+        cumulative = np.cumsum(weights)
+        positions = (cumulative - weights / 2) / cumulative[-1]
+        return np.interp(np.asarray(q, dtype=float) / 100, positions, values)
+
+    def size(self) -> int:
+        return sum(len(items) for items in self.levels)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(8, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            items = np.sort(items)
+            # An odd item out stays behind at this level
+            even = len(items) - (len(items) % 2)
+            offset = int(self._rng.integers(2))
+            self.levels[level + 1] = np.concatenate((self.levels[level + 1], items[offset:even:2]))
+            self.levels[level] = items[even:]
+            # Adding a level shrinks the lower capacities, so start over
+            level = 0
+
+class TailTracker:
+    """Largest `capacity` values seen so far, kept exactly"""
+
+    def __init__(self, capacity: int = 65536):
+        self.capacity = capacity
+        self.values = np.empty(0)
+
+    def update(self, values: np.ndarray):
+        values = np.concatenate((self.values, np.asarray(values, dtype=float)))
+        if len(values) > self.capacity:
+            values = np.partition(values, len(values) - self.capacity)[-self.capacity:]
+        self.values = values
+
+    def merge(self, other: "TailTracker"):
+        self.update(other.values)
+
+    def smallest(self) -> float:
+        return float(np.min(self.values)) if len(self.values) else math.inf
+
+class BlockTree:
+    """
+    Per-block summaries combined along a fixed binary tree over the block
+    indices: block b is leaf (0, b) and node (h, i) covers blocks
+    [i * 2**h, (i + 1) * 2**h). Siblings are combined as soon as both are
+    present, so every node is built from the same blocks in the same order
+    whichever process simulated them and however partial trees are merged.
+    Contiguous blocks leave about two nodes per level.
+    """
+
+    def __init__(self, combine: Callable[[Any, Any], Any]):
+        # combine(left, right) folds right into left and returns it
+        self.combine = combine
+        self.nodes: Dict[Tuple[int, int], Any] = {}
+
+    def add(self, block: int, summary):
+        self._insert(0, block, summary)
+
+    def merge(self, other: "BlockTree"):
+        for (level, index), summary in other.nodes.items():
+            self._insert(level, index, copy.deepcopy(summary))
+
+    def fold(self, start):
+        """Fold every node, in block order, into start"""
+        for key in sorted(self.nodes, key=lambda node: node[1] << node[0]):
+            start = self.combine(start, self.nodes[key])
+        return start
+
+    def _insert(self, level: int, index: int, summary):
+        while (level, index ^ 1) in self.nodes:
+            sibling = self.nodes.pop((level, index ^ 1))
+            summary = self.combine(sibling, summary) if index & 1 else self.combine(summary, sibling)
+            level, index = level + 1, index >> 1
+        if (level, index) in self.nodes:
+            raise ValueError(f"Blocks {index << level}-{((index + 1) << level) - 1} were added twice")
+        self.nodes[(level, index)] = summary
+
+def _merged(left, right):
+    left.merge(right)
+    return left
+
+class StreamingStatistics:
+    """
+    Mergeable accumulator producing the same result dictionary as
+    MonteCarloSimulation._calculate_statistics. While the number of values is
+    at most exact_limit they are kept and the statistics are exact; beyond it
+    the values are folded into the sketch and only the tail stays exact.
+    Values arrive one random stream block at a time; moments and sketches
+    are combined along a BlockTree, so a run gives bit-identical statistics
+    however its blocks were split across processes.
+    """
+
+    def __init__(
+        self,
+        exact_limit: int = 1000000,
+        sketch_k: int = 4096,
+        tail_capacity: int = 65536,
+        compensated: bool = False
+    ):
+        self.exact_limit = exact_limit
+        self.sketch_k = sketch_k
+        self.compensated = compensated
+        self.tail = TailTracker(capacity=tail_capacity)
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self._moments = BlockTree(_merged)
+        # Sketches are only built once the values no longer fit exact_limit
+        self._sketches = BlockTree(_merged)
+        self._buffer: Optional[Dict[int, np.ndarray]] = {}
+        self._buffered = 0
+        self._count = 0
+        self._next_block = 0
+        # Folded views, rebuilt after the next update or merge
+        self._folded: Dict[str, Any] = {}
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def is_exact(self) -> bool:
+        return self._buffer is not None
+
+    @property
+    def moments(self) -> MomentAccumulator:
+        if "moments" not in self._folded:
+            self._folded["moments"] = self._moments.fold(MomentAccumulator())
+        return self._folded["moments"]
+
+    @property
+    def sketch(self) -> KLLSketch:
+        if "sketch" not in self._folded:
+            self._folded["sketch"] = self._sketches.fold(KLLSketch(k=self.sketch_k))
+        return self._folded["sketch"]
+
+    def update(self, values: np.ndarray, block: Optional[int] = None):
+        """Add the losses of one block; without an index, the block after the last one seen"""
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        if block is None:
+            block = self._next_block
+        self._next_block = max(self._next_block, block + 1)
+        self._folded = {}
+
+        moments = MomentAccumulator()
+        moments.update(values)
+        self._moments.add(block, moments)
+        self._count += len(values)
+        self.tail.update(values)
+        self.minimum = min(self.minimum, float(np.min(values)))
+        self.maximum = max(self.maximum, float(np.max(values)))
+
+        if self._buffer is not None and self._buffered + len(values) <= self.exact_limit:
+            self._buffer[block] = values.copy()
+            self._buffered += len(values)
+            return
+
+        self._flush_buffer()
+        self._sketches.add(block, self._block_sketch(block, values))
+
+    def merge(self, other: "StreamingStatistics"):
+        """Fold in an accumulator of other blocks; exact while both sides are still exact"""
+        self._moments.merge(other._moments)
+        self._count += other._count
+        self._next_block = max(self._next_block, other._next_block)
+        self._folded = {}
+        self.tail.merge(other.tail)
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+        if other._buffer is not None and self._buffer is not None \
+                and self._buffered + other._buffered <= self.exact_limit:
+            self._buffer.update(other._buffer)
+            self._buffered += other._buffered
+            return
+
+        self._flush_buffer()
+        if other._buffer is not None:
+            for block in sorted(other._buffer):
+                self._sketches.add(block, self._block_sketch(block, other._buffer[block]))
+        else:
+            self._sketches.merge(other._sketches)
+
+    def values(self) -> Optional[np.ndarray]:
+        """Every value seen, in block order, or None once the accumulator is sketch-only"""
+        if self._buffer is None:
+            return None
+        if "values" not in self._folded:
+            self._folded["values"] = np.concatenate(
+                [self._buffer[block] for block in sorted(self._buffer)]
+            ) if self._buffer else np.empty(0)
+        return self._folded["values"]
+
+    def percentile(self, q) -> np.ndarray:
+        """Percentiles with np.percentile's linear interpolation"""
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        values = self.values()
+        if values is not None:
+            return np.percentile(values, q)
+
+        estimates = self.sketch.percentile(q)
+        for index, value in enumerate(q):
+            exact = self._tail_percentile(value)
+            if exact is not None:
+                estimates[index] = exact
+        return np.clip(estimates, self.minimum, self.maximum)
+
+    def tail_moments(self, threshold: float) -> Tuple[int, float, float]:
+        """Count, mean and variance of the values at or above threshold"""
+        values = self.values()
+        if values is None and (self.tail.smallest() < threshold or len(self.tail.values) == self.count):
+            # The tail's order depends on how it was merged; sorted, its sums do not
+            values = np.sort(self.tail.values)
+
+        if values is not None:
+            tail = values[values >= threshold]
+            if len(tail) == 0:
+                return 0, threshold, 0.0
+            return len(tail), float(np.mean(tail)), float(np.var(tail))
+
+        items, weights = self.sketch.weighted_items()
+        selected = items >= threshold
+        if not selected.any():
+            return 0, threshold, 0.0
+        items, weights = items[selected], weights[selected]
+        mean = float(np.average(items, weights=weights))
+        variance = float(np.average((items - mean) ** 2, weights=weights))
+        return int(weights.sum()), mean, variance
+
+    def to_result(self) -> Dict[str, Any]:
+        values = self.values()
+        if values is not None:
+            return loss_statistics(values, self.compensated)
+
+        percentiles = self.percentile(REPORTED_PERCENTILES)
+        p95 = percentiles[REPORTED_PERCENTILES.index(95)]
+        _, cvar_95, _ = self.tail_moments(p95)
+        return _format_statistics(
+            percentiles=tuple(percentiles),
+            mean=self.moments.mean,
+            std=self.moments.std(),
+            cvar_95=cvar_95,
+            maximum=self.maximum,
+            minimum=self.minimum,
+            count=self.count
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the retained values, sketches and tail"""
+        buffered = sum(values.nbytes for values in self._buffer.values()) if self._buffer is not None else 0
+        sketched = sum(items.nbytes for sketch in self._sketches.nodes.values() for items in sketch.levels)
+        return buffered + sketched + self.tail.values.nbytes
+
+    def describe(self) -> Dict[str, Any]:
+        """How the statistics were computed"""
+        return {
+            "method": "exact" if self.is_exact else "streaming",
+            "compensated": self.compensated,
+            "exact_limit": self.exact_limit,
+            "sketch_k": self.sketch_k,
+            "sketch_items": self.sketch.size(),
+            "tail_capacity": self.tail.capacity,
+        }
+
+    def _block_sketch(self, block: int, values: np.ndarray) -> KLLSketch:
+        """A block's own sketch; its coin flips are seeded by the block index"""
+        sketch = KLLSketch(k=self.sketch_k, seed=block)
+        sketch.update(values)
+        return sketch
+
+    def _flush_buffer(self):
+        if self._buffer is None:
+            return
+        for block in sorted(self._buffer):
+            self._sketches.add(block, self._block_sketch(block, self._buffer[block]))
+        self._buffer = None
+        self._buffered = 0
+        self._folded = {}
+
+    def _tail_percentile(self, q: float) -> Optional[float]:
+        """Exact percentile when both interpolation neighbours are in the tail"""
+        n = self.count
+        position = (n - 1) * q / 100
+        lower = int(math.floor(position))
+        upper = min(lower + 1, n - 1)
+        # Rank counted from the top of the distribution
+        if n - 1 - lower >= len(self.tail.values):
+            return None
+
+        tail = np.sort(self.tail.values)
+        lower_value = tail[len(tail) - (n - lower)]
+        upper_value = tail[len(tail) - (n - upper)]
+        return float(lower_value + (position - lower) * (upper_value - lower_value))
+
+class WeightedSample:
+    """Mergeable (loss, likelihood ratio) rows of an importance-sampled run, kept per block"""
+
+    def __init__(self, compensated: bool = False):
+        self.compensated = compensated
+        self._rows: Dict[int, np.ndarray] = {}
+        self._next_block = 0
+
+    @property
+    def count(self) -> int:
+        return sum(len(rows) for rows in self._rows.values())
+
+    def update(self, rows: np.ndarray, block: Optional[int] = None):
+        rows = np.asarray(rows, dtype=float)
+        if block is None:
+            block = self._next_block
+        self._next_block = max(self._next_block, block + 1)
+        if len(rows):
+            self._rows[block] = rows.copy()
+
+    def merge(self, other: "WeightedSample"):
+        self._rows.update(other._rows)
+        self._next_block = max(self._next_block, other._next_block)
+
+    def to_result(self) -> Dict[str, Any]:
+        rows = np.concatenate([self._rows[block] for block in sorted(self._rows)]) if self._rows else np.empty((0, 2))
+        return weighted_loss_statistics(rows[:, 0], rows[:, 1], self.compensated)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(rows.nbytes for rows in self._rows.values())
+
+    def describe(self) -> Dict[str, Any]:
+        return {"method": "weighted_exact", "compensated": self.compensated, "rows": self.count}
@@ -0,0 +1,173 @@
+# backend/app/services/what_if.py
+# What-if analysis on common random numbers. A change to defense systems is
+# evaluated on the baseline run's recorded sample matrix: the same
+# occurrences and impacts, only the mitigation factors (and the cascade,
+# which depends on the defended assets) are recomputed. Baseline and
+# modified losses are therefore paired iteration by iteration, and the
+# confidence interval of a delta reflects the change itself rather than the
+# noise of two independent runs.
+#   - expected annual loss: the paired per-iteration differences are
+#     averaged, so the interval is the usual normal one on their mean
+#   - percentiles and CVaR: batch means, the delta is recomputed on
+#     WHAT_IF_BATCHES contiguous batches of iterations and a t interval is
+#     put around it from their spread
+import copy
+import numpy as np
+from scipy import stats
+from typing import List, Dict, Any, Optional, Tuple
+from app.services.streaming_stats import loss_statistics, weighted_loss_statistics
+from app.services.mitigation import MitigationModel
+from app.services.cascade import DEFAULT_CASCADE_FACTOR, build_cascade
+from app.services.sample_matrix import SampleMatrix
+
+# Defense fields a what-if may change, with their valid range
+WHAT_IF_FIELDS = {"effectiveness": (0, 100), "coverage_percentage": (0, 100)}
+CONFIDENCE_LEVEL = 0.95
+WHAT_IF_BATCHES = 20
+# Fewer iterations per batch make batch percentiles too coarse to compare
+MIN_BATCH_ITERATIONS = 250
+
+COMPARED_METRICS = (
+    "expected_annual_loss",
+    "p50_median_impact",
+    "p90_severe_impact",
+    "p95_impact",
+    "p99_worst_case",
+    "value_at_risk_95",
+    "conditional_var_95",
+)
+
+def defense_reference(defense: Dict) -> str:
+    return str(defense.get('_id', defense.get('id', '')))
+
+def apply_defense_changes(defense_systems: List[Dict], changes: List[Dict[str, Any]]) -> List[Dict]:
+    """Copies of the defense systems with the changed fields set; the originals are untouched"""
+    modified = [copy.copy(defense) for defense in defense_systems]
+    index = {defense_reference(defense): defense for defense in modified}
+    for change in changes:
+        defense = index.get(str(change.get('defense_id')))
+        if defense is None:
+            raise ValueError(f"Defense system {change.get('defense_id')} is not part of this scenario")
+        for field, (low, high) in WHAT_IF_FIELDS.items():
+            value = change.get(field)
+            if value is None:
+                continue
+            if not low <= value <= high:
+                raise ValueError(f"{field} must be between {low} and {high}")
+            defense[field] = value
+    return modified
+
+def defense_losses(
+    samples: SampleMatrix,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    cascade_factor: float = DEFAULT_CASCADE_FACTOR
+) -> np.ndarray:
+    """Per-iteration losses of the recorded draws with the given defense systems in place"""
+    model = MitigationModel(risk_events, business_assets, defense_systems)
+    return samples.losses(model.factors(), build_cascade(business_assets, model, cascade_factor))
+
+def loss_summary(losses: np.ndarray, weights: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    if weights is None:
+        return loss_statistics(losses)
+    return weighted_loss_statistics(losses, weights)
+
+def _metrics(losses: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    summary = loss_summary(losses, weights)
+    return np.array([summary[metric] for metric in COMPARED_METRICS])
+
+def _mean_difference(
+    baseline: np.ndarray,
+    modified: np.ndarray,
+    weights: Optional[np.ndarray] = None
+) -> Tuple[float, float, float]:
+    """
+    Mean paired difference, its standard error, and the standard error two
+    independent runs of the same size would have had
+    """
+    n = len(baseline)
+    if weights is None:
+        weights = np.ones(n)
+    total = weights.sum()
+    difference = modified - baseline
+    delta = float(np.dot(weights, difference) / total)
+    squared = weights * weights
+    paired_error = float(np.sqrt(np.dot(squared, (difference - delta) ** 2)) / total)
+    independent_error = float(np.sqrt(sum(
+        np.dot(squared, (losses - np.dot(weights, losses) / total) ** 2) for losses in (baseline, modified)
+    )) / total)
+    return delta, paired_error, independent_error
+
+def compare_losses(
+    baseline: np.ndarray,
+    modified: np.ndarray,
+    weights: Optional[np.ndarray] = None,
+    batches: int = WHAT_IF_BATCHES
+) -> Dict[str, Any]:
+    """Baseline and modified metrics and each delta with its confidence interval"""
+    baseline_summary = loss_summary(baseline, weights)
+    modified_summary = loss_summary(modified, weights)
+    baseline_metrics = np.array([baseline_summary[metric] for metric in COMPARED_METRICS])
+    deltas = np.array([modified_summary[metric] for metric in COMPARED_METRICS]) - baseline_metrics
+
+    batches = min(batches, len(baseline) // MIN_BATCH_ITERATIONS)
+    batch_errors, t_quantile = None, None
+    if batches >= 2:
+        batch_deltas = np.array([
+            _metrics(modified[rows], None if weights is None else weights[rows])
+            - _metrics(baseline[rows], None if weights is None else weights[rows])
+            for rows in np.array_split(np.arange(len(baseline)), batches)
+        ])
+        batch_errors = batch_deltas.std(axis=0, ddof=1) / np.sqrt(batches)
+        t_quantile = float(stats.t.ppf(0.5 + CONFIDENCE_LEVEL / 2, batches - 1))
+
+    mean_delta, paired_error, independent_error = _mean_difference(baseline, modified, weights)
+    z_quantile = float(stats.norm.ppf(0.5 + CONFIDENCE_LEVEL / 2))
+
+    delta = {}
+    for index, metric in enumerate(COMPARED_METRICS):
+        if metric == "expected_annual_loss":
+            value, error, margin, method = mean_delta, paired_error, z_quantile * paired_error, "paired"
+        elif batch_errors is not None:
+            value, error = float(deltas[index]), float(batch_errors[index])
+            margin, method = t_quantile * error, "batch_means"
+        else:
+            value, error, margin, method = float(deltas[index]), None, None, None
+        base = baseline_metrics[index]
+        delta[metric] = {
+            "value": value,
+            "relative": float(value / base) if base else None,
+            "standard_error": error,
+            "confidence_interval": [value - margin, value + margin] if margin is not None else None,
+            "method": method,
+        }
+
+    paired = np.std(baseline) > 0 and np.std(modified) > 0
+    return {
+        "baseline": baseline_summary,
+        "modified": modified_summary,
+        "delta": delta,
+        "confidence_level": CONFIDENCE_LEVEL,
+        "common_random_numbers": {
+            "iterations": len(baseline),
+            "batches": batches if batches >= 2 else None,
+            "correlation": float(np.corrcoef(baseline, modified)[0, 1]) if paired else None,
+            # Variance of the expected loss delta relative to two independent runs
+            "variance_ratio": (paired_error / independent_error) ** 2 if independent_error > 0 else None,
+        },
+    }
+
+def run_what_if(
+    samples: SampleMatrix,
+    risk_events: List[Dict],
+    business_assets: List[Dict],
+    defense_systems: List[Dict],
+    changes: List[Dict[str, Any]],
+    cascade_factor: float = DEFAULT_CASCADE_FACTOR
+) -> Dict[str, Any]:
+    """Evaluate defense changes against the baseline on the recorded draws"""
+    modified_defenses = apply_defense_changes(defense_systems, changes)
+    baseline = defense_losses(samples, risk_events, business_assets, defense_systems, cascade_factor)
+    modified = defense_losses(samples, risk_events, business_assets, modified_defenses, cascade_factor)
+    return compare_losses(baseline, modified, samples.weights)
@@ -0,0 +1,72 @@
+# benchmarks/distributed_sharding.py - Distributed runs on local worker nodes, with and without worker loss
+# Run from the backend directory:  python -m benchmarks.distributed_sharding [iterations] [workers] [memory_budget_mb]
+# The defaults keep fewer losses exactly than the run has, so the sketch path is compared too.
+import sys
+import time
+import asyncio
+import secrets
+
+from app.services.distributed import SimulationCoordinator, start_local_workers
+from app.services.monte_carlo import MonteCarloSimulation
+from benchmarks.sampling_variance import RISK_EVENTS, DEFENSE_SYSTEMS
+
+METRICS = (
+    "expected_annual_loss", "p50_median_impact", "p90_severe_impact", "p99_worst_case",
+    "conditional_var_95", "standard_deviation", "confidence_intervals", "statistics_method",
+)
+SEED = 2024
+
+def report(label: str, seconds: float, results, reference) -> bool:
+    identical = all(results[metric] == reference[metric] for metric in METRICS)
+    print(f"{label:28} {seconds:8.2f}s  identical={identical}")
+    if "distributed" in results:
+        distributed = results["distributed"]
+        print(f"{'':28} shards={distributed['shards']} reassigned={distributed['reassigned_shards']} "
+              f"lost={list(distributed['lost_workers'])}")
+    return identical
+
+async def run(iterations: int, worker_count: int, memory_budget_mb: float):
+    token = secrets.token_hex(16)
+    workers = start_local_workers(worker_count, token)
+    options = {"seed": SEED, "memory_budget_mb": memory_budget_mb}
+    identical = []
+    try:
+        started = time.perf_counter()
+        reference = MonteCarloSimulation(iterations=iterations, **options).run_simulation(RISK_EVENTS, [], DEFENSE_SYSTEMS)
+        report("single process", time.perf_counter() - started, reference, reference)
+        print(f"{'':28} statistics={reference['statistics_method']['method']} "
+              f"exact_limit={reference['statistics_method']['exact_limit']}")
+
+        # Every node count splits the blocks differently
+        for nodes in range(1, worker_count + 1):
+            coordinator = SimulationCoordinator([address for address, _ in workers[:nodes]], token=token)
+            for attempt in ("cold", "warm"):
+                started = time.perf_counter()
+                results = await coordinator.run_simulation(iterations, RISK_EVENTS, [], DEFENSE_SYSTEMS, **options)
+                identical.append(report(f"{nodes} workers ({attempt})", time.perf_counter() - started, results, reference))
+
+        # Kill a worker while its shards are in flight; they are reassigned
+        coordinator = SimulationCoordinator([address for address, _ in workers], token=token)
+        started = time.perf_counter()
+        run = asyncio.create_task(coordinator.run_simulation(iterations, RISK_EVENTS, [], DEFENSE_SYSTEMS, **options))
+        await asyncio.sleep(0.2)
+        workers[0][1].kill()
+        results = await run
+        identical.append(report(f"{worker_count} workers, one killed", time.perf_counter() - started, results, reference))
+    finally:
+        for _, process in workers:
+            process.kill()
+
+    assert all(identical), "distributed results differ from the single-process run"
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1200000
+    worker_count = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    memory_budget_mb = float(sys.argv[3]) if len(sys.argv) > 3 else 8
+    print(f"Distributed sharding: {iterations} iterations, {worker_count} local workers, "
+          f"{memory_budget_mb:g} MB budget, seed {SEED}")
+    print("=" * 78)
+    asyncio.run(run(iterations, worker_count, memory_budget_mb))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/float32_precision.py - Throughput, memory and accuracy of float32 vs float64 compute
+# Run from the backend directory:  python -m benchmarks.float32_precision [iterations] [events] [replicates]
+import sys
+import time
+import numpy as np
+
+from app.services.monte_carlo import MonteCarloSimulation, PRECISIONS
+
+SEVERITIES = ("uniform", "lognormal", "pert", "triangular")
+METRICS = ("p50_median_impact", "p90_severe_impact", "p99_worst_case", "expected_annual_loss")
+
+def scenario(event_count: int):
+    """Synthetic scenario with mixed severities and frequencies"""
+    return [
+        {
+            "name": f"Event {index}",
+            "probability": 5 + index % 30,
+            "frequency": 1 + index % 4,
+            "frequency_distribution": "poisson",
+            "impact_min": 1000 * (1 + index % 5),
+            "impact_max": 50000 * (1 + index % 7),
+            "severity_distribution": SEVERITIES[index % len(SEVERITIES)],
+        }
+        for index in range(event_count)
+    ]
+
+def measure(precision: str, risk_events, iterations: int, replicates: int):
+    seconds, results = [], None
+    for replicate in range(replicates):
+        simulation = MonteCarloSimulation(iterations=iterations, seed=replicate, precision=precision)
+        started = time.perf_counter()
+        results = simulation.run_simulation(risk_events, [], [])
+        seconds.append(time.perf_counter() - started)
+    return float(np.median(seconds)), results
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    event_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    replicates = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    risk_events = scenario(event_count)
+
+    print(f"Precision benchmark: {iterations} iterations x {event_count} events, median of {replicates} runs")
+    print("=" * 78)
+    print(f"{'precision':10} {'seconds':>9} {'iter/s':>12} {'peak MB':>9} {'chunk':>7}   check")
+
+    measured = {}
+    for precision in PRECISIONS:
+        seconds, results = measure(precision, risk_events, iterations, replicates)
+        measured[precision] = (seconds, results)
+        memory, check = results["memory"], results["precision"]["check"]
+        verdict = "-" if check is None else \
+            f"max rel. error {check['max_relative_error']:.2e} (tolerance {check['tolerance']:.0e})"
+        print(f"{precision:10} {seconds:9.3f} {iterations / seconds:12,.0f} "
+              f"{memory['peak_tracked_bytes'] / 2 ** 20:9.1f} {memory['chunk_iterations']:7}   {verdict}")
+
+    (seconds_64, results_64), (seconds_32, results_32) = measured["float64"], measured["float32"]
+    print("-" * 78)
+    speed_up = seconds_64 / seconds_32
+    print(f"Speed-up: {speed_up:.2f}x   Tracked memory: "
+          f"{results_32['memory']['peak_tracked_bytes'] / results_64['memory']['peak_tracked_bytes']:.0%} of float64")
+    # The check simulates up to 2048 iterations twice, the compensated sums
+    # add a little per iteration: short runs may not earn that back
+    if speed_up < 1:
+        print("float32 is not worth using here: it only saves memory at this size")
+    # Different precisions draw different random streams, so these differences
+    # are Monte Carlo noise; the same-draw rounding error is the check above
+    print("Relative difference of the estimates (independent streams):")
+    for metric in METRICS:
+        difference = abs(results_32[metric] - results_64[metric]) / max(abs(results_64[metric]), 1e-12)
+        print(f"  {metric:24} {difference:.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# backend/tests/test_adaptive_simulation.py - The adaptive stopping rule stays finite and respects its settings
+import json
+import pytest
+
+from app.models.analysis import AnalysisOptions
+from app.services.monte_carlo import MonteCarloSimulation, CONVERGENCE_METRICS
+
+def single_event(probability: float):
+    return [{"name": "Outage", "probability": probability, "impact_min": 10000, "impact_max": 50000}]
+
+def run_adaptive(probability: float, **settings):
+    simulation = MonteCarloSimulation(iterations=200000, seed=11)
+    return simulation.run_adaptive_simulation(single_event(probability), [], [], time_budget=None, **settings)
+
+@pytest.mark.parametrize("probability, boundary", [
+    # Half the years are loss-free: P50 sits at the zero/non-zero boundary
+    (49.5, "p50_median_impact"), (49.8, "p50_median_impact"),
+    # Likewise P90 when about one year in ten has a loss
+    (9.9, "p90_severe_impact"), (10, "p90_severe_impact"),
+])
+def test_boundary_quantiles_keep_errors_finite(probability, boundary):
+    results = run_adaptive(probability, target_precision=0.02, batch_size=20000, min_iterations=20000)
+    convergence = results["convergence"]
+    # Serializable as strict JSON, as the API returns it
+    json.dumps(convergence, allow_nan=False)
+    assert set(convergence["relative_errors"]) | set(convergence["excluded_metrics"]) == set(CONVERGENCE_METRICS)
+    if boundary in convergence["excluded_metrics"]:
+        assert results[boundary] == 0.0
+        assert convergence["standard_errors"][boundary] > 0
+
+def test_min_iterations_delays_the_first_check():
+    # A certain, fixed loss converges at the first check
+    results = run_adaptive(100, target_precision=0.5, batch_size=1000, min_iterations=40000)
+    assert results["convergence"]["stop_reason"] == "precision_reached"
+    assert results["convergence"]["iterations_used"] >= 40000
+
+def test_min_iterations_is_an_analysis_option():
+    assert AnalysisOptions().min_iterations == 10000
+    assert AnalysisOptions(min_iterations=2000).simulation_settings()["min_iterations"] == 2000
@@ -0,0 +1,155 @@
+# backend/tests/test_analysis_jobs.py - Analysis job queue lifecycle, back-pressure and retention
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.routes import analysis as analysis_routes
+from app.services.analysis_jobs import AnalysisJobManager, QueueFullError, serialize_job
+
+class FakeSimulator:
+    """Handlers that finish, or fail, only when the test releases them"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.calls = 0
+
+    def handler(self, result=None, error=None):
+        async def run():
+            self.calls += 1
+            self.started.set()
+            await self.release.wait()
+            if error is not None:
+                raise error
+            return result
+        return run
+
+async def settle():
+    """Let the worker tasks pick up and finish whatever they can"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_jobs_go_from_queued_to_running_to_done():
+    async def scenario():
+        manager = AnalysisJobManager(concurrency=1, max_queue_size=5)
+        await manager.start()
+        simulator = FakeSimulator()
+        try:
+            job = manager.submit("scenario-1", simulator.handler({"expected_annual_loss": 1.0}))
+            assert job["status"] == "queued"
+            assert not serialize_job(job)["has_result"]
+
+            await simulator.started.wait()
+            assert job["status"] == "running"
+            assert job["started_at"] is not None
+            assert manager.get_stats()["running"] == 1
+
+            simulator.release.set()
+            await settle()
+            assert job["status"] == "done"
+            assert job["result"] == {"expected_annual_loss": 1.0}
+            assert job["finished_at"] >= job["started_at"]
+            assert manager.get_stats()["jobs"]["done"] == 1
+            assert manager.get_job(job["job_id"]) is job
+        finally:
+            await manager.stop()
+    asyncio.run(scenario())
+
+def test_failed_handler_marks_the_job_failed():
+    async def scenario():
+        manager = AnalysisJobManager(concurrency=1, max_queue_size=5)
+        await manager.start()
+        simulator = FakeSimulator()
+        try:
+            failing = manager.submit("scenario-1", simulator.handler(error=HTTPException(404, "Scenario not found")))
+            crashing = manager.submit("scenario-2", simulator.handler(error=RuntimeError("boom")))
+            simulator.release.set()
+            await settle()
+            assert (failing["status"], failing["error"]) == ("failed", "Scenario not found")
+            assert (crashing["status"], crashing["error"]) == ("failed", "boom")
+            # A failure does not take the worker down
+            assert manager.get_stats()["running"] == 0
+            assert manager.get_stats()["jobs"]["failed"] == 2
+        finally:
+            await manager.stop()
+    asyncio.run(scenario())
+
+def test_full_queue_raises():
+    async def scenario():
+        manager = AnalysisJobManager(concurrency=1, max_queue_size=2)
+        await manager.start()
+        simulator = FakeSimulator()
+        try:
+            manager.submit("scenario-1", simulator.handler())
+            await simulator.started.wait()
+            # One running, two waiting: the queue has no room left
+            waiting = [manager.submit("scenario-1", simulator.handler()) for _ in range(2)]
+            with pytest.raises(QueueFullError):
+                manager.submit("scenario-1", simulator.handler())
+            assert manager.get_stats()["queue_depth"] == 2
+            assert len(manager.jobs) == 3
+
+            simulator.release.set()
+            await settle()
+            assert [job["status"] for job in waiting] == ["done", "done"]
+            manager.submit("scenario-1", simulator.handler())
+        finally:
+            await manager.stop()
+    asyncio.run(scenario())
+
+def test_submit_requires_a_started_queue():
+    with pytest.raises(RuntimeError):
+        AnalysisJobManager().submit("scenario-1", FakeSimulator().handler())
+
+def test_finished_jobs_are_pruned_after_the_retention():
+    async def scenario():
+        manager = AnalysisJobManager(concurrency=1, max_queue_size=5, retention_seconds=60)
+        await manager.start()
+        simulator = FakeSimulator()
+        simulator.release.set()
+        try:
+            old, recent = (manager.submit("scenario-1", simulator.handler()) for _ in range(2))
+            await settle()
+            old["finished_at"] = datetime.utcnow() - timedelta(seconds=61)
+            recent["finished_at"] = datetime.utcnow() - timedelta(seconds=59)
+
+            simulator.release.clear()
+            running = manager.submit("scenario-1", simulator.handler())
+            assert manager.get_job(old["job_id"]) is None
+            assert manager.get_job(recent["job_id"]) is recent
+            # Unfinished jobs are never pruned
+            manager.submit("scenario-1", simulator.handler())
+            assert manager.get_job(running["job_id"]) is running
+        finally:
+            await manager.stop()
+    asyncio.run(scenario())
+
+class FakeScenarios:
+    async def find_one(self, query):
+        return {"_id": query["_id"], "name": "Scenario"}
+
+class FakeDatabase:
+    scenarios = FakeScenarios()
+
+def test_route_answers_429_when_the_queue_is_full(monkeypatch):
+    async def scenario():
+        manager = AnalysisJobManager(concurrency=1, max_queue_size=1)
+        monkeypatch.setattr(analysis_routes, "job_manager", manager)
+        await manager.start()
+        simulator = FakeSimulator()
+        try:
+            scenario_id = str(ObjectId())
+            manager.submit(scenario_id, simulator.handler())
+            await simulator.started.wait()
+            accepted = await analysis_routes.submit_analysis_job(scenario_id, None, FakeDatabase())
+            assert accepted["status"] == "queued"
+
+            with pytest.raises(HTTPException) as error:
+                await analysis_routes.submit_analysis_job(scenario_id, None, FakeDatabase())
+            assert error.value.status_code == 429
+            assert error.value.headers["Retry-After"] == "10"
+        finally:
+            await manager.stop()
+    asyncio.run(scenario())
@@ -0,0 +1,110 @@
+# backend/tests/test_attribution.py - Euler contributions add up and do not depend on sharding
+import numpy as np
+import pytest
+
+from app.services.attribution import LossAttribution, tail_capacity
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.simulation_executor import split_blocks, _simulate_blocks, merge_shards
+
+RISK_EVENTS = [
+    {"name": "Breach", "probability": 5, "impact_min": 1000000, "impact_max": 20000000},
+    {"name": "Phishing", "probability": 60, "frequency": 3, "frequency_distribution": "poisson",
+     "impact_min": 1000, "impact_max": 50000},
+    {"name": "Outage", "probability": 30, "impact_min": 10000, "impact_max": 200000},
+]
+DEFENSE_SYSTEMS = [{"name": "EDR", "effectiveness": 50, "coverage_percentage": 80}]
+ITERATIONS = 40000
+
+def contributions(attribution, key):
+    return sum(event[key] for event in attribution)
+
+@pytest.mark.parametrize("importance_sampling, tolerance", [(False, 1e-9), (True, 1e-3)])
+def test_contributions_add_up_to_the_portfolio_measures(importance_sampling, tolerance):
+    results = MonteCarloSimulation(
+        iterations=ITERATIONS, seed=11, block_size=4096, importance_sampling=importance_sampling
+    ).run_simulation(RISK_EVENTS, [], DEFENSE_SYSTEMS)
+    attribution = results["event_attribution"]
+    assert results["memory"]["attribution"]["tail_complete"]
+
+    assert contributions(attribution, "mean_loss") == pytest.approx(results["expected_annual_loss"], rel=1e-9)
+    assert contributions(attribution, "var_95_contribution") == pytest.approx(results["value_at_risk_95"], rel=1e-9)
+    # The weighted CVaR counts the quantile's own iteration fractionally, the contributions do not
+    assert contributions(attribution, "cvar_95_contribution") == pytest.approx(
+        results["conditional_var_95"], rel=tolerance
+    )
+    assert contributions(attribution, "cvar_95_share") == pytest.approx(1.0)
+
+RARE_EVENTS = [
+    {"name": "Breach", "probability": 3, "impact_min": 1000, "impact_max": 2000},
+    {"name": "Outage", "probability": 1, "impact_min": 100, "impact_max": 200},
+]
+
+@pytest.mark.parametrize("importance_sampling", [False, True])
+def test_contributions_add_up_when_var_ties_at_zero(importance_sampling):
+    # Fewer than 5% of the years have a loss, so VaR95 falls on the tied zeros
+    results = MonteCarloSimulation(
+        iterations=20000, seed=1, importance_sampling=importance_sampling
+    ).run_simulation(RARE_EVENTS, [], [])
+    assert results["value_at_risk_95"] == 0
+    assert results["conditional_var_95"] > 0
+    attribution = results["event_attribution"]
+    assert contributions(attribution, "cvar_95_contribution") == pytest.approx(
+        results["conditional_var_95"], rel=1e-9
+    )
+    # The zero years add nothing, so the shares are those of the loss years
+    breach, outage = (event["cvar_95_contribution"] for event in attribution)
+    assert breach > 10 * outage
+
+@pytest.mark.parametrize("importance_sampling", [False, True])
+def test_shard_merge_matches_a_single_process(importance_sampling):
+    options = {"seed": 11, "block_size": 4096, "importance_sampling": importance_sampling}
+    single = MonteCarloSimulation(iterations=ITERATIONS, **options).run_simulation(RISK_EVENTS, [], DEFENSE_SYSTEMS)
+    for shards in (2, 3, 10):
+        monte_carlo, engine_options, blocks = split_blocks(ITERATIONS, RISK_EVENTS, shards, **options)
+        merged = merge_shards(monte_carlo, [
+            _simulate_blocks(ITERATIONS, engine_options, RISK_EVENTS, [], DEFENSE_SYSTEMS, shard) for shard in blocks
+        ])
+        assert merged["event_attribution"] == single["event_attribution"], shards
+
+def synthetic_blocks(rng, blocks=8, rows=500):
+    """(losses, event losses, occurred) per block of three independent events"""
+    result = []
+    for _ in range(blocks):
+        occurred = rng.random((rows, 3)) < [0.05, 0.6, 0.3]
+        event_losses = occurred * rng.lognormal([12, 8, 10], 1.0, (rows, 3))
+        result.append((event_losses.sum(axis=1), event_losses, occurred.astype(float)))
+    return result
+
+def test_merge_grouping_does_not_change_the_result():
+    blocks = synthetic_blocks(np.random.default_rng(4))
+    losses = np.concatenate([block[0] for block in blocks])
+    capacity = tail_capacity(len(losses))
+    var_95 = float(np.percentile(losses, 95))
+
+    single = LossAttribution(RISK_EVENTS, capacity)
+    for block in blocks:
+        single.update(*block)
+    for split in ([4], [1, 5], [2, 3, 7]):
+        shards = [LossAttribution(RISK_EVENTS, capacity) for _ in range(len(split) + 1)]
+        for index, block in enumerate(blocks):
+            shards[int(np.searchsorted(split, index, side="right"))].update(*block)
+        for shard in shards[1:]:
+            shards[0].merge(shard)
+        assert shards[0].to_result(var_95) == single.to_result(var_95), split
+
+def test_truncated_tail_is_rescaled_to_the_run_measures():
+    blocks = synthetic_blocks(np.random.default_rng(5))
+    losses = np.sort(np.concatenate([block[0] for block in blocks]))
+    var_95 = float(np.percentile(losses, 95))
+    cvar_95 = float(losses[losses >= var_95].mean())
+
+    # Room for a fifth of the tail only
+    attribution = LossAttribution(RISK_EVENTS, len(losses) // 100)
+    for block in blocks:
+        attribution.update(*block)
+    result = attribution.to_result(var_95, cvar_95)
+    assert not attribution.tail_complete
+    assert contributions(result, "var_95_contribution") == pytest.approx(var_95)
+    assert contributions(result, "cvar_95_contribution") == pytest.approx(cvar_95)
+    # The worst rows kept are the worst iterations of the run
+    np.testing.assert_array_equal(np.sort(attribution.tail_losses), losses[-len(losses) // 100:])
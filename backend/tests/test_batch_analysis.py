@@ -0,0 +1,150 @@
+# backend/tests/test_batch_analysis.py - Batch analysis reads, streams and writes against a mocked database
+import asyncio
+import json
+import pytest
+from bson import ObjectId
+
+from app.models.analysis import AnalysisOptions, BatchAnalysisRequest
+from app.routes import analysis as analysis_routes
+from app.services import simulation_executor
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.simulation_cache import SimulationCache
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        async def iterate():
+            for document in self.documents:
+                yield document
+        return iterate()
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+class FakeCollection:
+    """Records every query and write; find() understands equality and $in"""
+
+    def __init__(self, documents=()):
+        self.documents = list(documents)
+        self.queries = []
+        self.bulk_writes = []
+
+    def find(self, query=None):
+        query = query or {}
+        self.queries.append(query)
+
+        def matches(document):
+            for field, condition in query.items():
+                if isinstance(condition, dict) and "$in" in condition:
+                    if document.get(field) not in condition["$in"]:
+                        return False
+                elif document.get(field) != condition:
+                    return False
+            return True
+        return FakeCursor([document for document in self.documents if matches(document)])
+
+    async def find_one(self, query):
+        return next(iter(self.find(query).documents), None)
+
+    async def bulk_write(self, operations, ordered=True):
+        self.bulk_writes.append(operations)
+
+class FakeDatabase:
+    def __init__(self, **collections):
+        self.collections = {name: FakeCollection(documents) for name, documents in collections.items()}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        return self[name]
+
+def event(scenario_id, name, **fields):
+    return {"_id": ObjectId(), "scenario_id": scenario_id, "name": name, "probability": 30,
+            "impact_min": 10000, "impact_max": 200000, **fields}
+
+@pytest.fixture
+def database():
+    scenario_ids = [ObjectId() for _ in range(5)]
+    healthy, broken, empty = scenario_ids[:3], scenario_ids[3], scenario_ids[4]
+    risk_events = [event(scenario_id, f"Outage {index}") for index, scenario_id in enumerate(healthy)]
+    risk_events += [event(healthy[0], "Phishing", probability=60), event(broken, "Broken")]
+    return FakeDatabase(
+        scenarios=[{"_id": scenario_id, "name": f"Scenario {index}"} for index, scenario_id in enumerate(scenario_ids)],
+        risk_events=risk_events,
+        business_assets=[{"_id": ObjectId(), "scenario_id": healthy[1], "name": "CRM", "value": 1000000}],
+        defense_systems=[{"_id": ObjectId(), "scenario_id": healthy[2], "name": "EDR", "effectiveness": 50, "cost": 1000}],
+    ), healthy, broken, empty
+
+async def fake_run_simulation(iterations, risk_events, business_assets, defense_systems, adaptive=None, workers=1,
+                              plan_key=None, **engine_options):
+    """The pool's run_simulation, in process; a scenario with a 'Broken' event fails"""
+    if any(risk_event["name"] == "Broken" for risk_event in risk_events):
+        raise ValueError("impact_max must be above impact_min")
+    monte_carlo = MonteCarloSimulation(iterations=iterations, seed=engine_options["seed"])
+    return monte_carlo.run_simulation(risk_events, business_assets, defense_systems)
+
+def run_batch(monkeypatch, db, scenario_ids):
+    monkeypatch.setattr(simulation_executor, "run_simulation", fake_run_simulation)
+    monkeypatch.setattr(analysis_routes, "simulation_cache", SimulationCache(persistent=False))
+    monkeypatch.setattr(analysis_routes, "BATCH_WRITE_SIZE", 2)
+    request = BatchAnalysisRequest(
+        scenario_ids=[str(scenario_id) for scenario_id in scenario_ids] + ["not-an-id", str(ObjectId())],
+        options=AnalysisOptions(iterations=1000, seed=7)
+    )
+
+    async def collect():
+        response = await analysis_routes.run_batch_analysis(request, db)
+        return [json.loads(line) async for line in response.body_iterator]
+    return asyncio.run(collect())
+
+def test_components_are_read_with_one_query_per_collection(database):
+    db, healthy, broken, empty = database
+    scenarios = db.scenarios.documents
+    components = asyncio.run(analysis_routes.load_batch_components(scenarios, db))
+
+    for collection in ("risk_events", "business_assets", "defense_systems"):
+        assert db[collection].queries == [{"scenario_id": {"$in": [scenario["_id"] for scenario in scenarios]}}]
+    # Grouped per scenario, in the order a per-scenario query returns them
+    assert [risk_event["name"] for risk_event in components[str(healthy[0])]["risk_events"]] == ["Outage 0", "Phishing"]
+    assert len(components[str(healthy[1])]["business_assets"]) == 1
+    assert len(components[str(healthy[2])]["defense_systems"]) == 1
+    # What load_scenario_components would have raised, kept per scenario
+    assert components[str(empty)].status_code == 400
+
+def test_stream_has_a_line_per_scenario_and_a_summary(monkeypatch, database):
+    db, healthy, broken, empty = database
+    lines = run_batch(monkeypatch, db, healthy + [broken, empty])
+    # The scenarios are looked up at once as well
+    assert len(db.scenarios.queries) == 1 and "$in" in db.scenarios.queries[0]["_id"]
+
+    *scenario_lines, summary = lines
+    assert summary["type"] == "summary"
+    assert (summary["scenarios"], summary["completed"], summary["failed"]) == (7, 3, 4)
+    assert not summary["success"]
+
+    by_scenario = {line["scenario_id"]: line for line in scenario_lines}
+    assert len(by_scenario) == len(scenario_lines) == 7
+    for scenario_id in healthy:
+        line = by_scenario[str(scenario_id)]
+        assert (line["type"], line["success"]) == ("result", True)
+        assert line["data"]["expected_annual_loss"] > 0
+        assert line["analysis_id"] is not None
+    # The failing scenario is reported and the rest of the batch still runs
+    assert by_scenario[str(broken)]["status_code"] == 400
+    assert "impact_max" in by_scenario[str(broken)]["error"]
+    assert by_scenario[str(empty)]["status_code"] == 400
+    assert by_scenario["not-an-id"]["status_code"] == 400
+    assert [line["status_code"] for line in scenario_lines[:2]] == [400, 404]
+
+def test_results_are_written_in_bulk(monkeypatch, database):
+    db, healthy, broken, empty = database
+    run_batch(monkeypatch, db, healthy + [broken])
+
+    # Three results in groups of two: two bulk writes per collection
+    assert [len(operations) for operations in db.analysis_results.bulk_writes] == [2, 1]
+    assert [len(operations) for operations in db.scenarios.bulk_writes] == [2, 1]
+    updated = {operation._filter["_id"] for operations in db.scenarios.bulk_writes for operation in operations}
+    assert updated == set(healthy)
@@ -0,0 +1,55 @@
+# backend/tests/test_cascade.py - Dependency cascades are opt-in, acyclic, level-ordered and capped
+import numpy as np
+import pytest
+
+from app.services.cascade import build_cascade
+from app.services.mitigation import MitigationModel
+
+# A -> B -> C: B depends on A and C on B. Listed backwards, so the
+# topological relabelling has to put them in order.
+ASSETS = [
+    {"_id": "C", "name": "Warehouse", "value": 400},
+    {"_id": "B", "name": "ERP", "value": 200, "dependencies": ["C"]},
+    {"_id": "A", "name": "Datacenter", "value": 100, "dependencies": ["B"]},
+]
+EVENTS = [
+    {"name": "Power loss", "affected_assets": ["A"]},
+    {"name": "ERP outage", "affected_assets": ["B"]},
+]
+
+def chain(factor: float, assets=ASSETS):
+    return build_cascade(assets, MitigationModel(EVENTS, assets, []), factor)
+
+def test_cascades_are_opt_in():
+    assert build_cascade(ASSETS, MitigationModel(EVENTS, ASSETS, [])) is None
+    assert chain(0) is None
+    assert chain(0.5) is not None
+
+def test_cycle_is_rejected():
+    cyclic = [{**ASSETS[0], "dependencies": ["A"]}, *ASSETS[1:]]
+    with pytest.raises(ValueError, match="cycle"):
+        chain(0.5, cyclic)
+
+def test_chain_propagates_level_by_level():
+    cascade = chain(0.5)
+    # One asset per level, in dependency order A, B, C
+    assert cascade.nodes.tolist() == [2, 1, 0]
+    assert [level.stop - level.start for level in cascade.levels] == [1, 1, 1]
+
+    # A loses half its value: B gets 0.5 * 0.5 = 0.25, C gets 0.5 * 0.25 = 0.125
+    losses = cascade.losses(np.array([[50.0, 0.0]]))
+    assert losses[0] == pytest.approx(200 * 0.25 + 400 * 0.125)
+
+    # B's own damage adds to what it receives, and only the received part is cascade loss
+    losses = cascade.losses(np.array([[50.0, 40.0]]))
+    b_direct, b_total = 40 / 200, 40 / 200 + 0.25
+    assert losses[0] == pytest.approx(200 * (b_total - b_direct) + 400 * 0.5 * b_total)
+
+def test_damage_is_capped_at_the_asset_value():
+    # A's direct damage is 1.5 of its value, capped to 1
+    losses = chain(0.5).losses(np.array([[150.0, 0.0]]))
+    assert losses[0] == pytest.approx(200 * 0.5 + 400 * 0.25)
+
+    # With a full pass-through B would reach 0.9 + 1; it stops at 1, and so does C
+    losses = chain(1.0).losses(np.array([[100.0, 180.0]]))
+    assert losses[0] == pytest.approx(200 * (1 - 0.9) + 400 * 1)
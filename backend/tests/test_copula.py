@@ -0,0 +1,64 @@
+# backend/tests/test_copula.py - Copula margins, rank correlation and spec validation
+import numpy as np
+import pytest
+from scipy import stats
+
+from app.services.copula import build_copula
+from app.services.distributions import frequency_cdf_table
+from app.services.samplers import UniformSampler
+
+EVENTS = [
+    {"name": "Ransomware", "probability": 30},
+    {"name": "Outage", "probability": 40, "frequency": 3, "frequency_distribution": "poisson"},
+    {"name": "Phishing", "probability": 60},
+]
+ROWS = 100000
+
+def correlated(spec, seed=3):
+    """Counts and transformed uniforms of one (ROWS x 2 * events) sampler block"""
+    copula = build_copula(spec, EVENTS, [frequency_cdf_table(event) for event in EVENTS])
+    sampler = UniformSampler(np.random.default_rng(seed))
+    uniforms = sampler.uniforms(ROWS, 2 * len(EVENTS))
+    counts = np.zeros((ROWS, len(EVENTS)), dtype=np.int64)
+    copula.apply(uniforms, counts, sampler)
+    return counts, uniforms
+
+def group(rho, copula="gaussian", events=("Ransomware", "Outage", "Phishing")):
+    return {"copula": copula, "groups": [{"events": list(events), "correlation": rho}]}
+
+@pytest.mark.parametrize("copula", ["gaussian", "t"])
+def test_margins_are_unchanged(copula):
+    counts, uniforms = correlated(group(0.7, copula))
+    # Occurrence counts keep their own distributions
+    assert counts[:, 0].mean() == pytest.approx(0.3, abs=0.005)
+    assert counts[:, 2].mean() == pytest.approx(0.6, abs=0.005)
+    poisson = np.bincount(counts[:, 1], minlength=8)[:8] / ROWS
+    np.testing.assert_allclose(poisson, stats.poisson.pmf(np.arange(8), 3 * 0.4), atol=0.005)
+    # Correlated first-impact uniforms stay uniform
+    for column in range(len(EVENTS), 2 * len(EVENTS)):
+        assert stats.kstest(uniforms[:, column], "uniform").pvalue > 0.001
+
+@pytest.mark.parametrize("copula", ["gaussian", "t"])
+def test_rank_correlation_follows_the_correlation(copula):
+    correlations = []
+    for rho in (-0.4, 0.2, 0.5, 0.8):
+        counts, _ = correlated(group(rho, copula, ("Ransomware", "Outage")))
+        correlations.append(stats.spearmanr(counts[:, 0], counts[:, 1])[0])
+    assert correlations[0] < 0 < correlations[1]
+    assert np.all(np.diff(correlations) > 0)
+
+def test_independent_events_have_no_copula():
+    assert build_copula(None, EVENTS, [None] * 3) is None
+    assert build_copula({"groups": [{"events": ["Ransomware", "Outage"], "correlation": 0}]}, EVENTS, [None] * 3) is None
+
+@pytest.mark.parametrize("spec, message", [
+    ({"matrix": {"events": ["Ransomware", "Outage", "Phishing"],
+                 "values": [[1, 0.9, -0.9], [0.9, 1, 0.9], [-0.9, 0.9, 1]]}}, "positive definite"),
+    ({"groups": [{"events": ["Ransomware", "Outage", "Ransomware"], "correlation": 0.5}]}, "twice"),
+    ({"groups": [{"events": ["Ransomware", "Unknown"], "correlation": 0.5}]}, "unknown risk event"),
+    ({"groups": [{"events": ["Ransomware", "Outage"], "correlation": 1}]}, "strictly between"),
+    ({"matrix": {"events": ["Ransomware", "Outage"], "values": [[1, 0.5], [0.4, 1]]}}, "symmetric"),
+])
+def test_invalid_specs_raise(spec, message):
+    with pytest.raises(ValueError, match=message):
+        build_copula(spec, EVENTS, [frequency_cdf_table(event) for event in EVENTS])
@@ -0,0 +1,98 @@
+# backend/tests/test_defense_value.py - Simulated defense value matches reruns, merges across shards, feeds the ROI
+import asyncio
+import pytest
+from bson import ObjectId
+
+from app.models.analysis import AnalysisOptions
+from app.routes import analysis as analysis_routes
+from app.services import simulation_executor
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.simulation_cache import SimulationCache
+from app.services.simulation_executor import split_blocks, _simulate_blocks, merge_shards
+
+ITERATIONS = 20000
+RISK_EVENTS = [
+    {"name": "Ransomware", "probability": 20, "impact_min": 200000, "impact_max": 2000000, "affected_assets": ["crm"]},
+    {"name": "Phishing", "probability": 60, "frequency": 3, "frequency_distribution": "poisson",
+     "impact_min": 10000, "impact_max": 400000},
+]
+BUSINESS_ASSETS = [
+    {"_id": "crm", "name": "CRM", "value": 2000000, "dependencies": ["erp"]},
+    {"_id": "erp", "name": "ERP", "value": 1000000},
+]
+DEFENSE_SYSTEMS = [
+    {"_id": "d1", "name": "EDR", "effectiveness": 60, "coverage_percentage": 80, "protected_assets": ["crm"],
+     "cost": 50000, "maintenance_cost": 10000},
+    {"_id": "d2", "name": "Backups", "effectiveness": 40, "coverage_percentage": 100, "cost": 30000},
+]
+
+def run(defense_systems, cascade_factor=0.0, **options):
+    monte_carlo = MonteCarloSimulation(iterations=ITERATIONS, seed=4, cascade_factor=cascade_factor, **options)
+    return monte_carlo.run_simulation(RISK_EVENTS, BUSINESS_ASSETS, defense_systems)
+
+@pytest.mark.parametrize("cascade_factor", [0.0, 0.5])
+def test_reductions_equal_reruns_on_the_same_seed(cascade_factor):
+    results = run(DEFENSE_SYSTEMS, cascade_factor)
+    defended = results["expected_annual_loss"]
+    defense_value = results["defense_value"]
+
+    undefended = run([], cascade_factor)["expected_annual_loss"]
+    assert defense_value["expected_loss_reduction"] == pytest.approx(undefended - defended, rel=1e-9)
+    assert defense_value["undefended_expected_loss"] == pytest.approx(undefended, rel=1e-9)
+    for defense in defense_value["defenses"]:
+        others = [system for system in DEFENSE_SYSTEMS if system["name"] != defense["name"]]
+        without = run(others, cascade_factor)["expected_annual_loss"]
+        assert defense["marginal_loss_reduction"] == pytest.approx(without - defended, rel=1e-9), defense["name"]
+        assert 0 < defense["standard_error"] < defense["marginal_loss_reduction"]
+    # Both protect the CRM, so their marginal reductions overlap
+    assert defense_value["marginal_reduction_sum"] < defense_value["expected_loss_reduction"]
+
+def test_roi_counts_implementation_and_maintenance():
+    defense_value = run(DEFENSE_SYSTEMS)["defense_value"]
+    assert defense_value["total_cost"] == 90000
+    reduction = defense_value["expected_loss_reduction"]
+    assert defense_value["security_roi"] == pytest.approx((reduction - 90000) / 90000 * 100)
+    edr = next(defense for defense in defense_value["defenses"] if defense["name"] == "EDR")
+    assert edr["marginal_roi"] == pytest.approx((edr["marginal_loss_reduction"] - 60000) / 60000 * 100)
+    # Without costs there is no ROI, and without defenses no accumulator at all
+    free = [{**system, "cost": 0, "maintenance_cost": 0} for system in DEFENSE_SYSTEMS]
+    assert run(free)["defense_value"]["security_roi"] is None
+    assert "defense_value" not in run([])
+
+@pytest.mark.parametrize("importance_sampling", [False, True])
+def test_shard_merge_matches_a_single_process(importance_sampling):
+    options = {"seed": 4, "block_size": 4096, "cascade_factor": 0.5, "importance_sampling": importance_sampling}
+    single = MonteCarloSimulation(iterations=ITERATIONS, **options).run_simulation(
+        RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS
+    )
+    for shards in (2, 5):
+        monte_carlo, engine_options, blocks = split_blocks(ITERATIONS, RISK_EVENTS, shards, **options)
+        merged = merge_shards(monte_carlo, [
+            _simulate_blocks(ITERATIONS, engine_options, RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, shard)
+            for shard in blocks
+        ])
+        assert merged["defense_value"] == single["defense_value"], shards
+
+async def fake_run_simulation(iterations, risk_events, business_assets, defense_systems, adaptive=None, workers=1,
+                              plan_key=None, **engine_options):
+    """The pool's run_simulation, in process"""
+    return run(defense_systems)
+
+@pytest.mark.parametrize("cost, signed_positive", [(1000, True), (10000000, False)])
+def test_security_roi_is_clamped_and_the_signed_value_kept(monkeypatch, cost, signed_positive):
+    monkeypatch.setattr(simulation_executor, "run_simulation", fake_run_simulation)
+    monkeypatch.setattr(analysis_routes, "simulation_cache", SimulationCache(persistent=False))
+    defense_systems = [{**DEFENSE_SYSTEMS[1], "cost": cost}]
+    scenario_id = ObjectId()
+    components = analysis_routes.build_scenario_components(
+        {"_id": scenario_id}, RISK_EVENTS, BUSINESS_ASSETS, defense_systems
+    )
+    options = AnalysisOptions(iterations=ITERATIONS)
+    results = asyncio.run(analysis_routes.simulate_scenario(str(scenario_id), components, None, options))
+
+    signed = results["security_roi_signed"]
+    assert signed == results["defense_value"]["security_roi"]
+    assert (signed > 0) == signed_positive
+    assert results["security_roi"] == max(0.0, signed)
+    document = analysis_routes.build_analysis_document(str(scenario_id), results)
+    assert (document["security_roi"], document["security_roi_signed"]) == (results["security_roi"], signed)
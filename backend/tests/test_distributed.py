@@ -0,0 +1,69 @@
+# backend/tests/test_distributed.py - Distributed runs match a single process, whichever nodes are lost
+import asyncio
+import secrets
+import pytest
+from fastapi import HTTPException
+
+from app.models.analysis import AnalysisOptions
+from app.routes.analysis import require_distributed_cluster
+from app.services import distributed
+from app.services.distributed import SimulationCoordinator, ClusterNotConfiguredError, require_cluster, start_local_workers
+from app.services.monte_carlo import MonteCarloSimulation
+from tests.test_sharded_simulation import RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, COMPARED
+
+# 8 MB keeps 262144 losses exactly, so the sketch path is compared as well
+OPTIONS = {"seed": 2024, "memory_budget_mb": 8}
+ITERATIONS = 600000
+
+@pytest.fixture(scope="module")
+def cluster():
+    token = secrets.token_hex(16)
+    workers = start_local_workers(3, token)
+    yield token, workers
+    for _, process in workers:
+        process.kill()
+        process.wait()
+
+@pytest.fixture(scope="module")
+def reference():
+    simulation = MonteCarloSimulation(iterations=ITERATIONS, **OPTIONS)
+    return simulation.run_simulation(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS)
+
+def run(addresses, token):
+    coordinator = SimulationCoordinator(addresses, token=token, shard_timeout=60)
+    return asyncio.run(coordinator.run_simulation(ITERATIONS, RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, **OPTIONS))
+
+@pytest.mark.parametrize("nodes", [1, 2])
+def test_node_count_does_not_change_results(cluster, reference, nodes):
+    token, workers = cluster
+    results = run([address for address, _ in workers[:nodes]], token)
+    assert results["statistics_method"]["method"] == "streaming"
+    assert results["distributed"]["lost_workers"] == {}
+    for key in COMPARED:
+        assert results[key] == reference[key], key
+
+def test_lost_worker_does_not_change_results(cluster, reference):
+    token, workers = cluster
+    lost, process = workers[-1]
+    process.kill()
+    process.wait()
+
+    results = run([address for address, _ in workers], token)
+    assert list(results["distributed"]["lost_workers"]) == [lost]
+    assert results["random_stream"]["workers"] == 2
+    for key in COMPARED:
+        assert results[key] == reference[key], key
+
+@pytest.mark.parametrize("addresses, token", [("", "secret"), ("tcp://127.0.0.1:7400", "")])
+def test_unconfigured_cluster_is_rejected_with_503(monkeypatch, addresses, token):
+    monkeypatch.setattr(distributed, "SIMULATION_CLUSTER", addresses)
+    monkeypatch.setenv("SIMULATION_CLUSTER_TOKEN", token)
+    with pytest.raises(ClusterNotConfiguredError):
+        require_cluster()
+
+    with pytest.raises(HTTPException) as error:
+        require_distributed_cluster(AnalysisOptions(distributed=True))
+    assert error.value.status_code == 503
+    # Local runs do not need the cluster
+    require_distributed_cluster(AnalysisOptions())
+    require_distributed_cluster(None)
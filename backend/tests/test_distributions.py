@@ -0,0 +1,123 @@
+# backend/tests/test_distributions.py - Frequency model selection, count tables and severity samplers
+import numpy as np
+import pytest
+from scipy import stats
+
+from app.services.distributions import (
+    resolve_frequency_distribution, expected_frequency, frequency_cdf_table, sample_counts, scale_frequency,
+    build_severity_sampler
+)
+
+EVENT = {"name": "Outage", "probability": 30, "impact_min": 1000, "impact_max": 5000}
+
+@pytest.mark.parametrize("frequency", [1.0, 1.01, 0.5, 6])
+def test_frequency_alone_keeps_bernoulli(frequency):
+    event = {**EVENT, "frequency": frequency}
+    assert resolve_frequency_distribution(event) == "bernoulli"
+    assert frequency_cdf_table(event) is None
+    assert expected_frequency(event) == pytest.approx(0.3)
+
+    # P(at least one occurrence) stays the probability, however frequency is edited
+    uniforms = np.random.default_rng(1).random(200000)
+    counts = sample_counts(uniforms, event["probability"], frequency_cdf_table(event))
+    assert set(np.unique(counts)) == {0, 1}
+    assert counts.mean() == pytest.approx(0.3, abs=0.005)
+
+def test_poisson_table_matches_scipy():
+    event = {**EVENT, "frequency": 6, "frequency_distribution": "poisson"}
+    rate = 6 * 0.3
+    assert expected_frequency(event) == pytest.approx(rate)
+
+    table = frequency_cdf_table(event)
+    assert table[-1] == 1.0
+    assert np.all(np.diff(table) >= 0)
+    np.testing.assert_allclose(table[:-1], stats.poisson.cdf(np.arange(len(table) - 1), rate), rtol=1e-12)
+    assert 1 - table[-2] < 1e-9
+
+def test_negative_binomial_table_matches_scipy():
+    event = {**EVENT, "frequency": 20, "frequency_distribution": "negative_binomial", "frequency_dispersion": 3}
+    rate = 20 * 0.3
+    size, success = rate / (3 - 1), 1 / 3
+
+    table = frequency_cdf_table(event)
+    np.testing.assert_allclose(
+        table[:-1], stats.nbinom.cdf(np.arange(len(table) - 1), size, success), rtol=1e-10
+    )
+
+    counts = sample_counts(np.random.default_rng(2).random(400000), event["probability"], table)
+    assert counts.mean() == pytest.approx(rate, rel=0.01)
+    assert counts.var() / counts.mean() == pytest.approx(3, rel=0.03)
+
+def test_zero_rate_table_is_always_zero():
+    event = {**EVENT, "probability": 0, "frequency_distribution": "poisson"}
+    table = frequency_cdf_table(event)
+    assert table.tolist() == [1.0]
+    assert sample_counts(np.array([0.0, 0.5, 0.999]), 0, table).tolist() == [0, 0, 0]
+
+@pytest.mark.parametrize("event", [
+    {**EVENT, "frequency_distribution": "binomial"},
+    {**EVENT, "frequency_distribution": "negative_binomial", "frequency_dispersion": 1},
+])
+def test_invalid_frequency_settings_raise(event):
+    with pytest.raises(ValueError):
+        frequency_cdf_table(event)
+
+def test_scaling_follows_the_pinned_model():
+    bernoulli = scale_frequency({**EVENT, "frequency": 4}, 2)
+    assert (bernoulli["frequency_distribution"], bernoulli["probability"], bernoulli["frequency"]) == ("bernoulli", 60, 4)
+
+    poisson = scale_frequency({**EVENT, "frequency": 4, "frequency_distribution": "poisson"}, 2)
+    assert (poisson["probability"], poisson["frequency"]) == (30, 8)
+
+# Quantile levels the severity samplers are checked at
+LEVELS = np.array([0.001, 0.05, 0.25, 0.5, 0.75, 0.95, 0.999])
+HISTORY = [1000, 2500, 4000, 12000, 30000]
+
+def severity(distribution, **params):
+    return build_severity_sampler({**EVENT, "severity_distribution": distribution, "severity_params": params})
+
+@pytest.mark.parametrize("sampler, expected", [
+    (severity("uniform"), stats.uniform(1000, 4000)),
+    (severity("lognormal", mu=9, sigma=1.5), stats.lognorm(1.5, scale=np.exp(9))),
+    (severity("triangular", mode=2000), stats.triang(0.25, loc=1000, scale=4000)),
+    (severity("pert", mode=2000), stats.beta(2, 4, loc=1000, scale=4000)),
+    (severity("pareto", alpha=2.5), stats.pareto(2.5, scale=1000)),
+], ids=["uniform", "lognormal", "triangular", "pert", "pareto"])
+def test_severity_quantiles_match_scipy(sampler, expected):
+    # PERT interpolates a tabulated inverse CDF, so allow its table error
+    np.testing.assert_allclose(sampler.sample(LEVELS), expected.ppf(LEVELS), rtol=1e-4)
+
+def test_fitted_lognormal_puts_impact_range_at_the_5th_and_95th_percentiles():
+    np.testing.assert_allclose(severity("lognormal").sample(np.array([0.05, 0.95])), [1000, 5000], rtol=1e-9)
+
+def test_pareto_cap_truncates_single_losses():
+    sampler = severity("pareto", alpha=1.5, scale=2000, cap=10000)
+    uncapped = stats.pareto(1.5, scale=2000).ppf(LEVELS)
+    np.testing.assert_allclose(sampler.sample(LEVELS), np.minimum(uncapped, 10000), rtol=1e-9)
+    assert sampler.describe() == {"distribution": "pareto", "alpha": 1.5, "scale": 2000, "cap": 10000}
+    assert severity("pareto", alpha=2).describe()["cap"] is None
+
+def test_empirical_quantiles_interpolate_the_history():
+    sampler = severity("empirical", values=list(reversed(HISTORY)))
+    np.testing.assert_allclose(sampler.sample(LEVELS), np.quantile(HISTORY, LEVELS), rtol=1e-9)
+
+@pytest.mark.parametrize("distribution, params, message", [
+    ("pareto", {"alpha": 2, "scale": 5000, "cap": 4000}, "cap must not be below scale"),
+    ("pareto", {"alpha": 2, "cap": float("inf")}, "positive, finite"),
+    ("pareto", {"alpha": 0}, "must be positive"),
+    ("pareto", {"alpha": -1.5}, "must be positive"),
+    ("pareto", {}, "needs 'alpha'"),
+    ("pareto", {"alpha": "heavy"}, "'alpha' must be a number"),
+    ("pareto", {"alpha": 2, "cap": [1]}, "'cap' must be a number"),
+    ("lognormal", {"mu": 9, "sigma": 0}, "sigma must be positive"),
+    ("lognormal", {"mu": "nine", "sigma": 1}, "'mu' must be a number"),
+    ("triangular", {"mode": 9000}, "min <= mode <= max"),
+    ("pert", {"lambda": 0}, "lambda must be positive"),
+    ("pert", {"mode": 5, "min": 5, "max": 5}, "min < max"),
+    ("empirical", {"values": [1000]}, "at least two"),
+    ("empirical", {"values": [-1, 1000]}, "non-negative"),
+    ("gamma", {}, "Unknown severity distribution"),
+])
+def test_invalid_severity_settings_raise(distribution, params, message):
+    with pytest.raises(ValueError, match=message):
+        severity(distribution, **params)
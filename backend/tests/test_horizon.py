@@ -0,0 +1,86 @@
+# backend/tests/test_horizon.py - Multi-year horizon runs and their schedules
+import numpy as np
+import pytest
+
+from app.services.horizon import HorizonSchedule, PERIOD_METRICS, MAX_HORIZON_YEARS
+from app.services.monte_carlo import MonteCarloSimulation
+
+RISK_EVENTS = [
+    {"name": "Ransomware", "probability": 20, "impact_min": 200000, "impact_max": 2000000, "affected_assets": ["crm"]},
+    {"name": "Phishing", "probability": 70, "frequency": 4, "frequency_distribution": "poisson",
+     "impact_min": 1000, "impact_max": 20000},
+]
+BUSINESS_ASSETS = [
+    {"_id": "crm", "name": "CRM", "value": 2000000, "dependencies": ["erp"]},
+    {"_id": "erp", "name": "ERP", "value": 1000000},
+]
+DEFENSE_SYSTEMS = [
+    {"name": "EDR", "effectiveness": 60, "coverage_percentage": 80, "cost": 90000, "maintenance_cost": 10000},
+    {"name": "Backups", "effectiveness": 40, "coverage_percentage": 100, "cost": 30000},
+]
+
+def engine(**options):
+    return MonteCarloSimulation(iterations=50000, seed=5, block_size=8192, cascade_factor=0.5, **options)
+
+@pytest.mark.parametrize("sampling", ["random", "latin_hypercube"])
+def test_first_year_is_the_one_year_run(sampling):
+    schedule = HorizonSchedule(4, frequency_trend=0.5, impact_trend=0.1)
+    horizon = engine(sampling=sampling).run_horizon(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, schedule)
+    single = engine(sampling=sampling).run_simulation(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS)
+
+    first = horizon["periods"][0]
+    for metric in PERIOD_METRICS:
+        assert first["annual_loss"][metric] == single[metric], metric
+    assert first["cumulative_loss"] == first["annual_loss"]
+
+def test_cumulative_losses_and_ruin_accumulate():
+    schedule = HorizonSchedule(5, frequency_multipliers=[1, 2, 2, 3, 3], ruin_capital=1500000)
+    horizon = engine().run_horizon(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, schedule)
+    periods = horizon["periods"]
+
+    annual = np.array([period["annual_loss"]["expected_annual_loss"] for period in periods])
+    cumulative = np.array([period["cumulative_loss"]["expected_annual_loss"] for period in periods])
+    np.testing.assert_allclose(cumulative, np.cumsum(annual), rtol=1e-9)
+    # Doubling the frequencies raises the second year's losses
+    assert annual[1] > 1.5 * annual[0]
+
+    ruin = horizon["curves"]["ruin_probability"]
+    assert all(0 <= earlier <= later <= 1 for earlier, later in zip(ruin, ruin[1:]))
+    assert horizon["horizon"]["ruin_probability"] == ruin[-1]
+    assert horizon["horizon"]["ruin_capital"] == 1500000
+
+def test_horizon_rejects_importance_sampling():
+    with pytest.raises(ValueError, match="Importance sampling"):
+        engine(importance_sampling=True).run_horizon(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, HorizonSchedule(2))
+
+def test_trends_compound_from_the_first_year():
+    schedule = HorizonSchedule(3, frequency_trend=0.1, impact_trend=-0.5)
+    np.testing.assert_allclose(schedule.frequency_scales, [1, 1.1, 1.21])
+    np.testing.assert_allclose(schedule.impact_scales, [1, 0.5, 0.25])
+    np.testing.assert_allclose(HorizonSchedule(2, discount_rate=0.25).discount_factors, [0.8, 0.64])
+
+def test_defense_costs_are_amortized():
+    # 120000 implementation over 3 of 5 years, plus 10000 maintenance every year
+    costs = HorizonSchedule(5, amortization_years=3).defense_costs(DEFENSE_SYSTEMS)
+    np.testing.assert_allclose(costs, [50000, 50000, 50000, 10000, 10000])
+    # By default over the whole horizon
+    np.testing.assert_allclose(HorizonSchedule(4).defense_costs(DEFENSE_SYSTEMS), [40000] * 4)
+    np.testing.assert_allclose(HorizonSchedule(2).defense_costs([]), [0, 0])
+
+def test_capital_defaults_to_the_asset_value():
+    assert HorizonSchedule(2).capital(BUSINESS_ASSETS) == 3000000
+    assert HorizonSchedule(2, ruin_capital=5).capital(BUSINESS_ASSETS) == 5
+    assert HorizonSchedule(2).capital([]) is None
+
+@pytest.mark.parametrize("options, message", [
+    ({"years": 0}, "1 to"),
+    ({"years": MAX_HORIZON_YEARS + 1}, "1 to"),
+    ({"years": 3, "frequency_multipliers": [1, 2]}, "one value per year"),
+    ({"years": 2, "impact_multipliers": [1, 0]}, "must be positive"),
+    ({"years": 2, "frequency_trend": -1}, "above -100%"),
+    ({"years": 2, "amortization_years": 0}, "at least 1"),
+    ({"years": 2, "discount_rate": -0.1}, "not be negative"),
+])
+def test_invalid_schedules_raise(options, message):
+    with pytest.raises(ValueError, match=message):
+        HorizonSchedule(**options)
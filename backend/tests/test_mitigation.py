@@ -0,0 +1,58 @@
+# backend/tests/test_mitigation.py - Mitigation factors with and without asset routing
+import numpy as np
+import pytest
+
+from app.services.mitigation import MitigationModel
+
+ASSETS = [
+    {"_id": "crm", "name": "CRM", "value": 3000000},
+    {"_id": "erp", "name": "ERP", "value": 1000000},
+]
+DEFENSES = [
+    {"name": "EDR", "effectiveness": 60, "coverage_percentage": 80},
+    {"name": "Backups", "effectiveness": 50, "coverage_percentage": 50},
+]
+
+def baseline_factor(defenses):
+    """The original model: every defense mitigates every event"""
+    return np.prod([1 - d["effectiveness"] / 100 * d.get("coverage_percentage", 100) / 100 for d in defenses])
+
+@pytest.mark.parametrize("assets", [[], ASSETS])
+def test_without_routing_fields_factor_is_the_baseline_product(assets):
+    events = [{"name": "Ransomware"}, {"name": "Phishing"}]
+    factors = MitigationModel(events, assets, DEFENSES).factors()
+    np.testing.assert_allclose(factors, baseline_factor(DEFENSES), rtol=1e-12)
+
+def test_partial_protection_is_value_weighted():
+    defenses = [{**DEFENSES[0], "protected_assets": ["crm"]}, DEFENSES[1]]
+    events = [{"name": "Ransomware"}, {"name": "ERP bug", "affected_assets": ["erp"]}]
+    factors = MitigationModel(events, ASSETS, defenses).factors()
+
+    # CRM carries 3/4 of the value and has both defenses; ERP only has backups
+    crm, erp = baseline_factor(DEFENSES), baseline_factor(DEFENSES[1:])
+    assert factors[0] == pytest.approx(0.75 * crm + 0.25 * erp)
+    assert factors[1] == pytest.approx(erp)
+
+def test_inactive_defenses_are_left_out():
+    defenses = [{**DEFENSES[0], "protected_assets": ["crm"]}, DEFENSES[1]]
+    model = MitigationModel([{"name": "Ransomware"}], ASSETS, defenses)
+    assert model.factors(np.array([False, True]))[0] == pytest.approx(baseline_factor(DEFENSES[1:]))
+    assert model.factors(np.array([False, False]))[0] == pytest.approx(1.0)
+
+def test_unknown_asset_references_are_ignored():
+    events = [
+        # The deleted asset is dropped, so the whole loss lands on ERP
+        {"name": "ERP bug", "affected_assets": ["erp", "deleted"]},
+        # Nothing left to hit: the loss still lands, on every asset
+        {"name": "Ghost", "affected_assets": ["deleted"]},
+    ]
+    defenses = [
+        {**DEFENSES[0], "protected_assets": ["erp", "deleted"]},
+        # Protects only a deleted asset, so it no longer mitigates anything
+        {**DEFENSES[1], "protected_assets": ["deleted"]},
+    ]
+    model = MitigationModel(events, ASSETS, defenses)
+    factors = model.factors()
+    assert factors[0] == pytest.approx(baseline_factor(DEFENSES[:1]))
+    assert factors[1] == pytest.approx(0.75 * 1 + 0.25 * baseline_factor(DEFENSES[:1]))
+    assert model.exposure[1].toarray().tolist() == [[0.75, 0.25]]
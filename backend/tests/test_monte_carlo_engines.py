@@ -0,0 +1,63 @@
+# backend/tests/test_monte_carlo_engines.py - The loop engine and the vectorized engine agree
+import numpy as np
+import pytest
+
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.random_streams import block_count
+
+ITERATIONS = 20000
+SEED = 11
+# A frequent event keeps the median away from zero
+RISK_EVENTS = [
+    {"name": "Ransomware", "probability": 15, "impact_min": 200000, "impact_max": 2000000,
+     "severity_distribution": "lognormal"},
+    {"name": "Data breach", "probability": 25, "impact_min": 50000, "impact_max": 800000,
+     "severity_distribution": "pert", "severity_params": {"mode": 150000}},
+    {"name": "Phishing", "probability": 90, "frequency": 6, "frequency_distribution": "poisson",
+     "impact_min": 1000, "impact_max": 20000},
+]
+BUSINESS_ASSETS = [
+    {"_id": "crm", "name": "CRM", "value": 2000000},
+    {"_id": "erp", "name": "ERP", "value": 1000000},
+]
+DEFENSE_SYSTEMS = [
+    {"name": "EDR", "effectiveness": 60, "coverage_percentage": 80, "protected_assets": ["crm"]},
+    {"name": "Awareness training", "effectiveness": 40, "coverage_percentage": 50},
+]
+
+def vectorized_losses() -> np.ndarray:
+    """Per-iteration losses of the vectorized engine, from its exact statistics buffer"""
+    simulation = MonteCarloSimulation(iterations=ITERATIONS, seed=SEED, cascade_factor=0)
+    plan = simulation.compile_plan(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS)
+    simulation.resolve_block_size(plan.risk_events)
+    statistics = simulation.simulate_blocks(plan, range(block_count(ITERATIONS, simulation.block_size)))
+    return statistics.values()
+
+@pytest.fixture(scope="module")
+def engines():
+    reference = MonteCarloSimulation(iterations=ITERATIONS, seed=SEED, mode="reference", cascade_factor=0)
+    vectorized = MonteCarloSimulation(iterations=ITERATIONS, seed=SEED, cascade_factor=0)
+    return (
+        reference.run_simulation(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS),
+        vectorized.run_simulation(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS),
+        vectorized_losses(),
+    )
+
+def test_means_agree(engines):
+    reference, vectorized, _ = engines
+    # Two independent runs: the difference has sqrt(2) standard errors
+    standard_error = np.hypot(reference["standard_deviation"], vectorized["standard_deviation"]) / np.sqrt(ITERATIONS)
+    assert abs(reference["expected_annual_loss"] - vectorized["expected_annual_loss"]) < 4 * standard_error
+
+@pytest.mark.parametrize("metric, percentile", [
+    ("p50_median_impact", 50), ("p90_severe_impact", 90), ("p99_worst_case", 99),
+])
+def test_percentiles_agree(engines, metric, percentile):
+    reference, vectorized, losses = engines
+    assert np.percentile(losses, percentile) == vectorized[metric]
+    # Distribution-free: the reference quantile lies within 4 standard errors
+    # of rank of the vectorized one (both runs contribute sampling error)
+    p = percentile / 100
+    rank_error = 4 * np.sqrt(2 * p * (1 - p) / ITERATIONS)
+    lower, upper = np.percentile(losses, 100 * np.clip([p - rank_error, p + rank_error], 0, 1))
+    assert lower <= reference[metric] <= upper
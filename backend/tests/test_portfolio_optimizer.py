@@ -0,0 +1,115 @@
+# backend/tests/test_portfolio_optimizer.py - Portfolio search against brute-force enumeration
+import numpy as np
+import pytest
+
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.portfolio_optimizer import (
+    PortfolioEvaluator, PortfolioOptimizer, EXHAUSTIVE_CANDIDATES, fractional_knapsack, portfolio_objective
+)
+
+ASSETS = [
+    {"_id": "dc", "name": "Datacenter", "value": 2000000},
+    {"_id": "erp", "name": "ERP", "value": 1500000, "dependencies": ["crm"]},
+    {"_id": "crm", "name": "CRM", "value": 1000000},
+    {"_id": "web", "name": "Web shop", "value": 800000, "dependencies": ["crm"]},
+]
+EVENTS = [
+    {"name": "Power loss", "probability": 20, "impact_min": 200000, "impact_max": 900000, "affected_assets": ["dc"]},
+    {"name": "Ransomware", "probability": 35, "impact_min": 100000, "impact_max": 1200000},
+    {"name": "ERP bug", "probability": 50, "impact_min": 20000, "impact_max": 300000, "affected_assets": ["erp"]},
+    {"name": "DDoS", "probability": 40, "impact_min": 50000, "impact_max": 400000, "affected_assets": ["web"]},
+    {"name": "Data leak", "probability": 15, "impact_min": 300000, "impact_max": 2000000,
+     "affected_assets": ["crm", "web"]},
+]
+# One candidate more than the exhaustive limit, so run() searches
+PROTECTED = [["dc"], None, ["erp"], ["web"], ["crm"], ["crm", "web"], ["dc", "erp"], None,
+             ["web"], ["erp", "crm"], ["dc"], None, ["crm"]]
+CANDIDATES = [
+    {
+        "name": f"Defense {position}",
+        "effectiveness": 25 + (position * 37) % 60,
+        "coverage_percentage": 60 + (position * 13) % 40,
+        "cost": 20000 + (position * 7919) % 60000,
+        **({"protected_assets": protected} if protected else {}),
+    }
+    for position, protected in enumerate(PROTECTED)
+]
+COSTS = np.array([defense["cost"] for defense in CANDIDATES], dtype=float)
+BUDGET = 0.4 * COSTS.sum()
+
+@pytest.fixture(scope="module")
+def samples():
+    return MonteCarloSimulation(iterations=2000, seed=17).record_samples(EVENTS, ASSETS, [])
+
+def brute_force(evaluator):
+    """Every affordable subset and its objective, scored straight from the losses"""
+    count = len(COSTS)
+    subsets = (np.arange(2 ** count)[:, None] >> np.arange(count) & 1).astype(bool)
+    subsets = subsets[subsets @ COSTS <= BUDGET + 1e-9]
+    values = np.concatenate([
+        portfolio_objective(evaluator.losses(subsets[start:start + 256]), evaluator.objective)
+        for start in range(0, len(subsets), 256)
+    ])
+    return subsets, values
+
+@pytest.fixture(scope="module", params=[
+    ("expected_annual_loss", 0.0), ("conditional_var_95", 0.0),
+    ("expected_annual_loss", 0.5), ("conditional_var_95", 0.5),
+], ids=lambda param: f"{param[0]}-cascade{param[1]}")
+def case(request, samples):
+    objective, cascade_factor = request.param
+    evaluator = PortfolioEvaluator(samples, EVENTS, ASSETS, CANDIDATES, [], objective, cascade_factor)
+    assert evaluator.cascades == (cascade_factor > 0)
+    return samples, objective, cascade_factor, brute_force(evaluator)
+
+def new_optimizer(case, max_evaluations=10 ** 6):
+    samples, objective, cascade_factor, _ = case
+    evaluator = PortfolioEvaluator(samples, EVENTS, ASSETS, CANDIDATES, [], objective, cascade_factor)
+    return PortfolioOptimizer(evaluator, COSTS, BUDGET, max_evaluations)
+
+def test_search_finds_the_brute_force_optimum(case):
+    subsets, values = case[3]
+    optimum = values.min()
+    assert len(CANDIDATES) > EXHAUSTIVE_CANDIDATES
+
+    result = new_optimizer(case).run()
+    assert result["method"] == "branch_and_bound"
+    assert result["optimal"]
+    assert result["value"] == pytest.approx(optimum, rel=1e-9)
+    assert COSTS[result["portfolio"]].sum() <= BUDGET + 1e-9
+    assert result["lower_bound"] <= result["value"] + 1e-6
+    assert result["greedy_value"] >= optimum - 1e-6
+
+    exhaustive = new_optimizer(case).exhaustive()
+    assert exhaustive["value"] == pytest.approx(optimum, rel=1e-9)
+
+def test_bound_never_exceeds_the_subtree_optimum(case):
+    subsets, values = case[3]
+    optimizer = new_optimizer(case)
+    rng = np.random.default_rng(5)
+    for _ in range(25):
+        order = rng.permutation(len(COSTS))
+        depth = int(rng.integers(0, len(COSTS)))
+        # An affordable portfolio of decided candidates
+        chosen = np.zeros(len(COSTS), dtype=bool)
+        for candidate in order[:depth]:
+            if rng.random() < 0.4 and COSTS[chosen].sum() + COSTS[candidate] <= BUDGET:
+                chosen[candidate] = True
+        spent = COSTS[chosen].sum()
+        options = optimizer._affordable(order[depth:], spent)
+        bound, _, value = optimizer._bound(chosen, options, spent)
+
+        # The subtree: the node's portfolio plus any affordable set of its options
+        allowed = chosen.copy()
+        allowed[options] = True
+        subtree = subsets[:, chosen].all(axis=1) & ~subsets[:, ~allowed].any(axis=1)
+        optimum = values[subtree].min()
+        assert bound <= optimum * (1 + 1e-9) + 1e-6
+        assert optimum <= value * (1 + 1e-9) + 1e-6
+
+def test_fractional_knapsack():
+    gains, costs = np.array([60.0, 100.0, 120.0, 5.0]), np.array([10.0, 20.0, 30.0, 0.0])
+    # Free and most efficient first, then two thirds of the last item
+    assert fractional_knapsack(gains, costs, 50) == pytest.approx(5 + 60 + 100 + 120 * 20 / 30)
+    assert fractional_knapsack(gains, costs, 100) == pytest.approx(gains.sum())
+    assert fractional_knapsack(-gains, costs, 100) == 0
@@ -0,0 +1,65 @@
+# backend/tests/test_precision.py - float32 compute: its guardrail check, the fallback and the accuracy
+import math
+import numpy as np
+import pytest
+
+from app.services import monte_carlo as monte_carlo_module
+from app.services.monte_carlo import MonteCarloSimulation, FLOAT32_TOLERANCE
+from app.services.random_streams import block_generator
+from app.services.streaming_stats import _compensated_sum
+
+ITERATIONS = 50000
+SEED = 13
+RISK_EVENTS = [
+    {"name": "Ransomware", "probability": 15, "impact_min": 200000, "impact_max": 2000000,
+     "severity_distribution": "lognormal"},
+    {"name": "Data breach", "probability": 25, "impact_min": 50000, "impact_max": 800000,
+     "severity_distribution": "pert", "severity_params": {"mode": 150000}},
+    {"name": "Phishing", "probability": 90, "frequency": 6, "frequency_distribution": "poisson",
+     "impact_min": 1000, "impact_max": 20000},
+]
+DEFENSE_SYSTEMS = [{"name": "EDR", "effectiveness": 60, "coverage_percentage": 80}]
+PERCENTILE_METRICS = {50: "p50_median_impact", 90: "p90_severe_impact", 95: "p95_impact", 99: "p99_worst_case"}
+
+def run(precision, **options):
+    monte_carlo = MonteCarloSimulation(iterations=ITERATIONS, seed=SEED, precision=precision, **options)
+    return monte_carlo.run_simulation(RISK_EVENTS, [], DEFENSE_SYSTEMS)
+
+def test_float32_check_passes_and_is_reported():
+    report = run("float32")["precision"]
+    assert (report["requested"], report["used"]) == ("float32", "float32")
+    assert report["aggregation"] == "compensated float64"
+    check = report["check"]
+    assert check["passed"]
+    assert check["max_relative_error"] <= check["tolerance"] == FLOAT32_TOLERANCE
+    # At most 2% of the run is simulated twice
+    assert check["checked_iterations"] == 1000
+    assert run("float64")["precision"]["check"] is None
+
+def test_failed_check_falls_back_to_float64(monkeypatch):
+    monkeypatch.setattr(monte_carlo_module, "FLOAT32_TOLERANCE", 1e-15)
+    results = run("float32", block_size=8192)
+    report = results["precision"]
+    assert not report["check"]["passed"]
+    assert (report["requested"], report["used"]) == ("float32", "float64")
+    # The fallback draws and sums exactly like a float64 run with the same chunks
+    expected = run("float64", block_size=8192)
+    for metric in PERCENTILE_METRICS.values():
+        assert results[metric] == expected[metric]
+
+def test_float32_percentiles_match_float64_on_the_same_draws():
+    monte_carlo = MonteCarloSimulation(iterations=ITERATIONS, seed=SEED, precision="float32", block_size=ITERATIONS)
+    results = monte_carlo.run_simulation(RISK_EVENTS, [], DEFENSE_SYSTEMS)
+
+    # The float32 draws of the run's single block, simulated with float64 arithmetic
+    plan = monte_carlo.compile_plan(RISK_EVENTS, [], DEFENSE_SYSTEMS)
+    monte_carlo.dtype = np.dtype(np.float64)
+    reference = np.asarray(monte_carlo._draw_losses(ITERATIONS, plan, block_generator(SEED, 0)), dtype=float)
+    for percentile, metric in PERCENTILE_METRICS.items():
+        assert results[metric] == pytest.approx(np.percentile(reference, percentile), rel=FLOAT32_TOLERANCE)
+    assert results["expected_annual_loss"] == pytest.approx(reference.mean(), rel=FLOAT32_TOLERANCE)
+
+@pytest.mark.parametrize("size", [0, 1, 4095, 4096, 100001])
+def test_compensated_sum_matches_fsum(size):
+    values = np.random.default_rng(size).lognormal(10, 2, size).astype(np.float32)
+    assert _compensated_sum(values) == pytest.approx(math.fsum(values.astype(float)), rel=1e-14)
@@ -0,0 +1,58 @@
+# backend/tests/test_samplers.py - Every sampling mode gives uniforms and the same expected loss
+import numpy as np
+import pytest
+from scipy import stats
+
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.samplers import build_sampler, list_samplers, LatinHypercubeSampler, AntitheticSampler
+
+ROWS = 4096
+DIMENSIONS = 5
+RISK_EVENTS = [
+    {"name": "Ransomware", "probability": 15, "impact_min": 200000, "impact_max": 2000000,
+     "severity_distribution": "lognormal"},
+    {"name": "Phishing", "probability": 90, "frequency": 6, "frequency_distribution": "poisson",
+     "impact_min": 1000, "impact_max": 20000},
+    {"name": "Outage", "probability": 30, "impact_min": 10000, "impact_max": 200000},
+]
+
+def uniforms(name, seed=3, rows=ROWS, dtype=np.float64):
+    return build_sampler(name, np.random.default_rng(seed)).uniforms(rows, DIMENSIONS, np.empty((rows, DIMENSIONS), dtype))
+
+@pytest.mark.parametrize("name", list_samplers())
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_margins_are_uniform(name, dtype):
+    points = uniforms(name, dtype=dtype)
+    assert points.shape == (ROWS, DIMENSIONS) and points.dtype == dtype
+    assert points.min() >= 0 and points.max() < 1
+    for column in points.T:
+        assert stats.kstest(column, "uniform").pvalue > 0.001, name
+
+def test_latin_hypercube_fills_every_stratum_once():
+    points = uniforms(LatinHypercubeSampler.name)
+    for column in points.T:
+        np.testing.assert_array_equal(np.sort(np.floor(column * ROWS)), np.arange(ROWS))
+    # The strata are paired independently across dimensions
+    assert not np.array_equal(np.argsort(points[:, 0]), np.argsort(points[:, 1]))
+
+@pytest.mark.parametrize("rows", [ROWS, ROWS + 1])
+def test_antithetic_pairs_mirror(rows):
+    points = uniforms(AntitheticSampler.name, rows=rows)
+    half = (rows + 1) // 2
+    mirrored = points[half:]
+    np.testing.assert_allclose(points[:len(mirrored)] + mirrored, 1.0, atol=1e-15)
+
+def test_unknown_mode_raises():
+    with pytest.raises(ValueError, match="Unknown sampling mode"):
+        build_sampler("halton", np.random.default_rng())
+
+@pytest.mark.parametrize("name", [name for name in list_samplers() if name != "random"])
+def test_expected_loss_agrees_with_random(name):
+    def run(sampling, seed):
+        return MonteCarloSimulation(iterations=40000, seed=seed, sampling=sampling).run_simulation(RISK_EVENTS, [], [])
+
+    random, structured = run("random", 5), run(name, 6)
+    # Variance reduction only shrinks the structured mode's error, so the
+    # random run's standard error bounds both
+    standard_error = random["standard_deviation"] / np.sqrt(random["iterations"])
+    assert abs(structured["expected_annual_loss"] - random["expected_annual_loss"]) < 4 * np.sqrt(2) * standard_error
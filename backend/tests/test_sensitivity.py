@@ -0,0 +1,65 @@
+# backend/tests/test_sensitivity.py - Tornado swings and Sobol indices on shared random numbers
+import pytest
+
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.sensitivity import SensitivityAnalysis, SENSITIVITY_METRICS
+
+RISK_EVENTS = [
+    {"name": "Ransomware", "probability": 20, "impact_min": 200000, "impact_max": 2000000, "affected_assets": ["crm"]},
+    {"name": "Phishing", "probability": 60, "frequency": 3, "frequency_distribution": "poisson",
+     "impact_min": 10000, "impact_max": 400000},
+]
+BUSINESS_ASSETS = [
+    {"_id": "crm", "name": "CRM", "value": 2000000, "dependencies": ["erp"]},
+    {"_id": "erp", "name": "ERP", "value": 1000000},
+]
+DEFENSE_SYSTEMS = [{"name": "EDR", "effectiveness": 60, "coverage_percentage": 80}]
+
+def analyze(swing=0.2, sobol_samples=0, risk_events=RISK_EVENTS, defense_systems=DEFENSE_SYSTEMS, **engine_options):
+    monte_carlo = MonteCarloSimulation(iterations=20000, seed=3, **engine_options)
+    analysis = SensitivityAnalysis(monte_carlo, swing=swing, sobol_samples=sobol_samples)
+    return analysis.run(risk_events, BUSINESS_ASSETS, defense_systems)
+
+def swings(result, metric):
+    return {(entry["name"], entry["parameter"]): entry for entry in result["tornado"][metric]}
+
+@pytest.mark.parametrize("cascade_factor", [0.0, 0.5])
+def test_tornado_moves_with_the_parameter(cascade_factor):
+    results = [analyze(swing, cascade_factor=cascade_factor) for swing in (0.1, 0.2, 0.4)]
+    for metric in SENSITIVITY_METRICS:
+        for key, entry in swings(results[1], metric).items():
+            # More probability or impact means more loss; more effectiveness means less
+            if key[1] == "effectiveness":
+                assert entry["high_value"] <= entry["low_value"], (metric, key)
+            else:
+                assert entry["high_value"] >= entry["low_value"], (metric, key)
+        # A wider swing never narrows a bar
+        for narrow, wide in zip(results, results[1:]):
+            narrow_swings, wide_swings = swings(narrow, metric), swings(wide, metric)
+            for key, entry in narrow_swings.items():
+                assert wide_swings[key]["swing"] >= entry["swing"], (metric, key)
+
+def test_impact_swing_is_linear_in_the_expected_loss():
+    result = analyze()
+    baseline = result["baseline"]["expected_annual_loss"]
+    for key, entry in swings(result, "expected_annual_loss").items():
+        if key[1] == "impact":
+            assert entry["high_value"] - baseline == pytest.approx(baseline - entry["low_value"], rel=1e-9)
+
+def test_sobol_indices_of_an_additive_scenario():
+    independent = [{key: value for key, value in event.items() if key != "affected_assets"} for event in RISK_EVENTS]
+    result = analyze(sobol_samples=256, risk_events=independent, defense_systems=[])
+    assert result["design"]["sobol_samples"] == 256
+    for metric in SENSITIVITY_METRICS:
+        indices = result["sobol"][metric]
+        for entry in indices:
+            assert -0.02 <= entry["first_order"] <= entry["total"] + 0.02, (metric, entry["name"])
+        # The events add up, so the factors barely interact
+        assert sum(entry["first_order"] for entry in indices) == pytest.approx(1, abs=0.1)
+        assert sum(entry["total"] for entry in indices) == pytest.approx(1, abs=0.1)
+
+def test_invalid_settings_raise():
+    with pytest.raises(ValueError, match="swing"):
+        SensitivityAnalysis(MonteCarloSimulation(iterations=100), swing=1.5)
+    with pytest.raises(ValueError, match="Importance sampling"):
+        SensitivityAnalysis(MonteCarloSimulation(iterations=100, importance_sampling=True))
@@ -0,0 +1,56 @@
+# backend/tests/test_sharded_simulation.py - Sharded runs do not depend on the split
+import asyncio
+import pytest
+
+from app.services import simulation_executor
+
+RISK_EVENTS = [
+    {"name": "Ransomware", "probability": 15, "impact_min": 200000, "impact_max": 2000000,
+     "severity_distribution": "lognormal", "affected_assets": ["crm"]},
+    {"name": "Phishing", "probability": 90, "frequency": 6, "frequency_distribution": "poisson",
+     "impact_min": 1000, "impact_max": 20000},
+    {"name": "Insider fraud", "probability": 5, "impact_min": 100000, "impact_max": 400000,
+     "severity_distribution": "pareto", "severity_params": {"alpha": 2.5, "cap": 5000000}},
+]
+BUSINESS_ASSETS = [
+    {"_id": "crm", "name": "CRM", "value": 2000000, "dependencies": ["erp"]},
+    {"_id": "erp", "name": "ERP", "value": 1000000},
+]
+DEFENSE_SYSTEMS = [
+    {"name": "EDR", "effectiveness": 60, "coverage_percentage": 80, "cost": 50000},
+    {"name": "Awareness training", "effectiveness": 40, "coverage_percentage": 50, "cost": 10000},
+]
+# Everything in a result that describes the losses rather than the run
+COMPARED = (
+    "expected_annual_loss", "p50_median_impact", "p90_severe_impact", "p95_impact", "p99_worst_case",
+    "conditional_var_95", "standard_deviation", "maximum_loss", "minimum_loss", "iterations",
+    "confidence_intervals", "event_attribution", "defense_value", "statistics_method",
+)
+
+def simulate(workers: int, iterations: int, **engine_options):
+    async def run():
+        await simulation_executor.init_executor(3)
+        try:
+            return await simulation_executor.run_simulation(
+                iterations, RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, workers=workers, seed=2024,
+                cascade_factor=0.5, **engine_options
+            )
+        finally:
+            await simulation_executor.close_executor()
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("iterations, memory_budget_mb, method", [
+    (100000, None, "exact"),
+    # 16 MB keeps 524288 losses exactly: the shards of this run fit, the run does not
+    (600000, 16, "streaming"),
+    # 8 MB keeps 262144: every shard of this run goes past the limit on its own
+    (1200000, 8, "streaming"),
+])
+def test_split_does_not_change_results(iterations, memory_budget_mb, method):
+    single = simulate(1, iterations, memory_budget_mb=memory_budget_mb)
+    assert single["statistics_method"]["method"] == method
+    for workers in (2, 3):
+        sharded = simulate(workers, iterations, memory_budget_mb=memory_budget_mb)
+        assert sharded["random_stream"]["workers"] == workers
+        for key in COMPARED:
+            assert sharded[key] == single[key], (workers, key)
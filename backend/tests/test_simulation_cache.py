@@ -0,0 +1,135 @@
+# backend/tests/test_simulation_cache.py - Cache keys and the in-memory LRU tier
+import asyncio
+import copy
+import json
+from datetime import datetime, timedelta
+import pytest
+
+from app.services import simulation_cache as cache_module
+from app.services.simulation_cache import SimulationCache, make_cache_key
+
+RISK_EVENTS = [{"_id": "r1", "name": "Ransomware", "probability": 20, "impact_min": 200000, "impact_max": 2000000}]
+BUSINESS_ASSETS = [{"_id": "a1", "name": "CRM", "value": 2000000}]
+DEFENSE_SYSTEMS = [{"_id": "d1", "name": "EDR", "effectiveness": 60, "coverage_percentage": 80}]
+
+def key(risk_events=RISK_EVENTS, business_assets=BUSINESS_ASSETS, defense_systems=DEFENSE_SYSTEMS, **overrides):
+    arguments = {"iterations": 10000, "mode": "vectorized", "seed": 42, "options": {"sampling": "random"}, **overrides}
+    return make_cache_key(risk_events, business_assets, defense_systems, **arguments)
+
+def test_key_ignores_bookkeeping_and_number_spelling():
+    stamped = [{**event, "created_at": datetime(2024, 1, 1), "updated_at": datetime(2025, 6, 1)} for event in RISK_EVENTS]
+    assert key(risk_events=stamped) == key()
+    floats = [{**event, "probability": 20.0, "impact_min": 200000.0} for event in RISK_EVENTS]
+    assert key(risk_events=floats) == key()
+    assert key(options={"sampling": "random", "swing": 1.0}) == key(options={"sampling": "random", "swing": 1})
+
+@pytest.mark.parametrize("collection, field, value", [
+    ("risk_events", "probability", 21),
+    ("risk_events", "impact_max", 2000001),
+    ("business_assets", "value", 1),
+    ("business_assets", "dependencies", ["a2"]),
+    ("defense_systems", "effectiveness", 61),
+    ("defense_systems", "protected_assets", ["a1"]),
+])
+def test_key_changes_on_any_component_edit(collection, field, value):
+    components = {
+        "risk_events": copy.deepcopy(RISK_EVENTS),
+        "business_assets": copy.deepcopy(BUSINESS_ASSETS),
+        "defense_systems": copy.deepcopy(DEFENSE_SYSTEMS),
+    }
+    components[collection][0][field] = value
+    assert key(**components) != key()
+
+@pytest.mark.parametrize("override", [
+    {"iterations": 10001},
+    {"mode": "reference"},
+    {"seed": 43},
+    {"seed": None},
+    {"options": {"sampling": "sobol"}},
+    {"options": {"sampling": "random", "cascade_factor": 0.5}},
+])
+def test_key_changes_on_any_option_change(override):
+    assert key(**override) != key()
+
+def test_key_changes_with_the_engine_version(monkeypatch):
+    before = key()
+    monkeypatch.setattr(cache_module, "ENGINE_VERSION", "0.0")
+    assert key() != before
+
+def result(size=0):
+    return {"expected_annual_loss": 1.0, "padding": "x" * size}
+
+def entry_bytes(results):
+    return len(json.dumps(results, default=str))
+
+def test_lru_evicts_by_entries():
+    cache = SimulationCache(max_entries=2, persistent=False)
+    asyncio.run(cache.put("a", result()))
+    asyncio.run(cache.put("b", result()))
+    # Reading "a" makes "b" the least recently used
+    assert asyncio.run(cache.get("a"))[1] == "memory"
+    asyncio.run(cache.put("c", result()))
+    assert asyncio.run(cache.get("b")) == (None, None)
+    assert asyncio.run(cache.get("a"))[0] == result()
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["entries"] == 2
+
+def test_lru_evicts_by_bytes():
+    size = entry_bytes(result(1000))
+    cache = SimulationCache(max_bytes=2 * size + 10, persistent=False)
+    for name in ("a", "b", "c"):
+        asyncio.run(cache.put(name, result(1000)))
+    stats = cache.get_stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 2 * size, 1)
+    assert asyncio.run(cache.get("a")) == (None, None)
+
+    # An entry larger than the whole cache is not kept at all
+    asyncio.run(cache.put("huge", result(5000)))
+    assert asyncio.run(cache.get("huge")) == (None, None)
+    assert cache.get_stats()["entries"] == 2
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = SimulationCache(ttl_seconds=60, persistent=False)
+    asyncio.run(cache.put("a", result()))
+    now[0] += 59
+    assert asyncio.run(cache.get("a"))[1] == "memory"
+    now[0] += 2
+    assert asyncio.run(cache.get("a")) == (None, None)
+    stats = cache.get_stats()
+    assert (stats["expirations"], stats["entries"], stats["bytes"]) == (1, 0, 0)
+
+def test_cached_results_are_copies():
+    cache = SimulationCache(persistent=False)
+    stored = result()
+    asyncio.run(cache.put("a", stored))
+    stored["expected_annual_loss"] = 2.0
+    served, _ = asyncio.run(cache.get("a"))
+    served["expected_annual_loss"] = 3.0
+    assert asyncio.run(cache.get("a"))[0]["expected_annual_loss"] == 1.0
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = {}
+
+    async def find_one(self, query):
+        return self.documents.get(query["_id"])
+
+    async def replace_one(self, query, document, upsert=False):
+        self.documents[query["_id"]] = document
+
+class FakeDatabase:
+    def __init__(self):
+        self.simulation_cache = FakeCollection()
+
+def test_persistent_tier_refills_memory_until_it_expires():
+    db = FakeDatabase()
+    asyncio.run(SimulationCache().put("a", result(), db))
+
+    cache = SimulationCache()
+    assert asyncio.run(cache.get("a", db)) == (result(), "persistent")
+    assert asyncio.run(cache.get("a", db))[1] == "memory"
+
+    db.simulation_cache.documents["a"]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+    assert asyncio.run(SimulationCache().get("a", db)) == (None, None)
@@ -0,0 +1,43 @@
+# backend/tests/test_simulation_plan.py - Cached plans follow the scenario version and the loaded documents
+import copy
+import pytest
+from bson import ObjectId
+
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.simulation_plan import PlanCache, plan_key
+import app.services.monte_carlo as monte_carlo
+
+SCENARIO = {"_id": ObjectId(), "plan_version": 3}
+RISK_EVENTS = [{"_id": ObjectId(), "name": "Outage", "probability": 40, "impact_min": 1000, "impact_max": 5000}]
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PlanCache()
+    monkeypatch.setattr(monte_carlo, "plan_cache", cache)
+    return cache
+
+def compile_plan(scenario, risk_events):
+    return MonteCarloSimulation(iterations=1000, seed=1).compile_plan(
+        risk_events, [], [], plan_key(scenario, risk_events, [], [])
+    )
+
+def test_same_version_and_documents_hit(cache):
+    first = compile_plan(SCENARIO, RISK_EVENTS)
+    assert compile_plan(SCENARIO, copy.deepcopy(RISK_EVENTS)) is first
+    assert (cache.stats["hits"], cache.stats["misses"]) == (1, 1)
+
+def test_version_bump_misses(cache):
+    first = compile_plan(SCENARIO, RISK_EVENTS)
+    bumped = {**SCENARIO, "plan_version": SCENARIO["plan_version"] + 1}
+    assert compile_plan(bumped, RISK_EVENTS) is not first
+    assert (cache.stats["hits"], cache.stats["misses"]) == (0, 2)
+
+def test_documents_changed_under_the_same_version_recompile(cache):
+    # A reader that saw the bumped version but the documents from before the write
+    stale = compile_plan(SCENARIO, RISK_EVENTS)
+    edited = [{**RISK_EVENTS[0], "probability": 80}]
+    fresh = compile_plan(SCENARIO, edited)
+    assert fresh is not stale
+    assert cache.stats["stale"] == 1
+    assert fresh.probability[0] == 80
+    assert compile_plan(SCENARIO, edited) is fresh
@@ -0,0 +1,116 @@
+# backend/tests/test_streaming_stats.py - Mergeable statistics match single-pass and exact results
+import numpy as np
+import pytest
+
+from app.services.streaming_stats import (
+    MomentAccumulator, KLLSketch, TailTracker, StreamingStatistics, loss_statistics, REPORTED_PERCENTILES
+)
+
+@pytest.fixture
+def losses():
+    # Heavy-tailed, with a block of exact zeros like years without incidents
+    rng = np.random.default_rng(7)
+    values = rng.lognormal(10, 2, 200000)
+    values[rng.random(len(values)) < 0.3] = 0.0
+    return values
+
+def shards(values: np.ndarray, count: int, batches: int = 40):
+    """Contiguous shards of contiguous batches, as a sharded run feeds them"""
+    return [np.array_split(shard, batches // count) for shard in np.array_split(values, count)]
+
+def test_merged_moments_match_single_pass(losses):
+    single = MomentAccumulator()
+    for batch in np.array_split(losses, 40):
+        single.update(batch)
+
+    merged = MomentAccumulator()
+    for shard in shards(losses, 4):
+        partial = MomentAccumulator()
+        for batch in shard:
+            partial.update(batch)
+        merged.merge(partial)
+
+    assert merged.count == single.count == len(losses)
+    assert merged.mean == pytest.approx(single.mean, rel=1e-12)
+    assert merged.mean == pytest.approx(np.mean(losses), rel=1e-12)
+    assert merged.std() == pytest.approx(np.std(losses), rel=1e-12)
+    assert merged.std(ddof=1) == pytest.approx(np.std(losses, ddof=1), rel=1e-12)
+
+@pytest.mark.parametrize("exact_limit", [200000, 50000])
+def test_block_statistics_do_not_depend_on_the_split(losses, exact_limit):
+    def accumulate(count):
+        merged = StreamingStatistics(exact_limit=exact_limit, sketch_k=256, tail_capacity=1024)
+        block = 0
+        for shard in shards(losses, count):
+            partial = StreamingStatistics(exact_limit=exact_limit, sketch_k=256, tail_capacity=1024)
+            for batch in shard:
+                partial.update(batch, block)
+                block += 1
+            merged.merge(partial)
+        return merged
+
+    single = accumulate(1)
+    assert single.is_exact == (exact_limit >= len(losses))
+    for count in (2, 4, 8):
+        sharded = accumulate(count)
+        assert sharded.to_result() == single.to_result(), count
+        assert sharded.describe() == single.describe(), count
+        assert (sharded.moments.mean, sharded.moments.m2) == (single.moments.mean, single.moments.m2)
+
+def test_exact_percentiles_below_limit(losses):
+    merged = StreamingStatistics(exact_limit=len(losses))
+    block = 0
+    for shard in shards(losses, 4):
+        partial = StreamingStatistics(exact_limit=len(losses))
+        for batch in shard:
+            partial.update(batch, block)
+            block += 1
+        merged.merge(partial)
+
+    assert merged.is_exact
+    np.testing.assert_array_equal(merged.percentile(REPORTED_PERCENTILES), np.percentile(losses, REPORTED_PERCENTILES))
+    assert merged.to_result() == loss_statistics(losses)
+
+@pytest.mark.parametrize("k", [256, 1024])
+def test_sketch_rank_error(losses, k):
+    merged = KLLSketch(k=k)
+    for index, shard in enumerate(shards(losses, 4)):
+        partial = KLLSketch(k=k, seed=index)
+        for batch in shard:
+            partial.update(batch)
+        merged.merge(partial)
+
+    assert merged.count == len(losses)
+    assert merged.size() < 4 * k
+    ordered = np.sort(losses)
+    q = np.array([1, 5, 10, 25, 50, 75, 90, 95, 99])
+    estimates = merged.percentile(q)
+    # Rank of each estimate; ties (the zeros) count as any rank they span
+    lower = np.searchsorted(ordered, estimates, side="left") / len(losses)
+    upper = np.searchsorted(ordered, estimates, side="right") / len(losses)
+    error = np.maximum(lower - q / 100, q / 100 - upper).clip(min=0)
+    assert error.max() < 2 / k
+
+def test_streaming_tail_is_exact_beyond_limit(losses):
+    statistics = StreamingStatistics(exact_limit=50000, sketch_k=256, tail_capacity=4096)
+    for batch in np.array_split(losses, 40):
+        statistics.update(batch)
+
+    assert not statistics.is_exact
+    # The top 4096 of 200000 values cover P99 and everything above P98
+    assert statistics.percentile([99])[0] == np.percentile(losses, 99)
+    p99 = np.percentile(losses, 99)
+    count, mean, _ = statistics.tail_moments(p99)
+    assert count == np.sum(losses >= p99)
+    assert mean == pytest.approx(np.mean(losses[losses >= p99]), rel=1e-12)
+    result = statistics.to_result()
+    assert result["expected_annual_loss"] == pytest.approx(np.mean(losses), rel=1e-12)
+    assert result["p50_median_impact"] == pytest.approx(np.percentile(losses, 50), rel=0.05)
+
+def test_tail_tracker_keeps_largest_values(losses):
+    merged = TailTracker(capacity=1000)
+    for shard in np.array_split(losses, 7):
+        partial = TailTracker(capacity=1000)
+        partial.update(shard)
+        merged.merge(partial)
+    np.testing.assert_array_equal(np.sort(merged.values), np.sort(losses)[-1000:])
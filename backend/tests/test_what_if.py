@@ -0,0 +1,76 @@
+# backend/tests/test_what_if.py - Defense changes evaluated on one recorded sample matrix
+import numpy as np
+import pytest
+
+from app.services.monte_carlo import MonteCarloSimulation
+from app.services.what_if import apply_defense_changes, compare_losses, defense_losses, run_what_if
+
+RISK_EVENTS = [
+    {"name": "Ransomware", "probability": 20, "impact_min": 200000, "impact_max": 2000000, "affected_assets": ["crm"]},
+    {"name": "Phishing", "probability": 70, "frequency": 4, "frequency_distribution": "poisson",
+     "impact_min": 1000, "impact_max": 20000},
+]
+BUSINESS_ASSETS = [
+    {"_id": "crm", "name": "CRM", "value": 2000000, "dependencies": ["erp"]},
+    {"_id": "erp", "name": "ERP", "value": 1000000},
+]
+DEFENSE_SYSTEMS = [
+    {"_id": "edr", "name": "EDR", "effectiveness": 60, "coverage_percentage": 80},
+    {"_id": "training", "name": "Awareness training", "effectiveness": 40, "coverage_percentage": 50},
+]
+
+@pytest.fixture(scope="module")
+def samples():
+    return MonteCarloSimulation(iterations=20000, seed=9).record_samples(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS)
+
+def test_recorded_losses_match_the_run(samples):
+    losses = defense_losses(samples, RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS)
+    results = MonteCarloSimulation(iterations=20000, seed=9).run_simulation(RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS)
+    assert losses.mean() == pytest.approx(results["expected_annual_loss"], rel=1e-9)
+
+@pytest.mark.parametrize("cascade_factor", [0.0, 0.5])
+def test_no_op_change_has_a_zero_width_interval(samples, cascade_factor):
+    changes = [{"defense_id": "edr", "effectiveness": 60}]
+    result = run_what_if(samples, RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, changes, cascade_factor)
+    for metric, delta in result["delta"].items():
+        assert delta["value"] == 0, metric
+        assert delta["confidence_interval"] == [0, 0], metric
+    assert result["common_random_numbers"]["correlation"] == pytest.approx(1.0)
+    assert result["common_random_numbers"]["variance_ratio"] == 0
+
+@pytest.mark.parametrize("cascade_factor", [0.0, 0.5])
+def test_removing_a_defense_raises_the_losses(samples, cascade_factor):
+    baseline = defense_losses(samples, RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, cascade_factor)
+    modified = defense_losses(samples, RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS[1:], cascade_factor)
+    # Same draws, fewer defenses: no iteration gets cheaper
+    assert np.all(modified >= baseline - 1e-6)
+
+    result = compare_losses(baseline, modified)
+    delta = result["delta"]["expected_annual_loss"]
+    assert delta["value"] == pytest.approx(modified.mean() - baseline.mean())
+    assert delta["confidence_interval"][0] > 0
+    assert delta["method"] == "paired"
+    # Pairing beats comparing two independent runs
+    assert result["common_random_numbers"]["variance_ratio"] < 0.5
+
+    # Switching the defense off through a change is the same comparison
+    switched_off = run_what_if(
+        samples, RISK_EVENTS, BUSINESS_ASSETS, DEFENSE_SYSTEMS, [{"defense_id": "edr", "effectiveness": 0}],
+        cascade_factor
+    )
+    assert switched_off["delta"]["expected_annual_loss"]["value"] == pytest.approx(delta["value"])
+    assert switched_off["delta"]["conditional_var_95"]["method"] == "batch_means"
+
+def test_changes_copy_the_defenses():
+    modified = apply_defense_changes(DEFENSE_SYSTEMS, [{"defense_id": "training", "coverage_percentage": 90}])
+    assert modified[1]["coverage_percentage"] == 90
+    assert DEFENSE_SYSTEMS[1]["coverage_percentage"] == 50
+    assert modified[0] == DEFENSE_SYSTEMS[0]
+
+@pytest.mark.parametrize("change, message", [
+    ({"defense_id": "firewall", "effectiveness": 50}, "not part of this scenario"),
+    ({"defense_id": "edr", "effectiveness": 120}, "between 0 and 100"),
+])
+def test_invalid_changes_raise(change, message):
+    with pytest.raises(ValueError, match=message):
+        apply_defense_changes(DEFENSE_SYSTEMS, [change])